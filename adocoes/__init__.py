@@ -0,0 +1,19 @@
+"""
+Núcleo da aplicação de adoções: mapeamentos, banco de dados e score.
+
+Nada aqui importa o Streamlit; app.py é só a interface. Pontos de entrada
+para scripts e jobs:
+
+- adocoes.db: init_db, get_db_connection, load_tipo, load_page;
+- adocoes.snapshot: leituras servidas de uma cópia em memória e backups online;
+- adocoes.records: cadastro, edição, leitura e importação de CSV;
+- adocoes.matching: listas de compatibilidade (adotante -> animais e
+  animal -> adotantes) e o cálculo a partir de DataFrames;
+- adocoes.export, adocoes.batch, adocoes.assignment: exportação e jobs
+  (adocoes.parallel divide o job em lote entre processos);
+- adocoes.benchmark, adocoes.loadtest: medidas de desempenho (a segunda
+  roda o app.py em sessões simultâneas da AppTest).
+
+Os submódulos não são importados aqui, para que quem usa só parte do
+pacote não pague pelo resto.
+"""
@@ -0,0 +1,337 @@
+"""
+Atribuição global um-para-um (adotante -> animal) que maximiza a soma dos
+scores, por tipo, com o algoritmo de leilão (auction) de Bertsekas.
+
+Versão esparsa: cada adotante só disputa as suas K melhores assinaturas de
+animal (índice de assinaturas). Animais com a mesma assinatura são cópias
+idênticas do mesmo objeto, então cada assinatura guarda um heap com o preço
+de cada cópia e o lance vai sempre na mais barata. Um adotante pode ficar
+sem animal (objeto fictício próprio, valor 0).
+
+O relatório traz o valor total, um limite superior dual calculado a partir
+dos preços finais e a diferença entre os dois, que certifica quão perto do
+ótimo (do problema podado) a solução ficou.
+
+Uso:
+    python -m adocoes.assignment --candidatos 50 --saida atribuicao.csv --relatorio tempos.json
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from adocoes.config import TIPO_OPTIONS
+from adocoes.db import get_db_connection, init_db, load_tipo
+from adocoes.scoring import build_code_matrix, build_weight_matrix, weighted_cosine_matrix
+from adocoes.signatures import signature_entry
+
+TABELA_ATRIBUICAO = "atribuicao"
+
+
+def candidate_signatures(entry, B, P, k, bloco_adotantes=4096):
+    """
+    As k assinaturas de maior score de cada adotante.
+    Retorna (assinaturas (m, k), scores (m, k)).
+    """
+    n_assinaturas = len(entry['assinaturas'])
+    k = min(k, n_assinaturas)
+    cand_sig = np.zeros((len(B), k), dtype=np.int64)
+    cand_val = np.zeros((len(B), k), dtype=np.float64)
+
+    for i in range(0, len(B), bloco_adotantes):
+        S = weighted_cosine_matrix(entry['assinaturas'], B[i:i + bloco_adotantes], P[i:i + bloco_adotantes])
+        if k < n_assinaturas:
+            idx = np.argpartition(-S, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(n_assinaturas), S.shape)
+        cand_sig[i:i + len(S)] = idx
+        cand_val[i:i + len(S)] = np.take_along_axis(S, idx, axis=1)
+
+    return cand_sig, cand_val
+
+def _top(heap, precos):
+    """Topo válido de um heap (preço, objeto), descartando entradas velhas; None se vazio."""
+    while heap and precos[heap[0][1]] != heap[0][0]:
+        heapq.heappop(heap)
+    return heap[0] if heap else None
+
+def _top2(heap, precos):
+    """Os dois menores (preço, objeto) válidos do heap; o segundo pode ser None."""
+    primeiro = _top(heap, precos)
+    heapq.heappop(heap)
+    segundo = _top(heap, precos)
+    heapq.heappush(heap, primeiro)
+    return primeiro, segundo
+
+def auction(cand_sig, cand_val, contagens, eps_inicial=0.1, eps_final=1e-6, fator=0.2):
+    """
+    Leilão com escalonamento de epsilon sobre as listas de candidatos.
+
+    Para que o escalonamento seja correto com adotantes podendo ficar sem
+    animal, o problema é tornado quadrado: cada adotante i tem um objeto
+    fictício próprio (id C + i) e existem C "pessoas fictícias" idênticas,
+    que valem 0 por qualquer objeto e sempre disputam o mais barato.
+    'contagens' é o número de cópias (animais) de cada assinatura; a cópia c
+    da assinatura s tem id inicio[s] + c.
+
+    Retorna (objeto de cada adotante, preços de todos os objetos, estatísticas).
+    """
+    m = len(cand_sig)
+    C = int(np.sum(contagens))
+    n_obj = C + m
+    inicio = np.concatenate([[0], np.cumsum(contagens)[:-1]]).astype(np.int64)
+    sig_da_copia = np.repeat(np.arange(len(contagens)), contagens)
+
+    precos = np.zeros(n_obj, dtype=np.float64)
+    dono = np.full(n_obj, -1, dtype=np.int64)
+    objeto = np.full(m + C, -1, dtype=np.int64)
+    valor = np.zeros(m, dtype=np.float64)  # valor (sem preço) do objeto de cada adotante
+
+    heaps = [[(0.0, int(inicio[s]) + c) for c in range(int(contagens[s]))] for s in range(len(contagens))]
+    heap_global = [(0.0, o) for o in range(n_obj)]
+    menor = np.zeros(len(contagens), dtype=np.float64)
+
+    def set_price(o, novo):
+        precos[o] = novo
+        heapq.heappush(heap_global, (novo, o))
+        if o < C:
+            s = sig_da_copia[o]
+            heapq.heappush(heaps[s], (novo, o))
+            menor[s] = _top(heaps[s], precos)[0]
+
+    def assign(pessoa, o, fila):
+        anterior = dono[o]
+        if anterior >= 0:
+            objeto[anterior] = -1
+            fila.append(anterior)
+        dono[o] = pessoa
+        objeto[pessoa] = o
+
+    stats = {'fases': 0, 'lances': 0}
+    eps = max(eps_inicial, eps_final)
+    while True:
+        stats['fases'] += 1
+
+        # Mantém os pares que ainda satisfazem eps-CS com o novo eps
+        if stats['fases'] > 1:
+            lucro_max = np.maximum((cand_val - menor[cand_sig]).max(axis=1), -precos[C:])
+            atribuidos = np.flatnonzero(objeto[:m] >= 0)
+            violam = atribuidos[valor[atribuidos] - precos[objeto[atribuidos]] < lucro_max[atribuidos] - eps]
+            minimo = _top(heap_global, precos)[0]
+            ficticias = m + np.flatnonzero(objeto[m:] >= 0)
+            violam = np.concatenate([violam, ficticias[precos[objeto[ficticias]] > minimo + eps]])
+            dono[objeto[violam]] = -1
+            objeto[violam] = -1
+
+        fila = deque(np.flatnonzero(objeto < 0).tolist())
+
+        while fila:
+            pessoa = fila.popleft()
+            stats['lances'] += 1
+
+            if pessoa >= m:
+                # Pessoa fictícia: disputa o objeto mais barato de todos
+                (p1, o1), segundo = _top2(heap_global, precos)
+                p2 = segundo[0] if segundo is not None else p1
+                set_price(o1, p2 + eps)
+                assign(pessoa, o1, fila)
+                continue
+
+            sigs = cand_sig[pessoa]
+            valores = cand_val[pessoa] - menor[sigs]
+            pos = int(np.argmax(valores))
+            v_ficticio = -precos[C + pessoa]
+
+            if v_ficticio >= valores[pos]:
+                # O objeto fictício do adotante (ficar sem animal) é o melhor
+                o = C + pessoa
+                novo = precos[o] + v_ficticio - valores[pos] + eps
+                valor[pessoa] = 0.0
+            else:
+                # Segundo melhor: outra assinatura, outra cópia da mesma ou o fictício
+                v2 = v_ficticio
+                if len(valores) > 1:
+                    v2 = max(v2, float(np.max(np.delete(valores, pos))))
+                s = int(sigs[pos])
+                (p1, o), segunda = _top2(heaps[s], precos)
+                if segunda is not None:
+                    v2 = max(v2, cand_val[pessoa, pos] - segunda[0])
+                novo = p1 + valores[pos] - v2 + eps
+                valor[pessoa] = cand_val[pessoa, pos]
+
+            set_price(o, novo)
+            assign(pessoa, o, fila)
+
+        if eps <= eps_final:
+            break
+        eps = max(eps * fator, eps_final)
+
+    stats['eps_final'] = eps
+    stats['objetos'] = n_obj
+    return objeto[:m], precos, stats
+
+def dual_bound(cand_sig, cand_val, precos, inicio, contagens):
+    """
+    Limite superior (dual de PL) do valor ótimo do problema podado:
+    sum(p'_c) + sum_i max(0, max_s (a_is - min p'_s)), com p' = max(0, p - lambda)
+    e lambda o menor preço de todos os objetos.
+    """
+    lam = precos.min()
+    copias = np.maximum(0.0, precos[:int(np.sum(contagens))] - lam)
+    menor = np.full(len(contagens), np.inf)
+    com_copias = contagens > 0
+    menor[com_copias] = np.minimum.reduceat(copias, inicio[com_copias])
+    lucro = np.maximum(0.0, (cand_val - menor[cand_sig]).max(axis=1))
+    return float(copias.sum() + lucro.sum())
+
+def assign_tipo(conn, tipo, candidatos=50, eps_final=1e-6):
+    """
+    Atribuição ótima (aproximada por eps) para um tipo.
+    Retorna (linhas (adotante_id, animal_id, score), relatório).
+    """
+    t0 = time.perf_counter()
+    animais = load_tipo(conn, 'animais', tipo)
+    adotantes = load_tipo(conn, 'adotantes', tipo)
+    relatorio = {'tipo': tipo, 'animais': len(animais), 'adotantes': len(adotantes)}
+    vazio = {'atribuidos': 0, 'total': 0.0, 'limite_dual': 0.0, 'gap': 0.0}
+    if animais.empty or adotantes.empty:
+        relatorio.update(vazio)
+        return [], relatorio
+
+    A, valid_a = build_code_matrix(animais)
+    tamanho = A.shape[1]
+    B, valid_b = build_code_matrix(adotantes, tamanho=tamanho)
+    P, valid_p = build_weight_matrix(adotantes, tamanho)
+    valid_ad = valid_b & valid_p
+    if not valid_a.any() or not valid_ad.any():
+        relatorio.update(vazio)
+        return [], relatorio
+
+    B, P = B[valid_ad], P[valid_ad]
+    adotante_ids = adotantes['id'].to_numpy()[valid_ad]
+
+    entry = signature_entry(A[valid_a], animais['id'].to_numpy()[valid_a], animais['nome'].to_numpy()[valid_a])
+    t1 = time.perf_counter()
+
+    cand_sig, cand_val = candidate_signatures(entry, B, P, candidatos)
+    t2 = time.perf_counter()
+
+    # Cópias além do número de adotantes que listam a assinatura nunca são disputadas
+    demanda = np.bincount(cand_sig.ravel(), minlength=len(entry['contagens']))
+    copias = np.minimum(entry['contagens'], demanda)
+
+    atribuido, precos, stats = auction(cand_sig, cand_val, copias, eps_final=eps_final)
+    t3 = time.perf_counter()
+
+    # Cópia global -> (assinatura, índice da cópia) -> animal
+    inicio = np.concatenate([[0], np.cumsum(copias)[:-1]])
+    sig_da_copia = np.repeat(np.arange(len(copias)), copias)
+    linhas = []
+    total = 0.0
+    n_copias = int(np.sum(copias))
+    for i, copia in enumerate(atribuido.tolist()):
+        if copia >= n_copias:
+            # Ficou com o objeto fictício: sem animal
+            continue
+        s = int(sig_da_copia[copia])
+        animal_id = entry['membros'][s][copia - inicio[s]].item()
+        score = float(cand_val[i, np.flatnonzero(cand_sig[i] == s)[0]])
+        linhas.append((adotante_ids[i].item(), animal_id, score))
+        total += score
+
+    limite_dual = dual_bound(cand_sig, cand_val, precos, inicio, copias)
+
+    relatorio.update({
+        'assinaturas': len(entry['assinaturas']),
+        'candidatos_por_adotante': cand_sig.shape[1],
+        'copias_disputadas': int(np.sum(copias)),
+        'atribuidos': len(linhas),
+        'total': total,
+        'limite_dual': limite_dual,
+        'gap': limite_dual - total,
+        'fases': stats['fases'],
+        'lances': stats['lances'],
+        'tempo_carga_s': t1 - t0,
+        'tempo_candidatos_s': t2 - t1,
+        'tempo_leilao_s': t3 - t2,
+    })
+    return linhas, relatorio
+
+def write_table(conn, linhas_por_tipo):
+    """Substitui o conteúdo da tabela de atribuição numa única transação."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS {TABELA_ATRIBUICAO} (
+        adotante_id INTEGER PRIMARY KEY,
+        animal_id INTEGER NOT NULL UNIQUE,
+        tipo TEXT NOT NULL,
+        score REAL NOT NULL
+    );
+    ''')
+    try:
+        cursor.execute(f"DELETE FROM {TABELA_ATRIBUICAO}")
+        for tipo, linhas in linhas_por_tipo.items():
+            cursor.executemany(
+                f"INSERT INTO {TABELA_ATRIBUICAO} (adotante_id, animal_id, tipo, score) VALUES (?, ?, ?, ?)",
+                [(adotante_id, animal_id, tipo, score) for adotante_id, animal_id, score in linhas],
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def write_csv(path, linhas_por_tipo):
+    """Grava a atribuição em CSV."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['adotante_id', 'animal_id', 'tipo', 'score'])
+        for tipo, linhas in linhas_por_tipo.items():
+            for adotante_id, animal_id, score in linhas:
+                writer.writerow([adotante_id, animal_id, tipo, score])
+
+def run(candidatos=50, saida=None, relatorio=None, db_name=None, eps_final=1e-6):
+    """Executa a atribuição de todos os tipos; retorna a lista de relatórios."""
+    init_db(db_name)
+    conn = get_db_connection(db_name)
+    try:
+        linhas_por_tipo = {}
+        relatorios = []
+        for tipo in TIPO_OPTIONS:
+            linhas_por_tipo[tipo], rel = assign_tipo(conn, tipo, candidatos, eps_final)
+            relatorios.append(rel)
+
+        if saida:
+            write_csv(saida, linhas_por_tipo)
+        else:
+            write_table(conn, linhas_por_tipo)
+    finally:
+        conn.close()
+
+    if relatorio:
+        with open(relatorio, 'w', encoding='utf-8') as f:
+            json.dump(relatorios, f, ensure_ascii=False, indent=2)
+    return relatorios
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Atribuição global um-para-um de animais a adotantes, por tipo.")
+    parser.add_argument("--candidatos", type=int, default=50, help="Assinaturas candidatas por adotante (padrão: 50).")
+    parser.add_argument("--saida", help="Arquivo CSV de saída. Sem ele, grava na tabela 'atribuicao'.")
+    parser.add_argument("--relatorio", help="Arquivo JSON com o relatório de tempos.")
+    parser.add_argument("--db", help="Caminho do banco SQLite (padrão: adocoes.db).")
+    parser.add_argument("--eps", type=float, default=1e-6, help="Epsilon final do leilão (gap máximo por adotante).")
+    args = parser.parse_args(argv)
+
+    for rel in run(args.candidatos, args.saida, args.relatorio, args.db, args.eps):
+        print(
+            f"[{rel['tipo']}] {rel['atribuidos']}/{rel['adotantes']} adotantes atribuídos, "
+            f"total {rel['total']:.4f} (limite dual {rel['limite_dual']:.4f}, gap {rel['gap']:.2e})"
+            + (f", leilão {rel['tempo_leilao_s']:.2f}s, {rel['lances']} lances" if 'lances' in rel else "")
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Job em lote: ranqueia todos os adotantes contra todos os animais do seu tipo
+e grava o top-N de cada adotante numa tabela ou num arquivo CSV.
+
+Uso:
+    python -m adocoes.batch --top 10
+    python -m adocoes.batch --top 20 --saida ranking.csv --memoria-mb 512
+    python -m adocoes.batch --top 10 --processos 8
+"""
+
+import argparse
+import csv
+import sys
+import time
+
+from adocoes.config import TIPO_OPTIONS
+from adocoes.db import get_db_connection, init_db, load_tipo
+from adocoes.parallel import top_n_parallel
+from adocoes.scoring import build_code_matrix, build_weight_matrix, top_n_blocked
+from adocoes.signatures import signature_entry, top_n_signatures
+
+TABELA_RESULTADOS = "compatibilidade_batch"
+
+# Bytes estimados por célula (adotante x animal) durante o cálculo de um bloco
+_BYTES_POR_CELULA = 64
+_BLOCO_ANIMAIS = 4096
+
+
+def block_rows(memoria_mb, celulas_por_adotante):
+    """Quantos adotantes cabem num bloco dentro do orçamento de memória."""
+    return max(1, (memoria_mb * 1024 * 1024) // (_BYTES_POR_CELULA * max(celulas_por_adotante, 1)))
+
+def load_matrices(conn, tipo):
+    """
+    Matrizes do tipo informado, só com os registros de vetor válido:
+    {'animal_ids', 'nomes', 'A', 'adotante_ids', 'B', 'P'} (None se faltam
+    animais ou adotantes). Os inválidos são avisados no stderr.
+    """
+    animais = load_tipo(conn, 'animais', tipo)
+    adotantes = load_tipo(conn, 'adotantes', tipo)
+    if animais.empty or adotantes.empty:
+        return None
+
+    A, valid_a = build_code_matrix(animais)
+    tamanho = A.shape[1]
+    B, valid_b = build_code_matrix(adotantes, tamanho=tamanho)
+    P, valid_p = build_weight_matrix(adotantes, tamanho)
+    valid_ad = valid_b & valid_p
+
+    for nome in animais.loc[~valid_a, 'nome']:
+        print(f"Aviso: animal '{nome}' ignorado (vetor inválido).", file=sys.stderr)
+    for nome in adotantes.loc[~valid_ad, 'nome']:
+        print(f"Aviso: adotante '{nome}' ignorado (vetor inválido).", file=sys.stderr)
+
+    return {
+        'animal_ids': animais['id'].to_numpy()[valid_a],
+        'nomes': animais['nome'].to_numpy()[valid_a],
+        'A': A[valid_a],
+        'adotante_ids': adotantes['id'].to_numpy()[valid_ad],
+        'B': B[valid_ad],
+        'P': P[valid_ad],
+    }
+
+def top_n(matrizes, top, memoria_mb=256, assinaturas=True, empates=False, processos=1):
+    """
+    Top-N de cada adotante das matrizes (ver load_matrices). Com processos > 1
+    os adotantes são divididos entre processos (ver adocoes.parallel), com o
+    mesmo resultado. Retorna (índices em 'animal_ids', scores), um por adotante.
+    """
+    A, B, P = matrizes['A'], matrizes['B'], matrizes['P']
+    if assinaturas:
+        entry = signature_entry(A, matrizes['animal_ids'], matrizes['nomes'])
+        bloco = block_rows(memoria_mb, len(entry['assinaturas']))
+        if processos > 1:
+            return top_n_parallel(B, P, top, processos, entry=entry, bloco_adotantes=bloco, empates=empates)
+        return top_n_signatures(entry, B, P, top, bloco_adotantes=bloco, empates=empates)
+
+    bloco = block_rows(memoria_mb, min(_BLOCO_ANIMAIS, len(A)) + min(top, len(A)))
+    if processos > 1:
+        return top_n_parallel(B, P, top, processos, A=A, bloco_adotantes=bloco, bloco_animais=_BLOCO_ANIMAIS)
+    return top_n_blocked(A, B, P, top, bloco_adotantes=bloco, bloco_animais=_BLOCO_ANIMAIS)
+
+def rank_tipo(conn, tipo, top, memoria_mb=256, assinaturas=True, empates=False, processos=1):
+    """
+    Gera as linhas (adotante_id, rank, animal_id, score) do top-N de cada
+    adotante do tipo informado. Com assinaturas=True o score é calculado por
+    assinatura distinta de animal (e perfil distinto de adotante); com
+    empates=True entram também os empatados com o N-ésimo, como na página.
+    """
+    matrizes = load_matrices(conn, tipo)
+    if matrizes is None:
+        return
+
+    indices, scores = top_n(matrizes, top, memoria_mb, assinaturas, empates, processos)
+    animal_ids = matrizes['animal_ids']
+    for adotante_id, idx_row, score_row in zip(matrizes['adotante_ids'].tolist(), indices, scores):
+        for rank, (i, score) in enumerate(zip(idx_row.tolist(), score_row.tolist()), start=1):
+            yield adotante_id, rank, animal_ids[i].item(), score
+
+def write_table(conn, linhas):
+    """Substitui o conteúdo da tabela de resultados numa única transação."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS {TABELA_RESULTADOS} (
+        adotante_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        animal_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (adotante_id, rank)
+    );
+    ''')
+    try:
+        cursor.execute(f"DELETE FROM {TABELA_RESULTADOS}")
+        cursor.executemany(f"INSERT INTO {TABELA_RESULTADOS} VALUES (?, ?, ?, ?)", linhas)
+        conn.commit()
+        return cursor.rowcount
+    except Exception:
+        conn.rollback()
+        raise
+
+def write_csv(path, linhas):
+    """Grava os resultados em CSV, linha a linha."""
+    total = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['adotante_id', 'rank', 'animal_id', 'score'])
+        for linha in linhas:
+            writer.writerow(linha)
+            total += 1
+    return total
+
+def run(top=10, saida=None, db_name=None, memoria_mb=256, assinaturas=True, empates=False, processos=1):
+    """Executa o ranqueamento de todos os tipos e grava o resultado."""
+    init_db(db_name)
+    conn = get_db_connection(db_name)
+    try:
+        linhas = (
+            linha
+            for tipo in TIPO_OPTIONS
+            for linha in rank_tipo(conn, tipo, top, memoria_mb, assinaturas, empates, processos)
+        )
+        if saida:
+            return write_csv(saida, linhas)
+        return write_table(conn, linhas)
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ranqueia todos os adotantes contra os animais do seu tipo.")
+    parser.add_argument("--top", type=int, default=10, help="Quantos animais manter por adotante (padrão: 10).")
+    parser.add_argument("--saida", help="Arquivo CSV de saída. Sem ele, grava na tabela 'compatibilidade_batch'.")
+    parser.add_argument("--db", help="Caminho do banco SQLite (padrão: adocoes.db).")
+    parser.add_argument("--memoria-mb", type=int, default=256, help="Orçamento de memória por bloco, em MB.")
+    parser.add_argument("--sem-assinaturas", action="store_true", help="Calcula a matriz densa completa, sem agrupar assinaturas.")
+    parser.add_argument("--empates", action="store_true", help="Inclui os animais empatados com o N-ésimo (como na página).")
+    parser.add_argument("--processos", type=int, default=1, help="Processos para o cálculo dos scores (padrão: 1).")
+    args = parser.parse_args(argv)
+    if args.empates and args.sem_assinaturas:
+        parser.error("--empates só é suportado com o agrupamento por assinaturas.")
+    if args.processos < 1:
+        parser.error("--processos deve ser pelo menos 1.")
+
+    inicio = time.perf_counter()
+    total = run(args.top, args.saida, args.db, args.memoria_mb, not args.sem_assinaturas, args.empates, args.processos)
+    destino = args.saida or f"tabela '{TABELA_RESULTADOS}'"
+    print(f"{total} linhas gravadas em {destino} em {time.perf_counter() - inicio:.2f}s.")
+
+if __name__ == "__main__":
+    main()
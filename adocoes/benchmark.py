@@ -0,0 +1,292 @@
+"""
+Benchmark do caminho de compatibilidade sobre dados sintéticos
+(adocoes.synthetic), do CSV à exportação.
+
+Para cada tamanho, num banco temporário, mede:
+- gerar_csv: geração dos CSVs sintéticos;
+- importar_csv: substituição das duas tabelas pelo CSV;
+- carregar_tabela: leitura da tabela de animais inteira num DataFrame;
+- carregar_cache: montagem do cache de animais (todos os tipos);
+- score_adotante_<motor>: score de uma amostra de adotantes contra os
+  animais do seu tipo (top-k + empates), por motor de score;
+- compatibilidade_lida: a lista da página já gravada na tabela
+  'compatibilidade';
+- compatibilidade_cache: a mesma lista vinda do cache por perfil
+  (adocoes.result_cache);
+- score_lote: o job adocoes.batch (top-k + empates de todos os adotantes);
+- exportar_<formato>: exportação da tabela de animais;
+- calculo_lote_<p>p (com --processos): só o cálculo do top-k + empates de
+  todos os adotantes em p processos (adocoes.parallel), com speedup e
+  eficiência (speedup / p) em relação a um processo.
+
+O resultado é gravado em JSON (com versões das bibliotecas e o commit),
+para comparar execuções:
+    python -m adocoes.benchmark --tamanhos 1000 10000 100000 --saida depois.json
+    python -m adocoes.benchmark --tamanhos 1000 10000 --saida depois.json --comparar antes.json
+    python -m adocoes.benchmark --tamanhos 100000 --processos 1 2 4 8 16
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from adocoes import batch, matching, records, result_cache
+from adocoes import cache as animal_cache
+from adocoes.config import TIPO_OPTIONS, TOP_K, TOP_K_METODO
+from adocoes.db import init_db, get_db_connection, close_connections
+from adocoes.export import available_formats, export_table
+from adocoes.signatures import MOTORES
+from adocoes.synthetic import write_dataset
+
+FORMATO_VERSAO = 1
+# Adotantes por animal nos dados sintéticos (1 adotante para cada 5 animais)
+PROPORCAO_ADOTANTES = 0.2
+
+
+def timed(funcao, repeticoes=1, operacoes=1):
+    """
+    Executa funcao() 'repeticoes' vezes.
+    Retorna ({'segundos', 'mediana', 'minimo', 'por_operacao'}, último resultado).
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    mediana = statistics.median(tempos)
+    medida = {
+        'segundos': tempos,
+        'mediana': mediana,
+        'minimo': min(tempos),
+        'operacoes': operacoes,
+        'por_operacao': mediana / max(operacoes, 1),
+    }
+    return medida, resultado
+
+def environment():
+    """Versões e máquina, gravadas junto com os tempos."""
+    try:
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=raiz, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'commit': commit,
+    }
+
+def _import(db_name, caminhos):
+    for tabela, caminho in caminhos.items():
+        resultado = records.replace_from_csv(tabela, caminho, db_name=db_name)
+        if resultado['faltando'] or resultado['total_erros']:
+            raise RuntimeError(f"CSV sintético de '{tabela}' rejeitado: {resultado['erros'][:3]}")
+
+def _rebuild_cache(db_name):
+    animal_cache.invalidate(db_name)
+    return [animal_cache.get_animal_entry(tipo, db_name) for tipo in TIPO_OPTIONS]
+
+def _sample_adopters(db_name, amostra, seed):
+    conn = get_db_connection(db_name)
+    try:
+        ids = [linha[0] for linha in conn.execute("SELECT id FROM adotantes ORDER BY id")]
+    finally:
+        conn.close()
+    ids = random.Random(seed).sample(ids, min(amostra, len(ids)))
+    return [records.find_record('adotantes', id_, db_name) for id_ in ids]
+
+def _score_sample(adotantes, db_name, motor):
+    for adotante in adotantes:
+        entry = animal_cache.get_animal_entry(adotante['tipo'], db_name)
+        if entry is not None:
+            matching.rank_entry(adotante, entry, TOP_K, TOP_K_METODO, motor)
+
+def _read_sample(adotantes, db_name, cache=True):
+    for adotante in adotantes:
+        if not cache:
+            # Mede a leitura da tabela 'compatibilidade', não o cache por perfil
+            result_cache.clear(db_name)
+        matching.compatible_animals(adotante, TOP_K, db_name)
+
+def _export(db_name, formato):
+    conn = get_db_connection(db_name)
+    try:
+        with tempfile.TemporaryFile() as destino:
+            return export_table(conn, 'animais', formato, destino)
+    finally:
+        conn.close()
+
+def scaling(db_name, processos, repeticoes=3, top=TOP_K):
+    """
+    Mede o cálculo do lote (top + empates de todos os adotantes, sem gravar)
+    com cada quantidade de processos. Retorna {p: medida}, com 'speedup'
+    (tempo com 1 processo / tempo com p) e 'eficiencia' (speedup / p).
+    """
+    conn = get_db_connection(db_name)
+    try:
+        matrizes = [m for m in (batch.load_matrices(conn, tipo) for tipo in TIPO_OPTIONS) if m is not None]
+    finally:
+        conn.close()
+    n_adotantes = sum(len(m['B']) for m in matrizes)
+
+    def calcular(p):
+        return [batch.top_n(m, top, empates=True, processos=p) for m in matrizes]
+
+    base, _ = timed(lambda: calcular(1), repeticoes, n_adotantes)
+    medidas = {}
+    for p in processos:
+        medida = base if p == 1 else timed(lambda: calcular(p), repeticoes, n_adotantes)[0]
+        speedup = base['mediana'] / medida['mediana']
+        medidas[p] = dict(medida, processos=p, speedup=speedup, eficiencia=speedup / p)
+    return medidas
+
+def run_size(n_animais, n_adotantes, diretorio, seed=0, repeticoes=3, amostra=50, processos=()):
+    """Mede todas as etapas para um tamanho. Retorna {etapa: medida}."""
+    db_name = os.path.join(diretorio, 'benchmark.db')
+    etapas = {}
+
+    etapas['gerar_csv'], caminhos = timed(
+        lambda: write_dataset(diretorio, n_animais, n_adotantes, seed), operacoes=n_animais + n_adotantes,
+    )
+    init_db(db_name)
+    try:
+        etapas['importar_csv'], _ = timed(lambda: _import(db_name, caminhos), repeticoes, n_animais + n_adotantes)
+        etapas['carregar_tabela'], _ = timed(lambda: records.load_table('animais', db_name), repeticoes, n_animais)
+        etapas['carregar_cache'], _ = timed(lambda: _rebuild_cache(db_name), repeticoes, n_animais)
+
+        adotantes = _sample_adopters(db_name, amostra, seed)
+        for motor in MOTORES:
+            etapas[f"score_adotante_{motor}"], _ = timed(
+                lambda: _score_sample(adotantes, db_name, motor), repeticoes, len(adotantes),
+            )
+        # A primeira passada calcula e grava; as medidas são só de leitura
+        _read_sample(adotantes, db_name)
+        etapas['compatibilidade_lida'], _ = timed(
+            lambda: _read_sample(adotantes, db_name, cache=False), repeticoes, len(adotantes),
+        )
+        etapas['compatibilidade_cache'], _ = timed(lambda: _read_sample(adotantes, db_name), repeticoes, len(adotantes))
+
+        etapas['score_lote'], _ = timed(
+            lambda: batch.run(top=TOP_K, db_name=db_name, empates=True), repeticoes, n_adotantes,
+        )
+        for formato in available_formats():
+            etapas[f"exportar_{formato}"], _ = timed(lambda: _export(db_name, formato), repeticoes, n_animais)
+        if processos:
+            for p, medida in scaling(db_name, processos, repeticoes).items():
+                etapas[f"calculo_lote_{p}p"] = medida
+    finally:
+        animal_cache.invalidate(db_name)
+        close_connections(db_name)
+    return etapas
+
+def run(tamanhos, seed=0, repeticoes=3, amostra=50, proporcao=PROPORCAO_ADOTANTES, processos=(), progresso=None):
+    """
+    Executa o benchmark para cada tamanho (quantidade de animais) e
+    retorna o relatório (dict pronto para JSON).
+    """
+    relatorio = {
+        'formato': FORMATO_VERSAO,
+        'inicio': datetime.datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'repeticoes': repeticoes,
+        'amostra_adotantes': amostra,
+        'ambiente': environment(),
+        'execucoes': [],
+    }
+    for n_animais in tamanhos:
+        n_adotantes = max(1, int(n_animais * proporcao))
+        diretorio = tempfile.mkdtemp(prefix='adocoes-bench-')
+        try:
+            etapas = run_size(n_animais, n_adotantes, diretorio, seed, repeticoes, amostra, processos)
+        finally:
+            shutil.rmtree(diretorio, ignore_errors=True)
+        execucao = {'animais': n_animais, 'adotantes': n_adotantes, 'etapas': etapas}
+        relatorio['execucoes'].append(execucao)
+        if progresso is not None:
+            progresso(execucao)
+    return relatorio
+
+def compare(anterior, atual):
+    """
+    Linhas (animais, etapa, mediana anterior, mediana atual, razão atual/anterior)
+    das etapas presentes nos dois relatórios.
+    """
+    antes = {
+        (execucao['animais'], etapa): medida['mediana']
+        for execucao in anterior['execucoes']
+        for etapa, medida in execucao['etapas'].items()
+    }
+    linhas = []
+    for execucao in atual['execucoes']:
+        for etapa, medida in execucao['etapas'].items():
+            chave = (execucao['animais'], etapa)
+            if chave in antes:
+                razao = medida['mediana'] / antes[chave] if antes[chave] else float('inf')
+                linhas.append((execucao['animais'], etapa, antes[chave], medida['mediana'], razao))
+    return linhas
+
+def _print_execution(execucao):
+    print(f"\n{execucao['animais']} animais / {execucao['adotantes']} adotantes")
+    for etapa, medida in execucao['etapas'].items():
+        por_op = medida['por_operacao'] * 1e6
+        linha = f"  {etapa:<24} {medida['mediana']:>10.4f}s  ({por_op:,.1f} µs/op, {medida['operacoes']} ops)"
+        if 'eficiencia' in medida:
+            linha += f"  speedup x{medida['speedup']:.2f}, eficiência {medida['eficiencia']:.0%}"
+        print(linha)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de importação, score e exportação com dados sintéticos.")
+    parser.add_argument("--tamanhos", type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Quantidades de animais (padrão: 1000 10000 100000; até 1000000).")
+    parser.add_argument("--proporcao", type=float, default=PROPORCAO_ADOTANTES,
+                        help=f"Adotantes por animal (padrão: {PROPORCAO_ADOTANTES}).")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos dados (padrão: 0).")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições de cada etapa (padrão: 3).")
+    parser.add_argument("--amostra", type=int, default=50, help="Adotantes no score individual (padrão: 50).")
+    parser.add_argument("--saida", help="Arquivo JSON com o resultado.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar.")
+    parser.add_argument("--processos", type=int, nargs='+', default=[],
+                        help="Mede também o cálculo do lote com cada quantidade de processos (ex.: 1 2 4 8 16).")
+    args = parser.parse_args(argv)
+    if any(p < 1 for p in args.processos):
+        parser.error("--processos deve ser pelo menos 1.")
+
+    relatorio = run(
+        args.tamanhos, args.seed, args.repeticoes, args.amostra, args.proporcao, args.processos, progresso=_print_execution,
+    )
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\nResultado gravado em {args.saida}.")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        print(f"\nComparação com {args.comparar} (razão < 1 = mais rápido agora):")
+        for animais, etapa, antes, depois, razao in compare(anterior, relatorio):
+            print(f"  {animais:>8} {etapa:<24} {antes:>10.4f}s -> {depois:>10.4f}s  x{razao:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Motor de score com os animais empacotados em máscaras de bits.
+
+Como cada codigo_* é one-hot, o vetor de 21 posições de um animal cabe num
+único uint32 (bit i = posição i do vetor). Para um adotante fixo, tanto o
+numerador (soma de Bi*Pi nos bits ligados de A) quanto o termo do animal no
+denominador (soma de Pi^2 nos bits ligados) são somas sobre os bits da
+máscara; elas são lidas de tabelas de 256 entradas, uma por byte da máscara.
+
+As somas são inteiras e o denominador segue a mesma ordem de operações de
+weighted_cosine_scores, então os scores são idênticos aos do motor denso.
+"""
+
+import math
+
+import numpy as np
+
+BITS_POR_TABELA = 8
+
+# Valor de cada combinação de 8 bits: BITS_BYTE[v, j] = bit j de v
+BITS_BYTE = ((np.arange(2 ** BITS_POR_TABELA)[:, None] >> np.arange(BITS_POR_TABELA)) & 1).astype(np.int64)
+
+
+def pack_codes(A):
+    """Empacota a matriz de códigos (n, L <= 32) em máscaras uint32."""
+    A = np.asarray(A)
+    pesos_bits = np.left_shift(np.uint32(1), np.arange(A.shape[1], dtype=np.uint32))
+    return (A.astype(np.uint32) * pesos_bits).sum(axis=1, dtype=np.uint32)
+
+def unpack_masks(mascaras, tamanho):
+    """Inverso de pack_codes: máscaras uint32 -> matriz (n, tamanho) int8."""
+    bits = np.arange(tamanho, dtype=np.uint32)
+    return ((np.asarray(mascaras, dtype=np.uint32)[:, None] >> bits) & 1).astype(np.int8)
+
+def _byte_tables(valores):
+    """
+    Tabelas (n_bytes, 256): soma dos 'valores' nas posições ligadas de cada
+    byte possível da máscara.
+    """
+    n_bytes = -(-len(valores) // BITS_POR_TABELA)
+    valores = np.pad(np.asarray(valores, dtype=np.int64), (0, n_bytes * BITS_POR_TABELA - len(valores)))
+    return valores.reshape(n_bytes, BITS_POR_TABELA) @ BITS_BYTE.T
+
+def adopter_tables(B, P):
+    """
+    Tabelas pré-calculadas de um adotante.
+    Retorna (tabela do numerador, tabela da norma do animal, termo do adotante).
+    """
+    B = np.asarray(B, dtype=np.int64)
+    P = np.asarray(P, dtype=np.int64)
+    tabela_num = _byte_tables(B * P)
+    tabela_norma = _byte_tables(P * P)
+    denominador_termo2 = math.sqrt(int(((B * P) ** 2).sum()))
+    return tabela_num, tabela_norma, denominador_termo2
+
+def _lookup(tabela, mascaras):
+    """Soma, byte a byte, os valores da tabela para cada máscara."""
+    total = np.zeros(len(mascaras), dtype=np.int64)
+    for i, linha in enumerate(tabela):
+        total += linha[(mascaras >> np.uint32(BITS_POR_TABELA * i)) & np.uint32(0xFF)]
+    return total
+
+def bitmask_scores(mascaras, B, P):
+    """
+    Similaridade de cosseno ponderada de cada máscara contra o adotante.
+    Mesmo resultado de weighted_cosine_scores(unpack_masks(mascaras), B, P).
+    """
+    mascaras = np.asarray(mascaras, dtype=np.uint32)
+    tabela_num, tabela_norma, denominador_termo2 = adopter_tables(B, P)
+
+    numerador = _lookup(tabela_num, mascaras)
+    sum_Ai_Pi_sq = _lookup(tabela_norma, mascaras)
+
+    denominador_completo = np.sqrt(sum_Ai_Pi_sq.astype(np.float64)) * denominador_termo2
+
+    scores = np.zeros(len(mascaras), dtype=np.float64)
+    np.divide(numerador, denominador_completo, out=scores, where=denominador_completo != 0)
+    return scores
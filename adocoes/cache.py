@@ -0,0 +1,199 @@
+"""
+Cache (por processo) da matriz de códigos dos animais, separada por tipo.
+
+É compartilhado por todas as sessões do Streamlit: a primeira consulta lê o
+SQLite e as seguintes usam só a memória. As escritas (adocoes.records)
+atualizam o cache incrementalmente ou o invalidam, e cada mudança
+incrementa o número de versão.
+
+Escritas de outros processos não passam por aqui: o cache guarda a versão
+dos animais no banco (db.table_version) que ele e o que depende de
+data_version (adocoes.result_cache) refletem, e sync() descarta tudo quando
+ela mudou, mesmo com as matrizes ainda não carregadas.
+
+Os animais ficam guardados como máscaras uint32 (um inteiro por animal, ver
+adocoes.bitmask) em vez da matriz de 21 posições.
+
+Os arrays nunca são alterados no lugar (cópia na escrita), então quem já
+pegou uma entrada continua com uma visão consistente.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from adocoes.bitmask import pack_codes, unpack_masks
+from adocoes.config import DB_NAME, COLUNAS_CODIGO, COLUNAS_INDICE, TAMANHO_VETOR
+from adocoes.db import get_db_connection, table_version
+from adocoes.encoding import add_integer_columns
+from adocoes.metrics import timed
+from adocoes.scoring import build_code_matrix
+from adocoes.signatures import signature_entry
+
+_lock = threading.Lock()
+
+# {db_name: {'versao': int, 'tipos': {tipo: {...}} ou None, 'versao_banco': int ou None}}
+# 'versao' é local (muda a cada mudança do cache); 'versao_banco' é a versão
+# dos animais no banco que o processo reflete (None: nada guardado depende dela)
+_caches = {}
+
+
+def _state(db_name):
+    return _caches.setdefault(db_name or DB_NAME, {'versao': 0, 'tipos': None, 'versao_banco': None})
+
+def _db_version(db_name):
+    conn = get_db_connection(db_name)
+    try:
+        return table_version(conn, 'animais')
+    finally:
+        conn.close()
+
+@timed(
+    'cache.load',
+    linhas=lambda dados: sum(len(d['ids']) + len(d['invalidos']) for d in dados.values()),
+    bytes_=lambda dados: sum(d['mascaras'].nbytes for d in dados.values()),
+)
+def _load(db_name):
+    """Lê todos os animais do SQLite e monta as matrizes por tipo."""
+    conn = get_db_connection(db_name)
+    try:
+        cols = ['id', 'nome', 'tipo'] + COLUNAS_INDICE
+        df = pd.read_sql_query(f"SELECT {', '.join(cols)} FROM animais ORDER BY id", conn)
+    finally:
+        conn.close()
+
+    A, valid = build_code_matrix(df)
+    mascaras = pack_codes(A)
+    tipos = df['tipo'].to_numpy()
+    ids = df['id'].to_numpy()
+    nomes = df['nome'].to_numpy()
+
+    dados = {}
+    for tipo in dict.fromkeys(tipos.tolist()):
+        mask = tipos == tipo
+        dados[tipo] = {
+            'ids': ids[mask & valid],
+            'nomes': nomes[mask & valid],
+            'mascaras': mascaras[mask & valid],
+            'invalidos': dict(zip(ids[mask & ~valid].tolist(), nomes[mask & ~valid].tolist())),
+            'entry': None,
+        }
+    return dados
+
+def _tipos(db_name):
+    """Retorna as matrizes por tipo, carregando do banco se necessário (com o lock)."""
+    state = _state(db_name)
+    if state['tipos'] is None:
+        # Lida antes dos dados: uma escrita no meio só custa uma recarga a mais
+        versao_banco = _db_version(db_name)
+        state['tipos'] = _load(db_name)
+        state['versao_banco'] = versao_banco
+    return state['tipos']
+
+def get_animal_entry(tipo, db_name=None):
+    """
+    Entrada do índice de assinaturas (ids, nomes, assinaturas, mascaras...)
+    dos animais de um tipo, sem consultar o SQLite depois da primeira carga.
+    Retorna None se não houver animais desse tipo.
+    """
+    with _lock:
+        dados = _tipos(db_name).get(tipo)
+        if dados is None or len(dados['ids']) == 0:
+            return None
+        if dados['entry'] is None:
+            A = unpack_masks(dados['mascaras'], TAMANHO_VETOR)
+            entry = signature_entry(A, dados['ids'], dados['nomes'])
+            entry['invalidos'] = list(dados['invalidos'].values())
+            dados['entry'] = entry
+        return dados['entry']
+
+def data_version(db_name=None):
+    """Número de versão dos dados de animais; muda a cada escrita."""
+    with _lock:
+        return _state(db_name)['versao']
+
+def invalidate(db_name=None):
+    """Descarta o cache (recarregado na próxima consulta)."""
+    with _lock:
+        _invalidate(_state(db_name))
+
+def _invalidate(state):
+    state['tipos'] = state['versao_banco'] = None
+    state['versao'] += 1
+
+def sync(db_name=None):
+    """
+    Descarta o cache (e muda data_version) se os animais mudaram no banco
+    desde a última conferência ou carga (escritas de outros processos ou
+    conexões). Chamar antes de guardar qualquer coisa calculada com os
+    animais. Custa uma consulta de uma linha. Retorna se descartou.
+    """
+    versao_banco = _db_version(db_name)
+    with _lock:
+        state = _state(db_name)
+        anterior, state['versao_banco'] = state['versao_banco'], versao_banco
+        if anterior is None or anterior == versao_banco:
+            return False
+        state['tipos'] = None
+        state['versao'] += 1
+        return True
+
+def upsert_animal(id_, registro, db_name=None, versao_banco=None):
+    """
+    Atualiza incrementalmente o cache com um animal inserido ou alterado.
+    'registro' deve ter 'nome', 'tipo' e as colunas codigo_*.
+    'versao_banco' é a versão dos animais lida na transação da escrita
+    (db.table_version): se o cache não estava na versão anterior a ela,
+    houve outra escrita no meio e ele é descartado em vez de atualizado.
+    """
+    with _lock:
+        state = _state(db_name)
+        if state['tipos'] is None or (versao_banco is not None and state['versao_banco'] != versao_banco - 1):
+            # Nada carregado ainda (a próxima consulta já lê o dado novo), ou
+            # houve outra escrita no meio: descarta tudo
+            _invalidate(state)
+            state['versao_banco'] = versao_banco
+            return
+        if versao_banco is not None:
+            state['versao_banco'] = versao_banco
+        state['versao'] += 1
+
+        linha = add_integer_columns(pd.DataFrame([{col: registro[col] for col in COLUNAS_CODIGO}]), 'animais')
+        tipos = state['tipos']
+        A, valid = build_code_matrix(linha)
+
+        # Remove o animal de onde estiver (pode ter mudado de tipo)
+        for dados in tipos.values():
+            _remove(dados, id_)
+
+        dados = tipos.setdefault(registro['tipo'], {
+            'ids': np.zeros(0, dtype=np.int64),
+            'nomes': np.zeros(0, dtype=object),
+            'mascaras': np.zeros(0, dtype=np.uint32),
+            'invalidos': {},
+            'entry': None,
+        })
+        if not valid[0]:
+            dados['invalidos'] = {**dados['invalidos'], id_: registro['nome']}
+            dados['entry'] = None
+            return
+
+        # Mantém a ordem por id (a mesma do SELECT)
+        pos = int(np.searchsorted(dados['ids'], id_))
+        dados['ids'] = np.insert(dados['ids'], pos, id_)
+        dados['nomes'] = np.insert(dados['nomes'], pos, registro['nome'])
+        dados['mascaras'] = np.insert(dados['mascaras'], pos, pack_codes(A)[0])
+        dados['entry'] = None
+
+def _remove(dados, id_):
+    """Tira um animal (válido ou não) das matrizes de um tipo."""
+    if id_ in dados['invalidos']:
+        dados['invalidos'] = {k: v for k, v in dados['invalidos'].items() if k != id_}
+        dados['entry'] = None
+    pos = np.flatnonzero(dados['ids'] == id_)
+    if len(pos):
+        dados['ids'] = np.delete(dados['ids'], pos)
+        dados['nomes'] = np.delete(dados['nomes'], pos)
+        dados['mascaras'] = np.delete(dados['mascaras'], pos)
+        dados['entry'] = None
@@ -0,0 +1,172 @@
+"""Constantes e mapeamentos compartilhados pela aplicação e pelos jobs."""
+
+# --- Configuração do Banco de Dados ---
+DB_NAME = "adocoes.db"
+
+# Conexões reaproveitadas por arquivo de banco (ver adocoes.db)
+POOL_TAMANHO = 8
+# Espera (s) por um lock de escrita antes de falhar com "database is locked"
+DB_TIMEOUT = 30
+# Pragmas aplicados a cada conexão nova. WAL deixa as leituras seguirem
+# enquanto uma importação de CSV escreve.
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,      # negativo = KiB (~20 MB)
+    'mmap_size': 268435456,    # 256 MB
+}
+
+# --- Mapeamentos ---
+
+# Característica 'tipo' é um FILTRO, não entra no score.
+TIPO_OPTIONS = ['cão', 'gato']
+
+# Quantos animais a página de compatibilidade mostra (mais os empates com o último)
+TOP_K = 10
+# Caminho da seleção do top-k: 'argpartition' (NumPy) ou 'heap'
+TOP_K_METODO = 'argpartition'
+# Motor do score: 'denso' (matriz NumPy) ou 'bitmask' (animais como máscaras uint32)
+MOTOR_SCORE = 'denso'
+
+# Dicionário mestre das 10 CARACTERÍSTICAS que entram no score.
+CARACTERISTICAS = {
+    'tamanho': {
+        'map': {'pequeno': '100', 'medio': '010', 'grande': '001'},
+        'q_adotante': 'Que tamanho de animal você prefere?',
+        'q_animal': 'Porte do animal:'
+    },
+    'moradia': {
+        'map': {'casa': '10', 'apartamento': '01'},
+        'q_adotante': 'Qual tipo da sua moradia?',
+        'q_animal': 'Moradia ideal:'
+    },
+    'pelo': {
+        'map': {'longos': '10', 'curtos': '01'},
+        'q_adotante': 'Que tipo de pelo você prefere?',
+        'q_animal': 'Pelagem:'
+    },
+    'sexo': {
+        'map': {'macho': '10', 'fêmea': '01'},
+        'q_adotante': 'Você prefere animal macho ou fêmea?',
+        'q_animal': 'Sexo:'
+    },
+    'queda': {
+        'map': {'sim': '10', 'não': '01'},
+        'q_adotante': 'Queda de pelo te incomoda? (sim=incomoda, não=ok)',
+        'q_animal': 'Apresenta queda de pelo:'
+    },
+    'crianca': {
+        'map': {'sim': '10', 'não': '01'},
+        'q_adotante': 'O animal deve ser amigável com criança?',
+        'q_animal': 'Amigável com criança:'
+    },
+    'brincalhao': {
+        'map': {'sim': '10', 'não': '01'},
+        'q_adotante': 'O animal deve ser brincalhão?',
+        'q_animal': 'Brincalhão:'
+    },
+    'ativo': {
+        'map': {'sim': '10', 'não': '01'},
+        'q_adotante': 'O animal deve ter muita disposição?',
+        'q_animal': 'Muito ativo:'
+    },
+    'guarda': {
+        'map': {'sim': '10', 'não': '01'},
+        'q_adotante': 'O animal precisa servir para guarda?',
+        'q_animal': 'Serve para guarda:'
+    },
+    'late': {
+        'map': {'sim': '10', 'não': '01'},
+        'q_adotante': 'É positivo o animal latir?',
+        'q_animal': 'Tende a latir:'
+    }
+}
+
+# Gera listas de opções a partir dos mapas
+for k in CARACTERISTICAS:
+    CARACTERISTICAS[k]['options'] = list(CARACTERISTICAS[k]['map'].keys())
+
+# Nomes das colunas no DB (baseado nas 10 características)
+COLUNAS_FEATURES = list(CARACTERISTICAS.keys())
+COLUNAS_CODIGO = [f"codigo_{k}" for k in COLUNAS_FEATURES]
+COLUNAS_PESO = [f"peso_{k}" for k in COLUNAS_FEATURES]
+
+# Representação inteira (usada no score): posição do '1' no código e peso 0-10
+COLUNAS_INDICE = [f"indice_{k}" for k in COLUNAS_FEATURES]
+COLUNAS_PESO_NUM = [f"peso_num_{k}" for k in COLUNAS_FEATURES]
+
+# Tamanho do código de cada característica e posição inicial no vetor completo
+TAMANHOS_CODIGO = [len(next(iter(CARACTERISTICAS[k]['map'].values()))) for k in COLUNAS_FEATURES]
+OFFSETS_CODIGO = [sum(TAMANHOS_CODIGO[:i]) for i in range(len(TAMANHOS_CODIGO))]
+TAMANHO_VETOR = sum(TAMANHOS_CODIGO)
+
+# Colunas totais para cada tabela (adicionando 'tipo' manualmente)
+COLUNAS_ANIMAIS = ['id', 'nome', 'tipo'] + COLUNAS_FEATURES + COLUNAS_CODIGO
+COLUNAS_ADOTANTES = ['id', 'nome', 'contato', 'tipo'] + COLUNAS_FEATURES + COLUNAS_CODIGO + COLUNAS_PESO
+
+# Colunas necessárias para CSV (sem ID)
+CSV_COLS_ANIMAIS = [col for col in COLUNAS_ANIMAIS if col != 'id']
+CSV_COLS_ADOTANTES = [col for col in COLUNAS_ADOTANTES if col != 'id']
+
+# Importação de CSV: linhas lidas e validadas por bloco (limita a memória)
+CSV_LINHAS_POR_BLOCO = 5000
+# Quantas linhas inválidas são descritas na mensagem de erro
+CSV_MAX_ERROS = 50
+# Chaves naturais aceitas na mescla de CSV (além do id)
+CSV_CHAVES_NATURAIS = {
+    'animais': ('nome',),
+    'adotantes': ('nome', 'contato'),
+}
+
+# Snapshot em memória (adocoes.snapshot): leituras servidas de uma cópia do
+# banco em memória; as escritas continuam indo para o arquivo
+SNAPSHOT_MEMORIA = False
+# Linhas escritas numa transação que ainda são repetidas no snapshot; acima
+# disso (cargas em massa) o snapshot é recopiado do arquivo no commit
+SNAPSHOT_MAX_ANOTADAS = 1000
+# Backup online periódico do banco (s; 0 = desligado) e arquivo de destino
+BACKUP_INTERVALO_S = 0
+BACKUP_ARQUIVO = "adocoes-backup.db"
+# Páginas copiadas por passo do backup e pausa (s) entre passos; entre um
+# passo e outro, leituras e escritas seguem normalmente
+BACKUP_PAGINAS_POR_PASSO = 256
+BACKUP_PAUSA_S = 0.05
+
+# Busca por nome (adocoes.search): colunas indexadas (FTS5) por tabela
+COLUNAS_BUSCA = {
+    'adotantes': ['nome', 'contato'],
+    'animais': ['nome'],
+}
+# Resultados mostrados na busca enquanto se digita
+BUSCA_LIMITE = 10
+# Até quantos registros casando a busca ordena por relevância (bm25); acima
+# disso (um prefixo de uma letra casa com quase a tabela toda) calcular a
+# relevância de todos custa centenas de ms, e a lista fica na ordem de id
+BUSCA_MAX_RANQUEADOS = 5000
+# Semelhança mínima (0-1, difflib) de uma palavra com erro de digitação
+BUSCA_CORTE_APROXIMADO = 0.75
+
+# Cache das listas de compatibilidade por perfil de adotante
+# (adocoes.result_cache): máximo de listas guardadas (0 = desligado) e de
+# memória ocupada por elas (MB). A memória é uma estimativa grosseira: soma o
+# sys.getsizeof raso de cada lista, dict e valor, então strings internadas
+# compartilhadas (nomes, chaves 'id'/'nome'/'score') contam uma vez por lista
+# e o uso real fica abaixo do estimado
+CACHE_RESULTADOS_ITENS = 4096
+CACHE_RESULTADOS_MB = 32
+
+# Exportação: linhas lidas do cursor por lote
+EXPORT_LINHAS_POR_LOTE = 5000
+
+# API HTTP local (adocoes.server)
+API_HOST = "127.0.0.1"
+API_PORT = 8502
+# Espera (ms) para juntar pedidos do mesmo tipo num só cálculo
+API_JANELA_LOTE_MS = 5
+# Maior k aceito em ?k=
+API_K_MAX = 100
+
+# Medidas de tempo dos pontos quentes (adocoes.metrics)
+METRICAS_ATIVAS = True
+# Durações recentes guardadas por operação (para p50/p95/p99)
+METRICAS_AMOSTRAS = 2000
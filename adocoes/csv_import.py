@@ -0,0 +1,321 @@
+"""
+Importação de CSV em blocos, com validação vetorizada contra CARACTERISTICAS.
+
+O arquivo é lido com pd.read_csv(chunksize=...), então a memória usada
+depende do tamanho do bloco e não do arquivo. Cada bloco é validado (nome,
+tipo, valor de cada característica, código correspondente e, para
+adotantes, peso no formato '888') e inserido com executemany, tudo dentro
+de uma única transação: se alguma linha for inválida, nada é alterado.
+
+import_csv substitui a tabela inteira; merge_csv mescla um CSV parcial
+(inserindo, atualizando e, opcionalmente, apagando registros).
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from adocoes.config import (
+    TIPO_OPTIONS, CARACTERISTICAS, COLUNAS_FEATURES, COLUNAS_INDICE, COLUNAS_PESO_NUM,
+    CSV_COLS_ANIMAIS, CSV_COLS_ADOTANTES, CSV_LINHAS_POR_BLOCO, CSV_MAX_ERROS,
+)
+from adocoes.db import bump_version
+from adocoes.encoding import add_integer_columns
+from adocoes.materialized import invalidate_all
+from adocoes.search import rebuild_index
+
+
+def csv_columns(table_name):
+    """Colunas exigidas no CSV de uma tabela."""
+    if table_name == 'animais':
+        return CSV_COLS_ANIMAIS
+    if table_name == 'adotantes':
+        return CSV_COLS_ADOTANTES
+    raise ValueError(f"Tabela '{table_name}' desconhecida.")
+
+def insert_columns(table_name):
+    """Colunas gravadas no banco: as do CSV mais as inteiras derivadas delas."""
+    colunas = csv_columns(table_name) + COLUNAS_INDICE
+    if table_name == 'adotantes':
+        colunas = colunas + COLUNAS_PESO_NUM
+    return colunas
+
+def _checks(bloco, table_name):
+    """
+    Verificações vetorizadas de um bloco (já com as colunas inteiras).
+    Retorna uma lista de (máscara de linhas inválidas, motivo).
+    """
+    nome = bloco['nome'].astype('string').str.strip()
+    checks = [
+        (~nome.fillna('').ne('').to_numpy(dtype=bool), "nome vazio"),
+        (~bloco['tipo'].isin(TIPO_OPTIONS).to_numpy(), f"tipo fora de {TIPO_OPTIONS}"),
+    ]
+    if 'id' in bloco.columns:
+        # Id vazio é permitido (registro novo na mescla)
+        ids = pd.to_numeric(bloco['id'], errors='coerce')
+        checks.insert(0, ((bloco['id'].notna() & (ids.isna() | (ids % 1 != 0))).to_numpy(), "id deve ser um número inteiro"))
+    for feature in COLUNAS_FEATURES:
+        props = CARACTERISTICAS[feature]
+        valor = bloco[feature]
+        codigo = bloco[f"codigo_{feature}"]
+        checks.append((~valor.isin(props['options']).to_numpy(), f"{feature} fora de {props['options']}"))
+        # Só acusa o código se o valor em si for válido (senão o erro já é o do valor)
+        codigo_ok = codigo.eq(valor.map(props['map'])).fillna(False).to_numpy(dtype=bool)
+        checks.append((valor.isin(props['options']).to_numpy() & ~codigo_ok, f"codigo_{feature} não corresponde a {feature}"))
+
+        if table_name == 'adotantes':
+            peso = bloco[f"peso_{feature}"].astype('string')
+            peso_num = bloco[f"peso_num_{feature}"]
+            # Formato legado: o peso repetido uma vez por posição do código ('888')
+            repeticoes = codigo.astype('string').str.len().fillna(0).astype(int).tolist()
+            esperado = peso_num.astype('string').str.repeat(repeticoes)
+            peso_ok = (
+                peso_num.between(0, 10).fillna(False).to_numpy(dtype=bool)
+                & peso.eq(esperado).fillna(False).to_numpy(dtype=bool)
+            )
+            checks.append((~peso_ok, f"peso_{feature} deve ser um peso de 0 a 10 repetido (ex.: '888')"))
+    return checks
+
+def validate_chunk(bloco, table_name, primeira_linha):
+    """
+    Valida um bloco do CSV (colunas de texto mais as inteiras).
+    'primeira_linha' é o número, no arquivo, da primeira linha do bloco.
+    Retorna (máscara de linhas válidas, [(linha, motivo), ...]).
+    """
+    checks = _checks(bloco, table_name)
+    invalidas = np.column_stack([mask for mask, _ in checks])
+    validas = ~invalidas.any(axis=1)
+
+    erros = []
+    motivos = [motivo for _, motivo in checks]
+    for pos in (~validas).nonzero()[0][:CSV_MAX_ERROS]:
+        linha_motivos = [motivos[j] for j in invalidas[pos].nonzero()[0]]
+        erros.append((primeira_linha + int(pos), "; ".join(linha_motivos)))
+    return validas, erros
+
+def _records(bloco, colunas):
+    """Linhas do bloco como tuplas prontas para o sqlite3 (nulos viram None)."""
+    bloco = bloco[colunas].astype(object)
+    return bloco.where(bloco.notna(), None).itertuples(index=False, name=None)
+
+def _new_result():
+    return {'inseridos': 0, 'faltando': set(), 'colunas_encontradas': [], 'erros': [], 'total_erros': 0}
+
+def _add_errors(resultado, erros, total):
+    resultado['total_erros'] += total
+    resultado['erros'] += erros[:CSV_MAX_ERROS - len(resultado['erros'])]
+
+def _validated_chunks(arquivo, table_name, resultado, progresso, linhas_por_bloco, colunas_extra=()):
+    """
+    Lê o CSV em blocos, valida cada um e gera (bloco, número da primeira
+    linha) enquanto não houver erros; depois do primeiro erro só continua
+    validando, para listar os demais. Colunas faltando, erros e contagens
+    ficam em 'resultado'. 'colunas_extra' (ex.: 'id') são mantidas se existirem.
+    """
+    required_cols = csv_columns(table_name)
+    tamanho = getattr(arquivo, 'size', None)
+
+    leitor = pd.read_csv(arquivo, dtype=str, chunksize=linhas_por_bloco)
+    try:
+        # Linha 1 do arquivo é o cabeçalho
+        linha = 2
+        for bloco in leitor:
+            if linha == 2:
+                resultado['colunas_encontradas'] = list(bloco.columns)
+                resultado['faltando'] = set(required_cols) - set(bloco.columns)
+                if resultado['faltando']:
+                    return
+
+            extras = [col for col in colunas_extra if col in bloco.columns]
+            bloco = add_integer_columns(bloco[extras + required_cols], table_name)
+            validas, erros = validate_chunk(bloco, table_name, linha)
+            _add_errors(resultado, erros, int((~validas).sum()))
+
+            if resultado['total_erros'] == 0:
+                yield bloco, linha
+
+            linha += len(bloco)
+            if progresso is not None:
+                fracao = min(arquivo.tell() / tamanho, 1.0) if tamanho and hasattr(arquivo, 'tell') else None
+                progresso(fracao, linha - 2)
+    finally:
+        leitor.close()
+
+def import_csv(conn, table_name, arquivo, progresso=None, linhas_por_bloco=CSV_LINHAS_POR_BLOCO):
+    """
+    Substitui o conteúdo da tabela pelo CSV 'arquivo' (caminho ou arquivo
+    aberto), lendo e gravando em blocos numa única transação.
+    'progresso', se informado, é chamado após cada bloco com
+    (fração lida do arquivo ou None, linhas lidas).
+    Retorna um dict com 'inseridos', 'faltando' (colunas ausentes),
+    'erros' (até CSV_MAX_ERROS pares (linha, motivo)) e 'total_erros'.
+    A tabela só é alterada se não houver colunas faltando nem erros.
+    """
+    colunas = insert_columns(table_name)
+    resultado = _new_result()
+    query = f"INSERT INTO {table_name} ({', '.join(colunas)}) VALUES ({', '.join(['?'] * len(colunas))})"
+
+    cursor = conn.cursor()
+    try:
+        # 1. Zera o contador de AUTOINCREMENT (e abre a transação)
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table_name,))
+
+        # Os índices e os gatilhos (da busca e da versão) são recriados no
+        # fim: montar cada índice de uma vez (ordenando) é bem mais rápido que
+        # atualizá-lo linha a linha, e o índice de busca é refeito de uma vez.
+        # DDL também é transacional no SQLite, então um rollback os devolve.
+        objetos = cursor.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+            (table_name,),
+        ).fetchall()
+        for tipo, nome, _ in objetos:
+            cursor.execute(f"DROP {tipo.upper()} {nome}")
+
+        # Sem gatilhos, o DELETE sem WHERE esvazia a tabela de uma vez
+        cursor.execute(f"DELETE FROM {table_name}")
+
+        # 2. Valida e insere bloco a bloco
+        for bloco, _ in _validated_chunks(arquivo, table_name, resultado, progresso, linhas_por_bloco):
+            cursor.executemany(query, _records(bloco, colunas))
+            resultado['inseridos'] += len(bloco)
+
+        if resultado['faltando'] or resultado['total_erros']:
+            conn.rollback()
+            resultado['inseridos'] = 0
+        else:
+            for _, _, sql in objetos:
+                cursor.execute(sql)
+            rebuild_index(cursor, table_name)
+            # Sem os gatilhos, a versão da tabela não mudou sozinha
+            bump_version(cursor, table_name)
+            # As listas de compatibilidade são refeitas sob demanda
+            invalidate_all(cursor)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return resultado
+
+def merge_csv(conn, table_name, arquivo, chave=('id',), apagar_ausentes=False, progresso=None,
+              linhas_por_bloco=CSV_LINHAS_POR_BLOCO):
+    """
+    Mescla o CSV na tabela em vez de substituí-la: registros cuja 'chave'
+    já existe são atualizados (só se algo mudou), os novos são inseridos e,
+    com apagar_ausentes=True, os que não aparecem no CSV são apagados.
+
+    A chave pode ser ('id',) (o CSV precisa da coluna id; linhas com id
+    vazio entram como registros novos) ou colunas naturais, por exemplo
+    ('nome', 'contato'). O CSV vai primeiro para uma tabela temporária e a
+    mescla é feita com SQL por conjunto (INSERT ... ON CONFLICT para o id,
+    UPDATE ... FROM para chaves naturais), numa única transação.
+    Retorna o mesmo dict de import_csv, com 'atualizados', 'apagados' e
+    'segundos'.
+    """
+    inicio = time.perf_counter()
+    chave = list(chave)
+    por_id = chave == ['id']
+    colunas = insert_columns(table_name)
+    if not set(chave) <= set(colunas) | {'id'}:
+        raise ValueError(f"Chave {chave} inválida para a tabela '{table_name}'.")
+
+    resultado = {**_new_result(), 'atualizados': 0, 'apagados': 0, 'segundos': 0.0}
+    staging = f"staging_{table_name}"
+    cols_staging = ['_linha', 'id'] + colunas
+    query = f"INSERT INTO {staging} ({', '.join(cols_staging)}) VALUES ({', '.join(['?'] * len(cols_staging))})"
+
+    cursor = conn.cursor()
+    try:
+        # 1. Carrega o CSV validado na tabela temporária (com a linha de origem)
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+        cursor.execute(f"CREATE TEMP TABLE {staging} AS SELECT 0 AS _linha, id, {', '.join(colunas)} FROM {table_name} WHERE 0")
+        for bloco, linha in _validated_chunks(arquivo, table_name, resultado, progresso, linhas_por_bloco, ['id']):
+            if por_id and 'id' not in bloco.columns:
+                resultado['faltando'] = {'id'}
+                break
+            bloco = bloco.assign(_linha=np.arange(linha, linha + len(bloco)))
+            if 'id' in bloco.columns:
+                # Já validados em _checks: só blocos sem erro chegam aqui
+                bloco = bloco.assign(id=pd.to_numeric(bloco['id']).astype('Int64'))
+            else:
+                bloco = bloco.assign(id=None)
+            cursor.executemany(query, _records(bloco, cols_staging))
+
+        if not (resultado['faltando'] or resultado['total_erros']):
+            _check_duplicate_keys(cursor, staging, chave, resultado, ignorar_nulos=por_id)
+
+        if resultado['faltando'] or resultado['total_erros']:
+            conn.rollback()
+            return resultado
+
+        # 2. Mescla por conjunto
+        atribuicoes = ", ".join(f"{col} = s.{col}" for col in colunas)
+        diferente = " OR ".join(f"t.{col} IS NOT s.{col}" for col in colunas)
+        casa = " AND ".join(f"t.{col} IS s.{col}" for col in chave)
+
+        # Os gatilhos da versão disparariam uma vez por linha mesclada: saem
+        # durante a mescla e a versão sobe uma vez só no fim, como em
+        # import_csv. Os da busca ficam (o índice é mantido linha a linha).
+        gatilhos_versao = cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? AND name LIKE ?",
+            (table_name, f"versao_{table_name}_%"),
+        ).fetchall()
+        for nome, _ in gatilhos_versao:
+            cursor.execute(f"DROP TRIGGER {nome}")
+
+        if apagar_ausentes:
+            resultado['apagados'] = cursor.execute(
+                f"DELETE FROM {table_name} AS t WHERE NOT EXISTS (SELECT 1 FROM {staging} s WHERE {casa})"
+            ).rowcount
+        # Linhas sem id (chave por id) nunca casam: são sempre novas
+        novas = f"NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {casa})"
+        resultado['inseridos'] = cursor.execute(f"SELECT COUNT(*) FROM {staging} s WHERE {novas}").fetchone()[0]
+        resultado['atualizados'] = cursor.execute(
+            f"SELECT COUNT(*) FROM {table_name} t JOIN {staging} s ON {casa} WHERE {diferente}"
+        ).fetchone()[0]
+
+        if por_id:
+            # 'WHERE true' desfaz a ambiguidade do ON CONFLICT depois de um SELECT
+            excluded = ", ".join(f"{col} = excluded.{col}" for col in colunas)
+            mudou = " OR ".join(f"{table_name}.{col} IS NOT excluded.{col}" for col in colunas)
+            cursor.execute(f"""
+                INSERT INTO {table_name} (id, {', '.join(colunas)})
+                SELECT id, {', '.join(colunas)} FROM {staging} WHERE true ORDER BY _linha
+                ON CONFLICT(id) DO UPDATE SET {excluded} WHERE {mudou}
+            """)
+        else:
+            cursor.execute(f"UPDATE {table_name} AS t SET {atribuicoes} FROM {staging} s WHERE {casa} AND ({diferente})")
+            cursor.execute(f"""
+                INSERT INTO {table_name} ({', '.join(colunas)})
+                SELECT {', '.join(colunas)} FROM {staging} s WHERE {novas} ORDER BY _linha
+            """)
+
+        for _, sql in gatilhos_versao:
+            cursor.execute(sql)
+        if resultado['inseridos'] or resultado['atualizados'] or resultado['apagados']:
+            bump_version(cursor, table_name)
+        invalidate_all(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # A conexão volta ao pool: não deixa a tabela temporária para trás
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+def _check_duplicate_keys(cursor, staging, chave, resultado, ignorar_nulos):
+    """Acusa linhas do CSV que repetem a mesma chave (com ignorar_nulos, linhas sem id não contam)."""
+    cols = ", ".join(chave)
+    nao_nulo = " AND ".join(f"{col} IS NOT NULL" for col in chave) if ignorar_nulos else "1"
+    duplicadas = cursor.execute(f"""
+        SELECT _linha FROM {staging}
+        WHERE {nao_nulo} AND ({cols}) IN (
+            SELECT {cols} FROM {staging} WHERE {nao_nulo} GROUP BY {cols} HAVING COUNT(*) > 1
+        )
+        ORDER BY _linha
+    """).fetchall()
+    _add_errors(resultado, [(linha, f"chave {tuple(chave)} repetida no CSV") for (linha,) in duplicadas], len(duplicadas))
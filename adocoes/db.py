@@ -0,0 +1,815 @@
+"""Conexão e migração do banco de dados SQLite."""
+
+import hashlib
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import warnings
+
+import pandas as pd
+
+from adocoes.config import (
+    DB_NAME, POOL_TAMANHO, DB_TIMEOUT, DB_PRAGMAS, SNAPSHOT_MAX_ANOTADAS,
+    CARACTERISTICAS, COLUNAS_FEATURES, COLUNAS_INDICE, COLUNAS_PESO_NUM, COLUNAS_BUSCA,
+)
+from adocoes.metrics import timed
+
+
+# Versão do esquema gravada em PRAGMA user_version. Incrementar sempre que
+# _migrate mudar (nova coluna, backfill...), para os bancos existentes migrarem.
+SCHEMA_VERSION = 7
+
+# Colunas com índice próprio nas duas tabelas
+INDEXED_COLUMNS = ['tipo', 'nome'] + COLUNAS_FEATURES
+
+# Tabelas com versão dos dados na tabela 'versoes' (ver table_version)
+TABELAS_VERSIONADAS = ('animais',)
+
+# Bancos já verificados neste processo (caminho absoluto)
+_migrados = set()
+_migrados_lock = threading.Lock()
+
+
+def db_path(db_name=None):
+    """Caminho absoluto do banco (chave dos pools, snapshots e backups); ':memory:' fica como está."""
+    db_name = db_name or DB_NAME
+    return db_name if db_name == ':memory:' else os.path.abspath(db_name)
+
+
+# Conexões livres por arquivo: {caminho: {'pid': int, 'livres': [conexões]}}
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Conexão que, ao ser fechada, volta para o pool em vez de fechar de fato.
+    Cada conexão é usada por uma thread de cada vez (quem a pegou do pool),
+    por isso pode circular entre as threads de script do Streamlit.
+    """
+
+    pool_key = None
+    emprestada = False
+    snapshot = None
+
+    def close(self):
+        if not self.emprestada:
+            # Já devolvida (close duplo) ou fora do pool
+            if self.pool_key is None:
+                super().close()
+            return
+        self.emprestada = False
+        if not _release(self):
+            super().close()
+
+
+# Snapshots em memória ativos (ver adocoes.snapshot):
+# {caminho: {'arquivo', 'uri', 'geracao', 'conexao', 'disco', 'versao', 'lock', 'ativo'}}
+# 'disco' é a conexão com o arquivo usada por todas as escritas do processo
+# (uma transação de cada vez, sob 'lock'); 'versao' é o PRAGMA data_version
+# dela quando o snapshot foi sincronizado. Como commits da própria conexão não
+# mudam o data_version, ele só muda com escritas de outros processos.
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+# Comandos que só leem: vão para o snapshot. Na dúvida, é escrita (vai para o arquivo).
+_LEITURA = re.compile(r"\s*(SELECT|EXPLAIN)\b|\s*PRAGMA\s+[\w.]+\s*(\([^)]*\))?\s*;?\s*$", re.IGNORECASE)
+
+
+class SnapshotConnection(PooledConnection):
+    """
+    Conexão com o snapshot em memória de um arquivo. Leituras fora de
+    transação vêm da memória. Escritas vão para o arquivo pela conexão
+    'disco' do snapshot, presa a esta até o commit (ou rollback/close), e
+    ficam anotadas; as leituras seguintes da mesma transação também vão para
+    o arquivo, que já tem as escritas dela. No commit, o arquivo é
+    confirmado e as escritas são repetidas no snapshot numa transação curta.
+
+    Se a transação escreve mais que SNAPSHOT_MAX_ANOTADAS linhas (uma
+    importação de CSV, por exemplo) ou se outro processo escreveu no arquivo
+    desde a última sincronização, nada é repetido: o snapshot é recopiado do
+    arquivo (_copy_snapshot) e as anotações não ocupam memória.
+    """
+
+    _escrevendo = False
+    _recopiar = False
+    _anotadas = ()
+    _linhas = 0
+    _leitura = None
+
+    def cursor(self, factory=None):
+        return SnapshotCursor(self)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    @property
+    def in_transaction(self):
+        return (self._escrevendo and self.snapshot['disco'].in_transaction) or super().in_transaction
+
+    def _route(self, sql, parametros, varios, row_factory):
+        """Executa no snapshot ou no arquivo. Retorna o cursor usado."""
+        escrita = _LEITURA.match(sql) is None
+        if not escrita and not self.in_transaction:
+            if self.snapshot['ativo'] and self.pool_key == self.snapshot['uri']:
+                cursor = sqlite3.Connection.cursor(self)
+            else:
+                # Snapshot recopiado (esta conexão é da geração anterior) ou desligado
+                if self._leitura is None:
+                    self._leitura = get_db_connection(self.snapshot['arquivo'], disco=True)
+                cursor = self._leitura.cursor()
+            cursor.row_factory = row_factory
+            return _run(cursor, sql, parametros, varios)
+
+        if not self._escrevendo:
+            self._begin_write()
+        cursor = self.snapshot['disco'].cursor()
+        cursor.row_factory = row_factory
+        if not escrita:
+            return _run(cursor, sql, parametros, varios)
+
+        parametros, linhas = self._bound(parametros, varios)
+        try:
+            _run(cursor, sql, parametros, varios)
+        except Exception:
+            if not self.snapshot['disco'].in_transaction:
+                # Nada ficou no arquivo (comando avulso, ou a transação foi desfeita)
+                self._end_write(sincronizar=False)
+            raise
+        if not self._recopiar:
+            self._anotadas.append((sql, parametros, varios))
+            self._linhas += linhas
+        if not self.snapshot['disco'].in_transaction:
+            # Fora de transação (DDL) o arquivo já confirmou
+            self._end_write(sincronizar=True)
+        return cursor
+
+    def _begin_write(self):
+        """Prende a conexão do arquivo a esta (espera outra escrita do processo terminar)."""
+        if not self.snapshot['lock'].acquire(timeout=DB_TIMEOUT):
+            raise sqlite3.OperationalError("database is locked")
+        self._escrevendo = True
+        self._anotadas, self._linhas = [], 0
+        # Outro processo escreveu desde a última sincronização: repetir não basta
+        self._recopiar = _snapshot_version(self.snapshot) != self.snapshot['versao']
+
+    def _bound(self, parametros, varios):
+        """
+        Parâmetros a executar (uma lista, se couberem nas anotações) e
+        quantas linhas eles anotam. Passando de SNAPSHOT_MAX_ANOTADAS, as
+        anotações são descartadas e o snapshot será recopiado no commit.
+        """
+        if self._recopiar or not varios:
+            return parametros, 1
+        parametros = iter(parametros)
+        restantes = SNAPSHOT_MAX_ANOTADAS - self._linhas
+        inicio = list(itertools.islice(parametros, restantes + 1))
+        if len(inicio) > restantes:
+            self._recopiar, self._anotadas = True, []
+            return itertools.chain(inicio, parametros), 0
+        return inicio, len(inicio)
+
+    def _end_write(self, sincronizar):
+        """Leva as escritas confirmadas ao snapshot (se sincronizar) e solta a conexão do arquivo."""
+        anotadas, self._anotadas = self._anotadas, []
+        try:
+            if sincronizar and self.snapshot['ativo']:
+                if self._recopiar:
+                    _sync_snapshot(self.snapshot, _copy_snapshot)
+                elif anotadas:
+                    _sync_snapshot(self.snapshot, lambda snapshot: _replay(snapshot, anotadas))
+        finally:
+            self._escrevendo = self._recopiar = False
+            self.snapshot['lock'].release()
+
+    def commit(self):
+        if not self._escrevendo:
+            return super().commit()
+        self.snapshot['disco'].commit()
+        self._end_write(sincronizar=True)
+
+    def rollback(self):
+        if self._escrevendo:
+            try:
+                self.snapshot['disco'].rollback()
+            finally:
+                self._end_write(sincronizar=False)
+        super().rollback()
+
+    def __exit__(self, tipo, valor, traceback):
+        # O __exit__ do sqlite3 confirma só a conexão do snapshot, sem
+        # passar pelo commit/rollback desta classe
+        if tipo is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def close(self):
+        if self._escrevendo:
+            # O que não foi confirmado é desfeito
+            self.rollback()
+        if self._leitura is not None:
+            leitura, self._leitura = self._leitura, None
+            leitura.close()
+        super().close()
+
+
+class SnapshotCursor:
+    """Cursor de SnapshotConnection: repassa cada comando ao snapshot ou ao arquivo."""
+
+    def __init__(self, conn):
+        self.connection = conn
+        self.row_factory = conn.row_factory
+        self._cursor = sqlite3.Connection.cursor(conn)
+
+    def execute(self, sql, parameters=()):
+        self._cursor = self.connection._route(sql, parameters, False, self.row_factory)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._cursor = self.connection._route(sql, seq_of_parameters, True, self.row_factory)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+def _run(cursor, sql, parametros, varios):
+    return cursor.executemany(sql, parametros) if varios else cursor.execute(sql, parametros)
+
+# Cada cópia do snapshot é um memdb com nome novo (as conexões da cópia
+# anterior terminam o que estão lendo e são fechadas ao voltar ao pool)
+_geracoes = itertools.count(1)
+
+def _snapshot_uri(key, geracao):
+    # Nome começando com '/' = memdb compartilhado entre as conexões do processo
+    return f"file:/adocoes-{hashlib.sha1(key.encode()).hexdigest()[:16]}-{geracao}?vfs=memdb"
+
+def _snapshot_version(snapshot):
+    return snapshot['disco'].execute("PRAGMA data_version").fetchone()[0]
+
+def _new_snapshot(key):
+    """Copia o arquivo para um snapshot novo (ainda não registrado em _snapshots)."""
+    disco = _new_connection(key, None)
+    snapshot = {
+        'arquivo': key, 'uri': None, 'geracao': None, 'conexao': None, 'disco': disco, 'versao': None,
+        'lock': threading.Lock(), 'ativo': True,
+    }
+    try:
+        with snapshot['lock']:
+            _copy_snapshot(snapshot)
+    except Exception:
+        sqlite3.Connection.close(disco)
+        raise
+    return snapshot
+
+def _copy_snapshot(snapshot):
+    """
+    Troca o snapshot por uma cópia nova do arquivo (VACUUM INTO um memdb
+    novo: a cópia fica toda no SQLite, sem passar pela memória do Python).
+    Chamar com snapshot['lock'] e sem transação aberta em snapshot['disco'].
+    """
+    geracao = next(_geracoes)
+    uri = _snapshot_uri(snapshot['arquivo'], geracao)
+    # Mantém o memdb vivo enquanto esta for a cópia em uso
+    conexao = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    try:
+        # Lida antes da cópia: um commit de outro processo no meio força outra cópia, nunca se perde
+        versao = _snapshot_version(snapshot)
+        snapshot['disco'].execute("VACUUM INTO ?", (uri,))
+    except Exception:
+        conexao.close()
+        raise
+    uri_antiga, antiga = snapshot['uri'], snapshot['conexao']
+    snapshot.update(uri=uri, geracao=geracao, conexao=conexao, versao=versao)
+    if antiga is not None:
+        _close_pool(uri_antiga)
+        antiga.close()
+
+def _replay(snapshot, anotadas):
+    """Repete no snapshot as escritas já confirmadas no arquivo."""
+    conexao = snapshot['conexao']
+    cursor = conexao.cursor()
+    try:
+        for sql, parametros, varios in anotadas:
+            _run(cursor, sql, parametros, varios)
+        conexao.commit()
+    except sqlite3.Error:
+        conexao.rollback()
+        raise
+
+def _sync_snapshot(snapshot, sincronizar):
+    """Roda sincronizar(snapshot); se falhar, o snapshot é desligado e tudo volta a ler do arquivo."""
+    try:
+        sincronizar(snapshot)
+    except sqlite3.Error as e:
+        _drop_snapshot(snapshot)
+        warnings.warn(f"Snapshot em memória de {snapshot['arquivo']} desativado: {e}", RuntimeWarning)
+
+def _check_snapshot(snapshot):
+    """Recopia o snapshot se outro processo escreveu no arquivo (sem esperar escritas em andamento)."""
+    if not snapshot['lock'].acquire(blocking=False):
+        # Quem está escrevendo confere a versão no início da transação
+        return
+    try:
+        if snapshot['ativo'] and _snapshot_version(snapshot) != snapshot['versao']:
+            _sync_snapshot(snapshot, _copy_snapshot)
+    finally:
+        snapshot['lock'].release()
+
+def _new_connection(db_name, key, snapshot=None):
+    conn = sqlite3.connect(
+        snapshot['uri'] if snapshot else db_name, timeout=DB_TIMEOUT, check_same_thread=False,
+        factory=SnapshotConnection if snapshot else PooledConnection, uri=snapshot is not None,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma, valor in DB_PRAGMAS.items():
+        if pragma == 'journal_mode' and (key is None or snapshot):
+            continue
+        sqlite3.Connection.execute(conn, f"PRAGMA {pragma} = {valor}")
+    conn.pool_key = key
+    conn.emprestada = key is not None
+    conn.snapshot = snapshot
+    return conn
+
+def _pool(key):
+    """Pool do arquivo (recriado depois de um fork: conexões não passam entre processos)."""
+    pool = _pools.get(key)
+    if pool is None or pool['pid'] != os.getpid():
+        pool = _pools[key] = {'pid': os.getpid(), 'livres': []}
+    return pool
+
+def _release(conn):
+    """Devolve a conexão ao pool; retorna False se ela deve ser fechada."""
+    if conn.snapshot is not None and (not conn.snapshot['ativo'] or conn.pool_key != conn.snapshot['uri']):
+        return False
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = sqlite3.Row
+    except sqlite3.Error:
+        return False
+    with _pools_lock:
+        pool = _pool(conn.pool_key)
+        if len(pool['livres']) >= POOL_TAMANHO:
+            return False
+        pool['livres'].append(conn)
+        return True
+
+@timed('db.get_db_connection')
+def get_db_connection(db_name=None, disco=False):
+    """
+    Retorna uma conexão com o banco de dados SQLite, reaproveitada do pool do
+    processo quando houver uma livre. conn.close() a devolve ao pool;
+    transações não confirmadas são desfeitas nessa hora.
+    Com um snapshot em memória ativo (adocoes.snapshot), a conexão lê da
+    memória e grava no arquivo; disco=True pede uma conexão direto com o arquivo.
+    """
+    db_name = db_name or DB_NAME
+    key = db_path(db_name)
+    if key == ':memory:':
+        # Cada conexão ':memory:' é um banco próprio; não faz sentido reaproveitar
+        return _new_connection(db_name, None)
+
+    snapshot = None if disco else _snapshots.get(key)
+    if snapshot is not None:
+        _check_snapshot(snapshot)
+        if not snapshot['ativo']:
+            snapshot = None
+    pool_key = snapshot['uri'] if snapshot else key
+    with _pools_lock:
+        livres = _pool(pool_key)['livres']
+        conn = livres.pop() if livres else None
+    if conn is None:
+        return _new_connection(db_name, pool_key, snapshot)
+    conn.emprestada = True
+    return conn
+
+def _close_pool(pool_key):
+    with _pools_lock:
+        pool = _pools.pop(pool_key, None)
+    if pool is not None and pool['pid'] == os.getpid():
+        for conn in pool['livres']:
+            sqlite3.Connection.close(conn)
+
+def close_connections(db_name=None):
+    """Fecha as conexões livres do pool (por exemplo, antes de trocar o arquivo do banco)."""
+    key = db_path(db_name)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        _close_pool(snapshot['uri'])
+    _close_pool(key)
+
+def _drop_snapshot(snapshot):
+    """
+    Tira o snapshot de uso: conexões novas voltam a ler do arquivo. A
+    conexão 'disco' fica aberta para as conexões do snapshot ainda
+    emprestadas terminarem as suas escritas.
+    """
+    snapshot['ativo'] = False
+    if _snapshots.get(snapshot['arquivo']) is snapshot:
+        del _snapshots[snapshot['arquivo']]
+    _close_pool(snapshot['uri'])
+
+def _snapshot_size(snapshot):
+    conexao = snapshot['conexao']
+    return conexao.execute("PRAGMA page_count").fetchone()[0] * conexao.execute("PRAGMA page_size").fetchone()[0]
+
+def snapshot_enabled(db_name=None):
+    """Se as leituras do banco estão vindo de um snapshot em memória."""
+    return db_path(db_name) in _snapshots
+
+def open_snapshot(db_name=None):
+    """
+    Copia o banco para um snapshot em memória e passa a servir as leituras
+    dele (não faz nada se já estiver ativo). Retorna o tamanho em bytes.
+    """
+    key = db_path(db_name)
+    if key == ':memory:':
+        raise ValueError("O banco ':memory:' já está em memória.")
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            # Commits entre a cópia e o registro mudam o data_version: a
+            # primeira conexão pedida depois recopia
+            snapshot = _snapshots[key] = _new_snapshot(key)
+        return _snapshot_size(snapshot)
+
+def refresh_snapshot(db_name=None):
+    """Recopia o snapshot do arquivo agora. Retorna se ele continua ativo (False se não havia)."""
+    snapshot = _snapshots.get(db_path(db_name))
+    if snapshot is None:
+        return False
+    with snapshot['lock']:
+        if snapshot['ativo']:
+            _sync_snapshot(snapshot, _copy_snapshot)
+        return snapshot['ativo']
+
+def close_snapshot(db_name=None):
+    """Desliga o snapshot: conexões novas voltam a ler do arquivo."""
+    with _snapshots_lock:
+        snapshot = _snapshots.get(db_path(db_name))
+        if snapshot is None:
+            return
+        with snapshot['lock']:
+            _drop_snapshot(snapshot)
+            snapshot['conexao'].close()
+
+def init_db(db_name=None, force=False):
+    """
+    Inicializa o banco de dados e executa a migração, adicionando colunas
+    que não existem sem apagar dados.
+
+    Roda no máximo uma vez por processo e arquivo: as chamadas seguintes (a
+    cada rerun do Streamlit) retornam sem abrir conexão. Bancos que já estão
+    em SCHEMA_VERSION também pulam a migração (basta ler o user_version).
+    """
+    key = db_path(db_name)
+    # ':memory:' é um banco novo a cada conexão; não há o que lembrar
+    lembrar = key != ':memory:'
+
+    with _migrados_lock:
+        if lembrar and key in _migrados and not force:
+            return
+
+        conn = get_db_connection(db_name)
+        try:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            if versao < SCHEMA_VERSION or force:
+                # Uma transação só (DDL também é transacional no SQLite): se
+                # algo falhar, nada fica pela metade e a próxima execução
+                # refaz a migração inteira, preenchimentos incluídos
+                conn.execute("BEGIN")
+                try:
+                    _migrate(conn.cursor())
+                    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        finally:
+            conn.close()
+
+        if lembrar:
+            _migrados.add(key)
+
+def _migrate(cursor):
+    """Cria as tabelas e adiciona as colunas que faltam (idempotente)."""
+    # --- Tabela Adotantes ---
+    # CORREÇÃO 1: Removido 'UNIQUE' da coluna 'nome'
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS adotantes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL
+    );
+    ''')
+    
+    # Pega colunas existentes
+    cursor.execute("PRAGMA table_info(adotantes)")
+    existing_cols_adotantes = [col['name'] for col in cursor.fetchall()]
+
+    # Define colunas necessárias (Nome já existe)
+    # Adiciona 'contato' e 'tipo' manually
+    required_cols_adotantes = {
+        "contato": "TEXT",
+        "tipo": "TEXT DEFAULT 'cão'" # Valor padrão 'cão'
+    }
+    
+    # Adiciona as 10 features, códigos e pesos
+    for feature in COLUNAS_FEATURES:
+        map_ = CARACTERISTICAS[feature]['map']
+        default_peso = str(5) * len(list(map_.values())[0]) 
+        
+        required_cols_adotantes[feature] = "TEXT"
+        required_cols_adotantes[f"codigo_{feature}"] = "TEXT"
+        required_cols_adotantes[f"peso_{feature}"] = f"TEXT DEFAULT '{default_peso}'"
+        # Representação inteira usada no score (índice do '1' e peso 0-10)
+        required_cols_adotantes[f"indice_{feature}"] = "INTEGER"
+        # Sem default: peso legado malformado fica NULL (vetor inválido)
+        required_cols_adotantes[f"peso_num_{feature}"] = "INTEGER"
+
+    # Adiciona colunas faltantes para Adotantes
+    for col, type_ in required_cols_adotantes.items():
+        if col not in existing_cols_adotantes:
+            try:
+                cursor.execute(f"ALTER TABLE adotantes ADD COLUMN {col} {type_}")
+            except sqlite3.OperationalError:
+                # Coluna pode já existir de uma execução anterior falha
+                continue
+            # Fora do try: um erro no preenchimento não pode passar calado
+            _backfill_integer_column(cursor, 'adotantes', col)
+
+    # Bancos migrados antes da versão 7 receberam peso_num_* = 5 (default)
+    # onde o peso legado era malformado: esses voltam a NULL
+    for feature in COLUNAS_FEATURES:
+        codigo, peso, col = f"codigo_{feature}", f"peso_{feature}", f"peso_num_{feature}"
+        cursor.execute(f"""
+            UPDATE adotantes SET {col} = NULL
+            WHERE {col} IS NOT NULL AND {peso} IS NOT {_repeat_sql(f"CAST({col} AS TEXT)", f"length({codigo})")}
+        """)
+
+    # --- Tabela Animais ---
+    # CORREÇÃO 1: Removido 'UNIQUE' da coluna 'nome'
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS animais (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL
+    );
+    ''')
+
+    # Pega colunas existentes
+    cursor.execute("PRAGMA table_info(animais)")
+    existing_cols_animais = [col['name'] for col in cursor.fetchall()]
+
+    # Define colunas necessárias (Nome já existe)
+    # Adiciona 'tipo' manualmente
+    required_cols_animais = {
+        "tipo": "TEXT DEFAULT 'cão'" # Valor padrão 'cão'
+    }
+    # Adiciona as 10 features e códigos
+    for feature in COLUNAS_FEATURES:
+        required_cols_animais[feature] = "TEXT"
+        required_cols_animais[f"codigo_{feature}"] = "TEXT"
+        required_cols_animais[f"indice_{feature}"] = "INTEGER"
+
+    # Adiciona colunas faltantes para Animais
+    for col, type_ in required_cols_animais.items():
+        if col not in existing_cols_animais:
+            try:
+                cursor.execute(f"ALTER TABLE animais ADD COLUMN {col} {type_}")
+            except sqlite3.OperationalError:
+                continue
+            _backfill_integer_column(cursor, 'animais', col)
+
+    # --- Índices (filtros e ordenação da visualização paginada, load_tipo) ---
+    # Todo índice do SQLite termina no rowid (id), então (coluna) já serve
+    # para ORDER BY coluna, id.
+    for table_name in ('adotantes', 'animais'):
+        for col in INDEXED_COLUMNS:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_{col} ON {table_name} ({col})")
+        # Filtro por tipo com ordenação por nome (o caso mais comum da visualização)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_tipo_nome ON {table_name} (tipo, nome)")
+
+    # --- Compatibilidade materializada (ver adocoes.materialized) ---
+    # Top-k (com empates) de cada adotante; a leitura da página é por (adotante_id, score)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS compatibilidade (
+        adotante_id INTEGER NOT NULL,
+        animal_id INTEGER NOT NULL,
+        score REAL NOT NULL,
+        PRIMARY KEY (adotante_id, animal_id)
+    ) WITHOUT ROWID;
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_compatibilidade_ordem ON compatibilidade (adotante_id, score DESC, animal_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_compatibilidade_animal ON compatibilidade (animal_id)")
+    # Uma linha por adotante já calculado: menor score da lista, tamanho e o k usado
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS compatibilidade_limites (
+        adotante_id INTEGER PRIMARY KEY,
+        limite REAL,
+        quantidade INTEGER NOT NULL,
+        top_k INTEGER NOT NULL
+    );
+    ''')
+
+    # --- Busca por nome (ver adocoes.search) ---
+    for table_name, colunas in COLUNAS_BUSCA.items():
+        _create_search_index(cursor, table_name, colunas)
+
+    # --- Versão dos dados (ver table_version) ---
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS versoes (
+        tabela TEXT PRIMARY KEY,
+        versao INTEGER NOT NULL DEFAULT 0
+    );
+    ''')
+    for table_name in TABELAS_VERSIONADAS:
+        _create_version_triggers(cursor, table_name)
+
+def _create_search_index(cursor, table_name, colunas):
+    """
+    Índice FTS5 busca_<tabela> sobre 'colunas', de conteúdo externo (guarda
+    só o índice; o texto fica na tabela), mantido em dia por gatilhos, e o
+    vocabulário dele (busca_<tabela>_termos) para a busca aproximada.
+    """
+    fts = f"busca_{table_name}"
+    cols = ", ".join(colunas)
+    novos = ", ".join(f"new.{col}" for col in colunas)
+    velhos = ", ".join(f"old.{col}" for col in colunas)
+    existia = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+    try:
+        # Sem diferenciar acentos; prefixos de 1 a 3 letras têm índice próprio
+        cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table_name}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )
+        """)
+    except sqlite3.OperationalError:
+        # SQLite sem FTS5: a busca usa LIKE (mais lenta)
+        return
+    cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts}_termos USING fts5vocab({fts}, 'row')")
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table_name} BEGIN
+        INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {novos});
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table_name} BEGIN
+        INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {velhos});
+    END
+    """)
+    cursor.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table_name} BEGIN
+        INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {velhos});
+        INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {novos});
+    END
+    """)
+    if not existia:
+        # Tabela já com dados: indexa tudo de uma vez
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _create_version_triggers(cursor, table_name):
+    """
+    Gatilhos que incrementam a versão da tabela (em 'versoes') a cada linha
+    inserida, alterada ou apagada, por qualquer conexão ou processo.
+    """
+    cursor.execute("INSERT OR IGNORE INTO versoes (tabela, versao) VALUES (?, 0)", (table_name,))
+    for evento in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS versao_{table_name}_{evento.lower()} AFTER {evento} ON {table_name} BEGIN
+            UPDATE versoes SET versao = versao + 1 WHERE tabela = '{table_name}';
+        END
+        """)
+
+def _backfill_integer_column(cursor, table_name, col):
+    """
+    Preenche uma coluna inteira recém-criada a partir do texto legado:
+    indice_* = posição do '1' no código; peso_num_* = peso repetido ('888' -> 8,
+    '1010' -> 10). Códigos inválidos e pesos fora do formato (um peso de 0 a
+    10 repetido uma vez por posição do código, como csv_import exige) ficam
+    NULL, e o adotante conta como vetor inválido.
+    """
+    if col.startswith('indice_'):
+        codigo = f"codigo_{col[len('indice_'):]}"
+        cursor.execute(f"""
+            UPDATE {table_name} SET {col} = NULLIF(instr({codigo}, '1'), 0) - 1
+            WHERE length({codigo}) - length(replace({codigo}, '1', '')) = 1
+              AND replace(replace({codigo}, '0', ''), '1', '') = ''
+        """)
+    elif col.startswith('peso_num_'):
+        feature = col[len('peso_num_'):]
+        codigo, peso = f"codigo_{feature}", f"peso_{feature}"
+        valor = f"CAST(substr({peso}, 1, length({peso}) / length({codigo})) AS INTEGER)"
+        cursor.execute(f"""
+            UPDATE {table_name} SET {col} = {valor}
+            WHERE length({codigo}) > 0 AND {valor} BETWEEN 0 AND 10
+              AND {peso} = {_repeat_sql(f"CAST({valor} AS TEXT)", f"length({codigo})")}
+        """)
+
+def _repeat_sql(texto, vezes):
+    """Expressão SQL com 'texto' repetido 'vezes' vezes (o SQLite não tem repeat)."""
+    return f"replace(printf('%.*c', {vezes}, 'x'), 'x', {texto})"
+
+def _where(filtros):
+    """Cláusula WHERE (com parâmetros) para filtros de igualdade {coluna: valor}."""
+    partes = [f"{col} = ?" for col in filtros]
+    return partes, list(filtros.values())
+
+def _keyset_segments(ordem, decrescente, apos):
+    """
+    Condições de "depois de 'apos'" para a ordenação (ordem, id), em trechos
+    consultados em sequência. NULLs vêm primeiro na ordem crescente e por
+    último na decrescente, como no SQLite; separar o trecho dos NULLs deixa
+    cada consulta usar o índice da coluna com a comparação de tupla.
+    """
+    if apos is None:
+        return [(None, [])]
+    valor, id_ = apos
+    op = '<' if decrescente else '>'
+    if ordem == 'id':
+        return [(f"id {op} ?", [id_])]
+    if valor is None:
+        nulos = (f"{ordem} IS NULL AND id {op} ?", [id_])
+        return [nulos] if decrescente else [nulos, (f"{ordem} IS NOT NULL", [])]
+    depois = (f"({ordem}, id) {op} (?, ?)", [valor, id_])
+    return [depois, (f"{ordem} IS NULL", [])] if decrescente else [depois]
+
+@timed('db.load_page', linhas=lambda resultado: len(resultado[0]))
+def load_page(conn, table_name, colunas, filtros=None, ordem='id', decrescente=False, apos=None, limite=50):
+    """
+    Uma página de registros com paginação por chave (keyset): em vez de
+    OFFSET, a página seguinte começa depois da chave (valor de 'ordem', id)
+    da última linha da anterior, então cada página lê só as suas linhas.
+    As colunas de 'colunas', 'filtros' e 'ordem' devem vir de uma lista
+    conhecida (entram no SQL sem parâmetros).
+    Retorna (DataFrame, chave da última linha ou None se não houver mais).
+    """
+    filtro_partes, filtro_params = _where(filtros or {})
+    direcao = 'DESC' if decrescente else 'ASC'
+    chave = f"id {direcao}" if ordem == 'id' else f"{ordem} {direcao}, id {direcao}"
+    cols = list(dict.fromkeys(['id', ordem] + list(colunas)))
+
+    # Uma linha a mais para saber se existe próxima página
+    faltam = limite + 1
+    partes_df = []
+    for condicao, params in _keyset_segments(ordem, decrescente, apos):
+        partes = filtro_partes + ([condicao] if condicao else [])
+        where = f"WHERE {' AND '.join(partes)}" if partes else ""
+        query = f"SELECT {', '.join(cols)} FROM {table_name} {where} ORDER BY {chave} LIMIT ?"
+        parte = pd.read_sql_query(query, conn, params=filtro_params + params + [faltam])
+        partes_df.append(parte)
+        faltam -= len(parte)
+        if faltam == 0:
+            break
+    df = pd.concat(partes_df, ignore_index=True) if len(partes_df) > 1 else partes_df[0]
+
+    proxima = None
+    if len(df) > limite:
+        df = df.iloc[:limite]
+        ultima = df.iloc[-1]
+        valor = ultima[ordem]
+        if pd.isna(valor):
+            valor = None
+        elif hasattr(valor, 'item'):
+            valor = valor.item()  # numpy -> tipo Python para o sqlite3
+        proxima = (valor, int(ultima['id']))
+    return df[list(colunas)], proxima
+
+@timed('db.count_rows')
+def count_rows(conn, table_name, filtros=None):
+    """Quantidade de registros que passam pelos filtros {coluna: valor}."""
+    partes, params = _where(filtros or {})
+    where = f"WHERE {' AND '.join(partes)}" if partes else ""
+    return conn.execute(f"SELECT COUNT(*) FROM {table_name} {where}", params).fetchone()[0]
+
+@timed('db.load_tipo', linhas=len)
+def load_tipo(conn, table_name, tipo):
+    """Carrega (ordenado por id) os registros de um tipo com as colunas do score."""
+    cols = ['id', 'nome'] + COLUNAS_INDICE
+    if table_name == 'adotantes':
+        cols = ['id', 'nome', 'contato'] + COLUNAS_INDICE + COLUNAS_PESO_NUM
+    query = f"SELECT {', '.join(cols)} FROM {table_name} WHERE tipo = ? ORDER BY id"
+    return pd.read_sql_query(query, conn, params=(tipo,))
+
+def table_version(conn, table_name):
+    """
+    Versão dos dados da tabela (ver TABELAS_VERSIONADAS): muda a cada
+    escrita, de qualquer processo. Para saber se um cache em memória ficou
+    velho sem reler a tabela.
+    """
+    linha = conn.execute("SELECT versao FROM versoes WHERE tabela = ?", (table_name,)).fetchone()
+    return linha[0] if linha else 0
+
+def bump_version(cursor, table_name):
+    """Incrementa a versão da tabela, para escritas feitas sem os gatilhos (ver csv_import)."""
+    cursor.execute("UPDATE versoes SET versao = versao + 1 WHERE tabela = ?", (table_name,))
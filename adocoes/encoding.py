@@ -0,0 +1,85 @@
+"""
+Conversão entre o formato texto (códigos '010', pesos '888') e a
+representação inteira guardada no banco (índice do '1' e peso 0-10).
+
+O texto continua sendo o formato do CSV; o score usa só os inteiros.
+"""
+
+import numpy as np
+import pandas as pd
+
+from adocoes.config import (
+    COLUNAS_FEATURES, COLUNAS_INDICE, COLUNAS_PESO_NUM,
+    TAMANHOS_CODIGO, OFFSETS_CODIGO, TAMANHO_VETOR,
+)
+
+
+def indice_from_codigo(codigo):
+    """Posição do '1' num código one-hot ('010' -> 1); None se inválido."""
+    if not isinstance(codigo, str) or codigo.count('1') != 1 or set(codigo) - {'0', '1'}:
+        return None
+    return codigo.index('1')
+
+def peso_from_text(peso, codigo):
+    """Peso inteiro a partir do texto repetido ('888' -> 8, '1010' -> 10); None se inválido."""
+    if not isinstance(peso, str) or not isinstance(codigo, str) or not codigo:
+        return None
+    trecho = peso[:len(peso) // len(codigo)]
+    return int(trecho) if trecho.isdigit() else None
+
+def peso_to_text(peso, codigo):
+    """Texto do peso no formato legado (8, '100' -> '888')."""
+    return str(peso) * len(codigo)
+
+def add_integer_columns(df, table_name):
+    """
+    Acrescenta ao DataFrame (colunas de texto) as colunas indice_* e,
+    para adotantes, peso_num_*. Vetorizado; valores inválidos viram nulos.
+    """
+    df = df.copy()
+    for feature, indice_col in zip(COLUNAS_FEATURES, COLUNAS_INDICE):
+        codigo = df[f"codigo_{feature}"].astype('string')
+        valido = codigo.str.fullmatch(r'0*10*').fillna(False).astype(bool)
+        df[indice_col] = codigo.str.find('1').where(valido).astype('Int64')
+
+    if table_name == 'adotantes':
+        for feature, peso_col in zip(COLUNAS_FEATURES, COLUNAS_PESO_NUM):
+            codigo = df[f"codigo_{feature}"].astype('string')
+            peso = df[f"peso_{feature}"].astype('string')
+            # Pesos 0-9 ocupam 1 caractere por posição; o peso 10 ocupa 2
+            tamanho_peso = peso.str.len()
+            tamanho_codigo = codigo.str.len()
+            trecho = peso.str[:1].where(tamanho_peso == tamanho_codigo, peso.str[:2].where(tamanho_peso == 2 * tamanho_codigo))
+            df[peso_col] = pd.to_numeric(trecho, errors='coerce').astype('Int64')
+
+    return df
+
+def one_hot_matrix(indices):
+    """
+    Matriz de códigos (n, 21) a partir dos índices (n, 10).
+    Retorna (matriz int8, máscara de linhas válidas).
+    """
+    indices = np.asarray(indices, dtype=np.float64)
+    tamanhos = np.array(TAMANHOS_CODIGO)
+    valid = ~np.isnan(indices).any(axis=1)
+    valid &= ((indices >= 0) & (indices < tamanhos)).all(axis=1)
+
+    matriz = np.zeros((len(indices), TAMANHO_VETOR), dtype=np.int8)
+    linhas = np.flatnonzero(valid)
+    if len(linhas):
+        posicoes = indices[linhas].astype(np.int64) + np.array(OFFSETS_CODIGO)
+        matriz[linhas[:, None], posicoes] = 1
+    return matriz, valid
+
+def weight_matrix(pesos):
+    """
+    Matriz de pesos (n, 21) a partir dos pesos por característica (n, 10).
+    Retorna (matriz int8, máscara de linhas válidas).
+    """
+    pesos = np.asarray(pesos, dtype=np.float64)
+    valid = ~np.isnan(pesos).any(axis=1)
+    valid &= ((pesos >= 0) & (pesos <= 10)).all(axis=1)
+
+    matriz = np.zeros((len(pesos), TAMANHO_VETOR), dtype=np.int8)
+    matriz[valid] = np.repeat(pesos[valid].astype(np.int8), TAMANHOS_CODIGO, axis=1)
+    return matriz, valid
@@ -0,0 +1,138 @@
+"""
+Exportação das tabelas em CSV ou Parquet, lendo o SQLite em lotes.
+
+As linhas vêm de cursor.fetchmany e são gravadas direto no arquivo de
+destino (export_table), então nem a tabela inteira nem o arquivo inteiro
+precisam estar em memória. O Parquet (colunar, bem mais rápido de carregar
+em análises) usa o pyarrow, que é opcional: sem ele só o CSV fica
+disponível.
+
+No app isso não vale até o fim: o st.download_button guarda o arquivo
+inteiro na memória do servidor, qualquer que seja o 'data' recebido. O
+app usa export_bytes, que grava num arquivo temporário e devolve os bytes;
+só quem grava num arquivo próprio (scripts, jobs) exporta sem carregar o
+arquivo na memória.
+
+Colunas exportadas: id mais as do CSV de importação, então o arquivo pode
+voltar tanto na substituição quanto na mescla por id.
+"""
+
+import csv
+import io
+import tempfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional
+    pa = pq = None
+
+from adocoes.config import CSV_COLS_ANIMAIS, CSV_COLS_ADOTANTES, EXPORT_LINHAS_POR_LOTE
+from adocoes.db import get_db_connection
+from adocoes.metrics import span
+
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def available_formats():
+    """Formatos suportados neste ambiente ('parquet' só com pyarrow)."""
+    return ['csv', 'parquet'] if pq is not None else ['csv']
+
+def export_columns(table_name):
+    """Colunas exportadas de uma tabela (id + colunas do CSV)."""
+    if table_name == 'animais':
+        return ['id'] + CSV_COLS_ANIMAIS
+    if table_name == 'adotantes':
+        return ['id'] + CSV_COLS_ADOTANTES
+    raise ValueError(f"Tabela '{table_name}' desconhecida.")
+
+def _batches(conn, table_name, colunas, linhas_por_lote):
+    """Gera lotes de linhas (tuplas) da tabela, em ordem de id."""
+    cursor = conn.cursor()
+    # Tuplas simples: sqlite3.Row custa caro linha a linha
+    cursor.row_factory = None
+    cursor.execute(f"SELECT {', '.join(colunas)} FROM {table_name} ORDER BY id")
+    while True:
+        lote = cursor.fetchmany(linhas_por_lote)
+        if not lote:
+            return
+        yield lote
+
+def _write_csv(lotes, colunas, destino):
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(texto, lineterminator='\n')
+        writer.writerow(colunas)
+        for lote in lotes:
+            writer.writerows(lote)
+        texto.flush()
+    finally:
+        # Devolve o arquivo binário sem fechá-lo
+        texto.detach()
+
+def _write_parquet(lotes, colunas, destino):
+    if pq is None:
+        raise RuntimeError("Exportar em Parquet requer o pacote 'pyarrow'.")
+    schema = pa.schema([(col, pa.int64() if col == 'id' else pa.string()) for col in colunas])
+    with pq.ParquetWriter(destino, schema) as writer:
+        for lote in lotes:
+            arrays = [pa.array(valores, type=campo.type) for valores, campo in zip(zip(*lote), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+def export_table(conn, table_name, formato, destino, linhas_por_lote=EXPORT_LINHAS_POR_LOTE):
+    """
+    Grava a tabela em 'destino' (arquivo binário aberto) no formato 'csv'
+    ou 'parquet'. Retorna o número de linhas exportadas.
+    """
+    colunas = export_columns(table_name)
+    total = 0
+
+    def contar(lotes):
+        nonlocal total
+        for lote in lotes:
+            total += len(lote)
+            yield lote
+
+    if formato not in ('csv', 'parquet'):
+        raise ValueError(f"Formato desconhecido: '{formato}'. Use um de {available_formats()}.")
+
+    with span(f"export.export_table.{formato}") as medida:
+        inicio = destino.tell()
+        lotes = contar(_batches(conn, table_name, colunas, linhas_por_lote))
+        if formato == 'csv':
+            _write_csv(lotes, colunas, destino)
+        else:
+            _write_parquet(lotes, colunas, destino)
+        medida['linhas'] = total
+        medida['bytes'] = destino.tell() - inicio
+    return total
+
+def export_to_tempfile(table_name, formato, db_name=None):
+    """
+    Exporta a tabela para um arquivo temporário em disco (apagado ao ser
+    fechado) e o devolve posicionado no início. Quem chama deve fechá-lo
+    (with export_to_tempfile(...) as arquivo: ...).
+    """
+    destino = tempfile.TemporaryFile(suffix=f".{formato}")
+    conn = get_db_connection(db_name)
+    try:
+        export_table(conn, table_name, formato, destino)
+    except Exception:
+        destino.close()
+        raise
+    finally:
+        conn.close()
+    destino.seek(0)
+    return destino
+
+def export_bytes(table_name, formato, db_name=None):
+    """
+    Conteúdo exportado da tabela, em bytes, para o st.download_button (que
+    guarda o arquivo inteiro em memória de qualquer forma). A exportação
+    passa por um arquivo temporário, fechado (e apagado) antes de retornar.
+    """
+    with export_to_tempfile(table_name, formato, db_name) as arquivo:
+        return arquivo.read()
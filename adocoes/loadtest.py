@@ -0,0 +1,392 @@
+"""
+Teste de carga do app: N usuários simultâneos navegando pelas páginas do
+menu lateral (paginas, em app.py) sobre um banco semeado.
+
+Cada usuário é uma sessão da AppTest do Streamlit num processo próprio (a
+AppTest troca estado global do Streamlit a cada rerun, então não roda em
+paralelo dentro de um processo). Todos os processos usam o mesmo arquivo
+SQLite, que é onde as sessões disputam de verdade; os caches em memória
+(animais, listas por perfil, snapshot) ficam um por sessão, e não um para
+todas como num servidor Streamlit, então há mais faltas de cache que em
+produção.
+
+Cada usuário, com a sua semente, sorteia páginas por peso (PESOS_PAGINAS) e
+segue o roteiro de cada uma (ROTEIROS): abrir a página, buscar um registro,
+enviar o formulário, atualizar... Cada passo é um rerun, e o tempo medido é
+o do rerun inteiro na AppTest (sem rede nem navegador).
+
+O relatório traz:
+- p50/p95/p99/máximo por página e passo, e erros (exceções e st.error);
+- disputa pelo lock de escrita do SQLite: uma sonda no processo principal
+  abre BEGIN IMMEDIATE a cada SONDA_INTERVALO_S e mede a espera (quanto
+  um escritor esperaria naquele momento), mais os erros "database is locked"
+  vistos pelas sessões;
+- as operações internas (adocoes.metrics) de todas as sessões juntas.
+
+Uso:
+    python -m adocoes.loadtest --usuarios 12 --acoes 30 --animais 10000
+    python -m adocoes.loadtest --usuarios 12 --banco adocoes.db --saida carga.json
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from adocoes import metrics, records
+from adocoes.benchmark import environment, PROPORCAO_ADOTANTES
+from adocoes.config import DB_NAME, DB_TIMEOUT, TIPO_OPTIONS
+from adocoes.db import init_db, close_connections
+from adocoes.synthetic import write_dataset
+
+FORMATO_VERSAO = 1
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+# Peso de cada página no sorteio (as de CSV e diagnóstico ficam de fora)
+PESOS_PAGINAS = {
+    "Ver tabela de adotantes": 1,
+    "Ver tabela de animais": 2,
+    "Acrescentar um adotante": 1,
+    "Acrescentar um animal": 1,
+    "Editar dados do adotante": 1,
+    "Editar dados do animal": 1,
+    "Animais compatíveis": 3,
+    "Adotantes compatíveis": 1,
+}
+
+# Intervalo (s) entre as medidas da sonda do lock de escrita
+SONDA_INTERVALO_S = 0.05
+# Espera acima disso (s) conta como lock ocupado (sem disputa, o BEGIN leva µs)
+SONDA_OCUPADO_S = 0.001
+# Espera máxima (s) para todas as sessões abrirem o app antes de começar
+ESPERA_INICIO_S = 600
+
+# Barreira de início (preenchida em cada processo por _init_worker)
+_worker = {}
+
+
+def _fill_animal(at, rng, contagens):
+    at.text_input[0].input(f"Carga {rng.randrange(10 ** 6)}")
+    at.selectbox(key="form_tipo").set_value(rng.choice(TIPO_OPTIONS))
+    _click("Enviar")(at, rng, contagens)
+
+def _fill_adotante(at, rng, contagens):
+    at.text_input[0].input(f"Carga {rng.randrange(10 ** 6)}")
+    at.text_input[1].input(f"carga{rng.randrange(10 ** 6)}@exemplo.org")
+    at.selectbox(key="form_tipo").set_value(rng.choice(TIPO_OPTIONS))
+    _click("Enviar")(at, rng, contagens)
+
+def _picker(key, tabela):
+    """Digita um id sorteado na busca (app.record_picker) de 'key'."""
+    def preparar(at, rng, contagens):
+        at.text_input(key=f"{key}_texto").input(str(rng.randint(1, max(contagens[tabela], 1))))
+    return preparar
+
+def _click(rotulo):
+    def preparar(at, rng, contagens):
+        for botao in at.button:
+            if botao.label == rotulo:
+                botao.click()
+                return
+        raise LookupError(f"Botão '{rotulo}' não está na página.")
+    return preparar
+
+# Passos de cada página depois de abri-la: [(passo, preparar(at, rng, contagens))]
+ROTEIROS = {
+    "Ver tabela de adotantes": [],
+    "Ver tabela de animais": [],
+    "Acrescentar um adotante": [('enviar', _fill_adotante)],
+    "Acrescentar um animal": [('enviar', _fill_animal)],
+    "Editar dados do adotante": [('buscar', _picker('busca_adotantes', 'adotantes')), ('atualizar', _click("Atualizar"))],
+    "Editar dados do animal": [('buscar', _picker('busca_animais', 'animais')), ('atualizar', _click("Atualizar"))],
+    "Animais compatíveis": [('buscar', _picker('busca_compat_adotante', 'adotantes'))],
+    "Adotantes compatíveis": [('buscar', _picker('busca_compat_animal', 'animais'))],
+}
+
+
+def _init_worker(barreira):
+    _worker['barreira'] = barreira
+
+def _errors(at):
+    """Mensagens de erro do último rerun (exceções e st.error)."""
+    return [e.proto.message for e in at.exception] + [e.value for e in at.error]
+
+def _session(usuario, parametros):
+    """
+    Um usuário: abre o app, espera os outros e faz 'acoes' páginas.
+    Retorna (medidas [{'pagina', 'passo', 'segundos', 'erros'}], durações
+    das operações internas).
+    """
+    # Só os processos das sessões carregam o Streamlit
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(parametros['diretorio'])
+    rng = random.Random(f"{parametros['seed']}-{usuario}")
+    paginas, pesos = zip(*parametros['paginas'].items())
+
+    at = AppTest.from_file(parametros['app'], default_timeout=parametros['timeout'])
+    # Aquecimento (imports, init_db, caches) fora da medida
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"O app falhou ao abrir: {_errors(at)}")
+    metrics.reset()
+    _worker['barreira'].wait(ESPERA_INICIO_S)
+
+    medidas = []
+    for _ in range(parametros['acoes']):
+        pagina = rng.choices(paginas, pesos)[0]
+        passos = [('abrir', lambda at, rng, contagens: at.sidebar.radio[0].set_value(pagina))] + ROTEIROS[pagina]
+        for passo, preparar in passos:
+            if parametros['pausa']:
+                time.sleep(rng.uniform(0, 2 * parametros['pausa']))
+            medida = {'pagina': pagina, 'passo': passo, 'segundos': None, 'erros': []}
+            medidas.append(medida)
+            try:
+                preparar(at, rng, parametros['contagens'])
+                inicio = time.perf_counter()
+                at.run()
+                medida['segundos'] = time.perf_counter() - inicio
+                medida['erros'] = _errors(at)
+            except Exception as e:
+                # Passo impossível (widget ausente) ou rerun que estourou o tempo
+                medida['erros'] = [f"{type(e).__name__}: {e}"]
+            if medida['erros']:
+                break
+    return medidas, metrics.durations()
+
+def _percentiles(segundos):
+    if not segundos:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p95, p99 = np.percentile(segundos, [50, 95, 99]) * 1000
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': max(segundos) * 1000}
+
+def _locked(mensagem):
+    return 'database is locked' in mensagem or 'database table is locked' in mensagem
+
+def probe_write_lock(db_name, parar, intervalo=SONDA_INTERVALO_S):
+    """
+    Mede, até 'parar' (Event) ser sinalizado, a espera por BEGIN IMMEDIATE
+    no banco a cada 'intervalo' segundos (a transação é desfeita na hora).
+    Retorna {'amostras', 'ocupado' (fração que esperou), 'falhas',
+    'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}.
+    """
+    esperas, falhas = [], 0
+    conn = sqlite3.connect(db_name, timeout=DB_TIMEOUT, isolation_level=None)
+    try:
+        while not parar.wait(intervalo):
+            inicio = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                falhas += 1
+                continue
+            esperas.append(time.perf_counter() - inicio)
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+    ocupado = sum(espera > SONDA_OCUPADO_S for espera in esperas)
+    return {
+        'amostras': len(esperas) + falhas,
+        'ocupado': (ocupado + falhas) / max(len(esperas) + falhas, 1),
+        'falhas': falhas,
+        **_percentiles(esperas),
+    }
+
+def seed_database(diretorio, n_animais, n_adotantes, seed=0, banco=None):
+    """
+    Banco das sessões em 'diretorio': cópia de 'banco' (migrada, se preciso)
+    ou dados sintéticos. Retorna o caminho.
+    """
+    if os.path.isabs(DB_NAME):
+        raise ValueError(f"DB_NAME é absoluto ({DB_NAME}); as sessões usariam esse banco, não o semeado.")
+    db_name = os.path.join(diretorio, DB_NAME)
+    if banco is not None:
+        origem, destino = sqlite3.connect(banco), sqlite3.connect(db_name)
+        try:
+            origem.backup(destino)
+        finally:
+            origem.close()
+            destino.close()
+        init_db(db_name)
+        return db_name
+
+    init_db(db_name)
+    for tabela, caminho in write_dataset(diretorio, n_animais, n_adotantes, seed).items():
+        resultado = records.replace_from_csv(tabela, caminho, db_name=db_name)
+        if resultado['faltando'] or resultado['total_erros']:
+            raise RuntimeError(f"CSV sintético de '{tabela}' rejeitado: {resultado['erros'][:3]}")
+    return db_name
+
+def _summarize(medidas, duracao):
+    """Linhas por (página, passo) e a linha 'total', com reruns, erros e percentis."""
+    grupos = collections.defaultdict(list)
+    for medida in medidas:
+        grupos[(medida['pagina'], medida['passo'])].append(medida)
+    grupos[('total', '')] = medidas
+
+    linhas = []
+    for (pagina, passo), grupo in grupos.items():
+        segundos = [m['segundos'] for m in grupo if m['segundos'] is not None]
+        linhas.append({
+            'pagina': pagina,
+            'passo': passo,
+            'reruns': len(segundos),
+            'erros': sum(bool(m['erros']) for m in grupo),
+            'reruns_por_s': len(segundos) / duracao if duracao else 0.0,
+            **_percentiles(segundos),
+        })
+    return linhas
+
+def _operations(duracoes):
+    """Operações internas de todas as sessões juntas, ordenadas pelo tempo total."""
+    juntas = collections.defaultdict(list)
+    for por_sessao in duracoes:
+        for nome, segundos in por_sessao.items():
+            juntas[nome].extend(segundos)
+    linhas = [
+        {'operacao': nome, 'chamadas': len(segundos), 'total_s': sum(segundos), **_percentiles(segundos)}
+        for nome, segundos in juntas.items()
+    ]
+    return sorted(linhas, key=lambda linha: linha['total_s'], reverse=True)
+
+def run(usuarios, acoes, n_animais=10000, n_adotantes=None, banco=None, paginas=PESOS_PAGINAS, seed=0, pausa=0.0,
+        timeout=60, app=APP):
+    """
+    Roda a carga: 'usuarios' sessões simultâneas, 'acoes' páginas cada, com
+    pausa média de 'pausa' segundos entre os passos. Retorna o relatório
+    (dict pronto para JSON).
+    """
+    desconhecidas = set(paginas) - set(ROTEIROS)
+    if desconhecidas:
+        raise ValueError(f"Páginas sem roteiro: {sorted(desconhecidas)}")
+    if n_adotantes is None:
+        n_adotantes = max(1, int(n_animais * PROPORCAO_ADOTANTES))
+
+    diretorio = tempfile.mkdtemp(prefix='adocoes-carga-')
+    try:
+        db_name = seed_database(diretorio, n_animais, n_adotantes, seed, banco)
+        contagens = {tabela: records.count_records(tabela, db_name) for tabela in ('animais', 'adotantes')}
+        close_connections(db_name)
+        parametros = {
+            'app': app, 'diretorio': diretorio, 'seed': seed, 'acoes': acoes, 'pausa': pausa,
+            'timeout': timeout, 'paginas': dict(paginas), 'contagens': contagens,
+        }
+
+        contexto = multiprocessing.get_context('spawn')
+        barreira = contexto.Barrier(usuarios + 1)
+        parar = threading.Event()
+        sonda = {}
+        with ProcessPoolExecutor(
+            max_workers=usuarios, mp_context=contexto, initializer=_init_worker, initargs=(barreira,),
+        ) as pool:
+            futuros = [pool.submit(_session, usuario, parametros) for usuario in range(usuarios)]
+            try:
+                barreira.wait(ESPERA_INICIO_S)
+            except threading.BrokenBarrierError:
+                # Alguma sessão não abriu o app; o erro dela sai no result()
+                pass
+            inicio = time.perf_counter()
+            thread = threading.Thread(target=lambda: sonda.update(probe_write_lock(db_name, parar)), daemon=True)
+            thread.start()
+            try:
+                resultados = [futuro.result() for futuro in futuros]
+            finally:
+                duracao = time.perf_counter() - inicio
+                parar.set()
+                thread.join()
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    medidas = [medida for sessao, _ in resultados for medida in sessao]
+    mensagens = collections.Counter(erro for medida in medidas for erro in medida['erros'])
+    return {
+        'formato': FORMATO_VERSAO,
+        'inicio': datetime.datetime.now().isoformat(timespec='seconds'),
+        'ambiente': environment(),
+        'parametros': {
+            'usuarios': usuarios, 'acoes': acoes, 'animais': contagens['animais'], 'adotantes': contagens['adotantes'],
+            'banco': banco, 'paginas': dict(paginas), 'seed': seed, 'pausa': pausa,
+        },
+        'duracao_s': duracao,
+        'paginas': _summarize(medidas, duracao),
+        'lock': dict(sonda, erros_locked=sum(n for mensagem, n in mensagens.items() if _locked(mensagem))),
+        'erros': [{'mensagem': mensagem, 'vezes': n} for mensagem, n in mensagens.most_common(20)],
+        'operacoes': _operations([duracoes for _, duracoes in resultados]),
+    }
+
+def _ms(valor):
+    return f"{valor:>9.1f}" if valor is not None else f"{'-':>9}"
+
+def _print_report(relatorio, operacoes=15):
+    parametros = relatorio['parametros']
+    print(
+        f"{parametros['usuarios']} usuários x {parametros['acoes']} páginas, {parametros['animais']} animais / "
+        f"{parametros['adotantes']} adotantes, {relatorio['duracao_s']:.1f}s"
+    )
+    print(f"\n  {'página':<26} {'passo':<10} {'reruns':>6} {'erros':>5}      p50      p95      p99      máx (ms)")
+    for linha in relatorio['paginas']:
+        print(
+            f"  {linha['pagina']:<26} {linha['passo']:<10} {linha['reruns']:>6} {linha['erros']:>5} "
+            f"{_ms(linha['p50_ms'])}{_ms(linha['p95_ms'])}{_ms(linha['p99_ms'])}{_ms(linha['max_ms'])}"
+        )
+
+    lock = relatorio['lock']
+    print(
+        f"\nLock de escrita: ocupado em {lock.get('ocupado', 0):.0%} de {lock.get('amostras', 0)} amostras, "
+        f"espera p95 {_ms(lock.get('p95_ms')).strip()} ms, máx {_ms(lock.get('max_ms')).strip()} ms; "
+        f"{lock['erros_locked']} erros 'database is locked' nas sessões"
+    )
+
+    if relatorio['erros']:
+        print("\nErros mais frequentes:")
+        for erro in relatorio['erros'][:5]:
+            print(f"  {erro['vezes']:>4}x {erro['mensagem'][:150]}")
+
+    print("\nOperações internas (todas as sessões), por tempo total:")
+    for linha in relatorio['operacoes'][:operacoes]:
+        print(
+            f"  {linha['operacao']:<38} {linha['chamadas']:>6} {linha['total_s']:>8.2f}s "
+            f"{_ms(linha['p50_ms'])}{_ms(linha['p95_ms'])}{_ms(linha['p99_ms'])}{_ms(linha['max_ms'])}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do app com sessões simultâneas (AppTest).")
+    parser.add_argument("--usuarios", type=int, default=12, help="Sessões simultâneas (padrão: 12).")
+    parser.add_argument("--acoes", type=int, default=20, help="Páginas visitadas por sessão (padrão: 20).")
+    parser.add_argument("--animais", type=int, default=10000, help="Animais sintéticos (padrão: 10000).")
+    parser.add_argument("--adotantes", type=int, help=f"Adotantes sintéticos (padrão: {PROPORCAO_ADOTANTES} por animal).")
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de dados sintéticos.")
+    parser.add_argument("--paginas", nargs='+', choices=list(ROTEIROS), metavar="PÁGINA",
+                        help="Só estas páginas (com os pesos de PESOS_PAGINAS).")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos dados e das sessões (padrão: 0).")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Pausa média (s) entre os passos (padrão: 0).")
+    parser.add_argument("--timeout", type=float, default=60, help="Tempo máximo (s) de um rerun (padrão: 60).")
+    parser.add_argument("--saida", help="Arquivo JSON com o resultado.")
+    args = parser.parse_args(argv)
+    if args.usuarios < 1 or args.acoes < 1:
+        parser.error("--usuarios e --acoes devem ser pelo menos 1.")
+
+    paginas = {pagina: PESOS_PAGINAS[pagina] for pagina in args.paginas} if args.paginas else PESOS_PAGINAS
+    relatorio = run(
+        args.usuarios, args.acoes, args.animais, args.adotantes, args.banco, paginas, args.seed, args.pausa, args.timeout,
+    )
+    _print_report(relatorio)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\nResultado gravado em {args.saida}.")
+
+if __name__ == "__main__":
+    main()
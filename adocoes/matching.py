@@ -0,0 +1,197 @@
+"""
+Compatibilidade entre adotantes e animais, sem interface.
+
+- rank_entry / rank_animals: animais compatíveis com um adotante;
+- rank_adopters: adotantes compatíveis com um animal (pesos de cada adotante);
+- compatible_animals / compatible_adopters: as listas das páginas (top-k +
+  empates), lendo os dados do banco. A de animais vem do cache por perfil
+  (adocoes.result_cache) ou da tabela 'compatibilidade', e só é calculada
+  (e gravada) quando ainda não existe;
+- sync_caches: descarta os caches do processo quando outro processo
+  escreveu em animais (chamada antes de usá-los).
+
+Registros com vetor inválido não interrompem o cálculo: eles ficam de fora
+e os seus nomes são devolvidos à parte, para quem chamou decidir como avisar.
+Erros de verdade levantam exceção.
+"""
+
+import numpy as np
+
+from adocoes import cache as animal_cache
+from adocoes import materialized
+from adocoes import result_cache
+from adocoes.config import TOP_K, TOP_K_METODO, MOTOR_SCORE, TAMANHO_VETOR
+from adocoes.db import get_db_connection, load_tipo
+from adocoes.metrics import timed
+from adocoes.scoring import (
+    build_code_matrix, build_weight_matrix, adopter_vectors, animal_vector,
+    reverse_weighted_cosine_scores,
+)
+from adocoes.signatures import signature_entry, score_entry, signature_scores
+from adocoes.topk import top_k_with_ties
+
+
+class VectorMismatch(ValueError):
+    """O vetor de um adotante ou animal não tem o tamanho esperado."""
+
+
+@timed('matching.rank_entry', linhas=len)
+def rank_entry(adotante, entry, k=None, metodo='argpartition', motor=MOTOR_SCORE):
+    """
+    Scores do adotante contra os animais de uma entrada do índice de
+    assinaturas (por exemplo, a do cache de animais), em ordem decrescente
+    (empates pela ordem da entrada). Com k informado, retorna só o top-k +
+    empates (sem ordenar a lista toda).
+    Retorna [{'id', 'nome', 'score'}, ...].
+    """
+    B, P = adopter_vectors(adotante)
+
+    if not entry['assinaturas'].shape[1] == len(B) == len(P):
+        raise VectorMismatch(
+            f"Incompatibilidade de vetores (A:{entry['assinaturas'].shape[1]}, B:{len(B)}, P:{len(P)}) "
+            f"para o adotante {adotante['nome']}."
+        )
+
+    if k is None:
+        # Score uma vez por assinatura, expandido para os animais já na
+        # ordem final (estável, como o sorted(..., reverse=True))
+        ordem, scores = score_entry(entry, B, P, motor)
+    else:
+        # Só os k melhores (e empates com o k-ésimo), na mesma ordem
+        scores = signature_scores(entry, B, P, motor)[entry['inverse']]
+        ordem = top_k_with_ties(scores, k, metodo)
+
+    ids = entry['ids'].tolist()
+    nomes = entry['nomes'].tolist()
+    return [{'id': ids[i], 'nome': nomes[i], 'score': float(scores[i])} for i in ordem]
+
+@timed('matching.rank_animals', linhas=lambda resultado: len(resultado[0]))
+def rank_animals(adotante, animais_df, k=None, metodo='argpartition', motor=MOTOR_SCORE):
+    """
+    Igual a rank_entry, a partir de um DataFrame de animais.
+    'motor' escolhe o cálculo ('denso' ou 'bitmask'); o resultado é o mesmo.
+    Retorna (resultados, nomes dos animais com vetor inválido).
+    """
+    B, _ = adopter_vectors(adotante)
+    A, valid = build_code_matrix(animais_df, tamanho=len(B))
+    invalidos = animais_df['nome'].to_numpy()[~valid].tolist()
+
+    ids = animais_df['id'].to_numpy()[valid]
+    nomes = animais_df['nome'].to_numpy()[valid]
+    entry = signature_entry(A[valid], ids, nomes)
+    return rank_entry(adotante, entry, k, metodo, motor), invalidos
+
+@timed('matching.rank_adopters', linhas=lambda resultado: len(resultado[0]))
+def rank_adopters(animal, adotantes_df, k=None, metodo='argpartition'):
+    """
+    Compatibilidade reversa: score do animal contra cada adotante, usando os
+    pesos de cada adotante. Com k informado, retorna só o top-k + empates.
+    Retorna ([{'id', 'nome', 'contato', 'score'}, ...], nomes dos adotantes
+    com vetor inválido).
+    """
+    a = animal_vector(animal)
+    if len(a) != TAMANHO_VETOR:
+        raise VectorMismatch(f"Incompatibilidade de vetores (A:{len(a)}) para o animal {animal['nome']}.")
+
+    B, valid_b = build_code_matrix(adotantes_df, tamanho=len(a))
+    P, valid_p = build_weight_matrix(adotantes_df, len(a))
+    valid = valid_b & valid_p
+    invalidos = adotantes_df['nome'].to_numpy()[~valid].tolist()
+
+    scores = reverse_weighted_cosine_scores(a, B[valid], P[valid])
+
+    if k is None:
+        ordem = np.argsort(-scores, kind='stable')
+    else:
+        ordem = top_k_with_ties(scores, k, metodo)
+
+    ids = adotantes_df['id'].to_numpy()[valid].tolist()
+    nomes = adotantes_df['nome'].to_numpy()[valid].tolist()
+    contatos = adotantes_df['contato'].to_numpy()[valid].tolist()
+    resultados = [
+        {'id': ids[i], 'nome': nomes[i], 'contato': contatos[i], 'score': float(scores[i])}
+        for i in ordem
+    ]
+    return resultados, invalidos
+
+def sync_caches(db_name=None):
+    """
+    Confere a versão dos animais no banco (animal_cache.sync) e, se outro
+    processo escreveu neles, descarta também as listas por perfil.
+    Retorna se descartou.
+    """
+    if not animal_cache.sync(db_name):
+        return False
+    result_cache.clear(db_name)
+    return True
+
+def refresh_adopter(conn, adotante, k=TOP_K, metodo=TOP_K_METODO, db_name=None):
+    """
+    Recalcula a lista (top-k + empates) de um adotante a partir do cache de
+    animais e grava na tabela 'compatibilidade'. O cache é conferido antes:
+    a lista gravada é lida por todos os processos, então não pode sair de
+    um cache velho.
+    Retorna (resultados, nomes dos animais inválidos do tipo), ou None se
+    não há animais do tipo do adotante.
+    """
+    sync_caches(db_name)
+    entry = animal_cache.get_animal_entry(adotante['tipo'], db_name)
+    if entry is None:
+        return None
+
+    resultados = rank_entry(adotante, entry, k, metodo)
+    if resultados:
+        materialized.store_adopter(conn, adotante['id'], resultados, k)
+        conn.commit()
+    return resultados, list(entry['invalidos'])
+
+@timed('matching.compatible_animals')
+def compatible_animals(adotante, k=TOP_K, db_name=None):
+    """
+    Animais mais compatíveis com o adotante (top-k + empates): do cache
+    por perfil (depois de conferir a versão dos animais no banco, uma
+    consulta de uma linha), ou lidos da tabela 'compatibilidade', ou
+    calculados e gravados se ainda não estão lá.
+    Retorna (resultados, nomes dos animais inválidos; vazio quando a lista
+    já estava gravada), ou None se não há animais do tipo do adotante.
+    """
+    sync_caches(db_name)
+    # A versão é lida antes: se os animais mudarem durante o cálculo, a
+    # lista fica guardada com a versão velha e é descartada na próxima consulta
+    versao = animal_cache.data_version(db_name)
+    chave = result_cache.profile_key(adotante, k)
+    compatibilidade = result_cache.get(chave, versao, db_name)
+    if compatibilidade is not None:
+        return compatibilidade
+
+    conn = get_db_connection(db_name)
+    try:
+        resultados = materialized.read_adopter(conn, adotante['id'], k)
+        if resultados is not None:
+            compatibilidade = (resultados, [])
+        else:
+            compatibilidade = refresh_adopter(conn, adotante, k, db_name=db_name)
+    finally:
+        conn.close()
+
+    if compatibilidade is not None:
+        result_cache.put(chave, versao, compatibilidade, db_name)
+    return compatibilidade
+
+@timed('matching.compatible_adopters')
+def compatible_adopters(animal, k=TOP_K, metodo=TOP_K_METODO, db_name=None):
+    """
+    Adotantes mais compatíveis com o animal (top-k + empates), entre os que
+    preferem o tipo dele.
+    Retorna (resultados, nomes dos adotantes inválidos), ou None se não há
+    adotantes interessados no tipo.
+    """
+    conn = get_db_connection(db_name)
+    try:
+        adotantes_df = load_tipo(conn, 'adotantes', animal['tipo'])
+    finally:
+        conn.close()
+
+    if adotantes_df.empty:
+        return None
+    return rank_adopters(animal, adotantes_df, k, metodo)
@@ -0,0 +1,204 @@
+"""
+Tabela 'compatibilidade': a lista da página de compatibilidade (top-k com
+empates) de cada adotante, mantida incrementalmente.
+
+Invariante, para cada adotante com linha em compatibilidade_limites: a
+lista guarda exatamente os animais do seu tipo que top_k_with_ties(scores,
+top_k) escolheria, e 'limite' é o menor score da lista (o k-ésimo). Animais
+fora da lista têm score menor que o limite. Adotantes sem linha ainda não
+foram calculados (ou foram invalidados); a página os calcula na leitura e
+grava com store_adopter.
+
+Pontos de atualização:
+- animal inserido/alterado: upsert_animal calcula o score só desse animal
+  contra os adotantes já calculados do seu tipo;
+- adotante inserido/alterado: invalidate_adopter;
+- CSV (substituição ou mescla): invalidate_all.
+
+Nenhuma função aqui faz commit: as mudanças entram na transação de quem
+chamou, junto com a escrita que as motivou.
+
+A tabela é compartilhada por todos os processos e uma lista gravada vale
+até a próxima invalidação. Uma lista calculada a partir de um cache de
+animais velho (adocoes.cache, por processo) seria servida a todos: por isso
+matching.refresh_adopter confere a versão dos animais no banco
+(matching.sync_caches) antes de calcular e gravar.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from adocoes.config import TOP_K, COLUNAS_INDICE, COLUNAS_PESO_NUM, TAMANHO_VETOR
+from adocoes.encoding import one_hot_matrix
+from adocoes.metrics import timed
+from adocoes.scoring import build_code_matrix, build_weight_matrix, reverse_weighted_cosine_scores
+from adocoes.topk import top_k_with_ties
+
+
+@timed('materialized.read_adopter')
+def read_adopter(conn, adotante_id, k=TOP_K):
+    """
+    Lista materializada do adotante, já na ordem da página:
+    [{'id', 'nome', 'score'}, ...]. Retorna None se ela ainda não foi
+    calculada (ou foi calculada com outro k).
+    """
+    linhas = conn.execute("""
+        SELECT l.top_k, c.animal_id, a.nome, c.score
+        FROM compatibilidade_limites l
+        LEFT JOIN compatibilidade c ON c.adotante_id = l.adotante_id
+        LEFT JOIN animais a ON a.id = c.animal_id
+        WHERE l.adotante_id = ?
+        ORDER BY c.score DESC, c.animal_id
+    """, (adotante_id,)).fetchall()
+    if not linhas or linhas[0][0] != k:
+        return None
+    return [{'id': r[1], 'nome': r[2], 'score': r[3]} for r in linhas if r[1] is not None]
+
+def store_adopter(conn, adotante_id, resultados, k=TOP_K):
+    """Grava a lista calculada de um adotante (resultados de matching.rank_entry com o mesmo k)."""
+    ids = np.array([r['id'] for r in resultados], dtype=np.int64)
+    scores = np.array([r['score'] for r in resultados], dtype=np.float64)
+    _write_lists(conn, {adotante_id: (ids, scores)}, k)
+
+def invalidate_adopter(conn, adotante_id):
+    """Descarta a lista de um adotante (recalculada na próxima leitura)."""
+    conn.execute("DELETE FROM compatibilidade WHERE adotante_id = ?", (adotante_id,))
+    conn.execute("DELETE FROM compatibilidade_limites WHERE adotante_id = ?", (adotante_id,))
+
+def invalidate_all(conn):
+    """Descarta todas as listas (depois de trocas em massa, como a importação de CSV)."""
+    conn.execute("DELETE FROM compatibilidade")
+    conn.execute("DELETE FROM compatibilidade_limites")
+
+def _json_ids(ids):
+    return json.dumps([int(i) for i in ids])
+
+def _write_lists(conn, listas, k):
+    """Substitui as listas {adotante_id: (animal_ids, scores)} e os seus limites."""
+    if not listas:
+        return
+    adotantes = _json_ids(listas)
+    conn.execute("DELETE FROM compatibilidade WHERE adotante_id IN (SELECT value FROM json_each(?))", (adotantes,))
+    conn.executemany(
+        "INSERT INTO compatibilidade (adotante_id, animal_id, score) VALUES (?, ?, ?)",
+        ((adotante_id, int(i), float(s)) for adotante_id, (ids, scores) in listas.items() for i, s in zip(ids, scores)),
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO compatibilidade_limites (adotante_id, limite, quantidade, top_k) VALUES (?, ?, ?, ?)",
+        (
+            (adotante_id, float(scores.min()) if len(scores) else None, len(scores), k)
+            for adotante_id, (ids, scores) in listas.items()
+        ),
+    )
+
+def _animal_scores(conn, animal_id):
+    """
+    Score do animal contra os adotantes já calculados do seu tipo.
+    Retorna DataFrame (id, limite, quantidade, top_k, score); vazio se o
+    animal não existe ou tem vetor inválido.
+    """
+    animal = conn.execute(
+        f"SELECT tipo, {', '.join(COLUNAS_INDICE)} FROM animais WHERE id = ?", (animal_id,)
+    ).fetchone()
+    vazio = pd.DataFrame(columns=['id', 'limite', 'quantidade', 'top_k', 'score'])
+    if animal is None:
+        return vazio
+    tipo, indices = animal[0], list(animal[1:])
+    a, valid = one_hot_matrix([indices])
+    if not valid[0]:
+        return vazio
+
+    cols = ['a.id', 'l.limite', 'l.quantidade', 'l.top_k'] + [f"a.{col}" for col in COLUNAS_INDICE + COLUNAS_PESO_NUM]
+    adotantes = pd.read_sql_query(f"""
+        SELECT {', '.join(cols)} FROM adotantes a
+        JOIN compatibilidade_limites l ON l.adotante_id = a.id
+        WHERE a.tipo = ?
+    """, conn, params=(tipo,))
+
+    B, valid_b = build_code_matrix(adotantes)
+    P, valid_p = build_weight_matrix(adotantes, TAMANHO_VETOR)
+    valid = valid_b & valid_p
+    adotantes = adotantes.loc[valid, ['id', 'limite', 'quantidade', 'top_k']].reset_index(drop=True)
+    adotantes['score'] = reverse_weighted_cosine_scores(a[0], B[valid], P[valid])
+    return adotantes
+
+@timed('materialized.upsert_animal')
+def upsert_animal(conn, animal_id, k=TOP_K):
+    """
+    Atualiza as listas depois que um animal foi inserido ou alterado (na
+    mesma transação). Só são tocados os adotantes em cuja lista o animal
+    entra ou de onde ele sai; se a saída deixar a lista com menos de k
+    animais, o adotante é invalidado (recalculado na próxima leitura).
+    Retorna (adotantes atualizados, adotantes invalidados).
+    """
+    na_lista = dict(conn.execute(
+        "SELECT adotante_id, score FROM compatibilidade WHERE animal_id = ?", (animal_id,)
+    ).fetchall())
+    adotantes = _animal_scores(conn, animal_id)
+
+    # Adotantes onde o animal entra (ou continua): score >= limite, ou lista incompleta
+    limite = adotantes['limite'].to_numpy(dtype=np.float64, na_value=-np.inf)
+    entra = (adotantes['score'].to_numpy() >= limite) | (adotantes['quantidade'].to_numpy() < adotantes['top_k'].to_numpy())
+    novos_scores = dict(zip(adotantes['id'].tolist(), adotantes['score'].tolist()))
+    info = {row.id: (row.limite, row.quantidade, row.top_k) for row in adotantes.itertuples(index=False)}
+
+    afetados = set(adotantes['id'][entra].tolist()) | set(na_lista)
+    atualizar, invalidar = [], []
+    for adotante_id in afetados:
+        if adotante_id not in info:
+            # Estava na lista, mas o animal mudou de tipo ou ficou inválido
+            limite_a, quantidade, top_k = _limits(conn, adotante_id)
+        else:
+            limite_a, quantidade, top_k = info[adotante_id]
+        novo = novos_scores.get(adotante_id)
+
+        sai = adotante_id in na_lista and (novo is None or novo < limite_a)
+        if top_k != k or (sai and quantidade == k):
+            # Sem o animal a lista ficaria com menos de k: precisa do ranking todo
+            invalidar.append(adotante_id)
+        else:
+            atualizar.append(adotante_id)
+
+    for adotante_id in invalidar:
+        invalidate_adopter(conn, adotante_id)
+    _write_lists(conn, _merged_lists(conn, atualizar, animal_id, novos_scores, k), k)
+    return len(atualizar), len(invalidar)
+
+def _limits(conn, adotante_id):
+    linha = conn.execute(
+        "SELECT limite, quantidade, top_k FROM compatibilidade_limites WHERE adotante_id = ?", (adotante_id,)
+    ).fetchone()
+    return tuple(linha)
+
+def _merged_lists(conn, adotantes, animal_id, novos_scores, k):
+    """
+    Nova lista de cada adotante: a atual sem o animal, mais o animal com o
+    score novo (se for do tipo), reduzida ao top-k com empates.
+    """
+    if not adotantes:
+        return {}
+    linhas = conn.execute("""
+        SELECT adotante_id, animal_id, score FROM compatibilidade
+        WHERE adotante_id IN (SELECT value FROM json_each(?)) AND animal_id != ?
+        ORDER BY adotante_id, animal_id
+    """, (_json_ids(adotantes), animal_id)).fetchall()
+
+    atuais = {adotante_id: ([], []) for adotante_id in adotantes}
+    for adotante_id, outro_id, score in linhas:
+        atuais[adotante_id][0].append(outro_id)
+        atuais[adotante_id][1].append(score)
+
+    listas = {}
+    for adotante_id, (ids, scores) in atuais.items():
+        if adotante_id in novos_scores:
+            pos = int(np.searchsorted(ids, animal_id))
+            ids.insert(pos, animal_id)
+            scores.insert(pos, novos_scores[adotante_id])
+        ids = np.array(ids, dtype=np.int64)
+        scores = np.array(scores, dtype=np.float64)
+        # Ordem por id: empates ficam com o menor id, como na página
+        ordem = top_k_with_ties(scores, k)
+        listas[adotante_id] = (ids[ordem], scores[ordem])
+    return listas
@@ -0,0 +1,175 @@
+"""
+Medidas de tempo (spans) dos pontos quentes, agregadas por operação.
+
+Cada span registra a duração e, quando faz sentido, linhas e bytes
+processados. As durações recentes de cada operação (até METRICAS_AMOSTRAS)
+ficam num buffer circular, de onde saem p50/p95/p99 e o histograma; as
+contagens e somas cobrem o processo inteiro. Tudo é por processo e
+compartilhado por todas as sessões do Streamlit (ver a página de
+diagnóstico no app).
+
+Uso:
+    with span('db.load_page') as medida:
+        ...
+        medida['linhas'] = len(df)
+
+    @timed('matching.compatible_animals')
+    def compatible_animals(...): ...
+
+profiled() captura um cProfile de um trecho (por exemplo, um rerun).
+"""
+
+import collections
+import cProfile
+import functools
+import io
+import marshal
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from adocoes.config import METRICAS_ATIVAS, METRICAS_AMOSTRAS
+
+_lock = threading.Lock()
+
+# {operação: {'chamadas', 'erros', 'total', 'maximo', 'linhas', 'bytes', 'duracoes': deque}}
+_operacoes = {}
+
+# Limites (s) do histograma: escala logarítmica de 10 µs a 100 s
+LIMITES_HISTOGRAMA = 10.0 ** np.arange(-5, 2.01, 0.5)
+
+ativo = METRICAS_ATIVAS
+
+
+def record(nome, segundos, linhas=None, bytes_=None, erro=False):
+    """Registra uma execução da operação."""
+    with _lock:
+        op = _operacoes.get(nome)
+        if op is None:
+            op = _operacoes[nome] = {
+                'chamadas': 0, 'erros': 0, 'total': 0.0, 'maximo': 0.0, 'linhas': 0, 'bytes': 0,
+                'duracoes': collections.deque(maxlen=METRICAS_AMOSTRAS),
+            }
+        op['chamadas'] += 1
+        op['erros'] += bool(erro)
+        op['total'] += segundos
+        op['maximo'] = max(op['maximo'], segundos)
+        op['linhas'] += linhas or 0
+        op['bytes'] += bytes_ or 0
+        op['duracoes'].append(segundos)
+
+@contextmanager
+def span(nome):
+    """
+    Mede o bloco como uma execução de 'nome'. O dict devolvido aceita
+    'linhas' e 'bytes'; exceções são contadas como erro e propagadas.
+    """
+    medida = {}
+    if not ativo:
+        yield medida
+        return
+    inicio = time.perf_counter()
+    erro = False
+    try:
+        yield medida
+    except Exception:
+        # Só erros: o controle de fluxo do Streamlit (st.rerun, st.stop) não conta
+        erro = True
+        raise
+    finally:
+        record(nome, time.perf_counter() - inicio, medida.get('linhas'), medida.get('bytes'), erro)
+
+def timed(nome, linhas=None, bytes_=None):
+    """
+    Decorador: cada chamada da função é um span 'nome'. 'linhas' e 'bytes_'
+    são funções opcionais que recebem o resultado e devolvem a contagem.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def embrulho(*args, **kwargs):
+            with span(nome) as medida:
+                resultado = funcao(*args, **kwargs)
+                if linhas is not None:
+                    medida['linhas'] = linhas(resultado)
+                if bytes_ is not None:
+                    medida['bytes'] = bytes_(resultado)
+                return resultado
+        return embrulho
+    return decorador
+
+def summary():
+    """
+    Uma linha por operação: chamadas, erros, tempo total, p50/p95/p99 e
+    máximo (ms), linhas e bytes. Ordenado pelo tempo total.
+    """
+    with _lock:
+        copias = {nome: dict(op, duracoes=np.array(op['duracoes'])) for nome, op in _operacoes.items()}
+
+    linhas = []
+    for nome, op in copias.items():
+        p50, p95, p99 = np.percentile(op['duracoes'], [50, 95, 99]) * 1000 if len(op['duracoes']) else (0.0,) * 3
+        linhas.append({
+            'operacao': nome,
+            'chamadas': op['chamadas'],
+            'erros': op['erros'],
+            'total_s': op['total'],
+            'p50_ms': p50,
+            'p95_ms': p95,
+            'p99_ms': p99,
+            'max_ms': op['maximo'] * 1000,
+            'linhas': op['linhas'],
+            'bytes': op['bytes'],
+        })
+    return sorted(linhas, key=lambda linha: linha['total_s'], reverse=True)
+
+def durations():
+    """Durações recentes (s) de cada operação: {operação: [segundos, ...]}."""
+    with _lock:
+        return {nome: list(op['duracoes']) for nome, op in _operacoes.items()}
+
+def histogram(nome):
+    """
+    Histograma das durações recentes da operação em faixas logarítmicas.
+    Retorna (rótulos das faixas, contagens).
+    """
+    with _lock:
+        duracoes = np.array(_operacoes[nome]['duracoes']) if nome in _operacoes else np.zeros(0)
+    limites = np.concatenate([[0.0], LIMITES_HISTOGRAMA, [np.inf]])
+    contagens, _ = np.histogram(duracoes, bins=limites)
+    rotulos = [f"< {_format_seconds(fim)}" for fim in limites[1:-1]] + [f">= {_format_seconds(limites[-2])}"]
+    return rotulos, contagens
+
+def _format_seconds(segundos):
+    if segundos < 1e-3:
+        return f"{segundos * 1e6:.0f} µs"
+    if segundos < 1:
+        return f"{segundos * 1e3:.0f} ms"
+    return f"{segundos:.0f} s"
+
+def reset():
+    """Zera todas as medidas."""
+    with _lock:
+        _operacoes.clear()
+
+@contextmanager
+def profiled(linhas=40):
+    """
+    Roda o bloco sob o cProfile. O dict devolvido recebe, ao final (mesmo
+    com exceção), 'texto' (as 'linhas' funções com maior tempo acumulado) e
+    'prof' (bytes no formato de pstats/snakeviz).
+    """
+    perfil = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield perfil
+    finally:
+        profiler.disable()
+        texto = io.StringIO()
+        stats = pstats.Stats(profiler, stream=texto)
+        stats.sort_stats('cumulative').print_stats(linhas)
+        perfil['texto'] = texto.getvalue()
+        perfil['prof'] = marshal.dumps(stats.stats)
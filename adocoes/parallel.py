@@ -0,0 +1,134 @@
+"""
+Cálculo do top-N em vários processos, para o job em lote (adocoes.batch).
+
+As matrizes (assinaturas de animal ou a matriz densa A, e as matrizes B e P
+dos adotantes) são copiadas uma vez para blocos de memória compartilhada
+(multiprocessing.shared_memory); cada processo do pool abre os blocos ao
+iniciar, sem receber cópias por pickle. Os adotantes são divididos em
+fatias contíguas, cada processo devolve o top-N das suas fatias e o
+resultado é remontado na ordem original: igual ao cálculo num só processo.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from adocoes.scoring import top_n_blocked
+from adocoes.signatures import top_n_signatures
+
+# Fatias de adotantes por processo: mais de uma equilibra processos lentos
+FATIAS_POR_PROCESSO = 4
+
+# Estado de cada processo do pool (preenchido por _attach)
+_worker = {}
+
+
+def _share(arrays):
+    """
+    Copia os arrays para blocos de memória compartilhada.
+    Retorna (blocos, descrições {nome: (bloco, shape, dtype)}).
+    """
+    blocos, descricoes = [], {}
+    try:
+        for nome, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            bloco = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            blocos.append(bloco)
+            np.ndarray(arr.shape, arr.dtype, buffer=bloco.buf)[...] = arr
+            descricoes[nome] = (bloco.name, arr.shape, arr.dtype.str)
+    except Exception:
+        _release(blocos)
+        raise
+    return blocos, descricoes
+
+def _release(blocos):
+    for bloco in blocos:
+        bloco.close()
+        bloco.unlink()
+
+def _attach(descricoes, parametros):
+    """Inicializador do pool: abre os blocos compartilhados (sem copiar)."""
+    arrays = {}
+    for nome, (bloco_nome, shape, dtype) in descricoes.items():
+        bloco = shared_memory.SharedMemory(name=bloco_nome)
+        _worker.setdefault('blocos', []).append(bloco)
+        arrays[nome] = np.ndarray(shape, dtype, buffer=bloco.buf)
+
+    if 'assinaturas' in arrays:
+        # Mesmo formato de signature_entry, só com o que top_n_signatures usa
+        cortes = np.cumsum(arrays['contagens'])[:-1]
+        _worker['entry'] = {
+            'assinaturas': arrays['assinaturas'],
+            'inverse': arrays['inverse'],
+            'posicoes': np.split(arrays['posicoes'], cortes),
+        }
+    else:
+        _worker['A'] = arrays['A']
+    _worker['B'], _worker['P'] = arrays['B'], arrays['P']
+    _worker.update(parametros)
+
+def _score_slice(inicio, fim):
+    """Top-N dos adotantes [inicio, fim). Retorna (tamanhos, índices, scores), concatenados."""
+    B, P = _worker['B'][inicio:fim], _worker['P'][inicio:fim]
+    if 'entry' in _worker:
+        indices, scores = top_n_signatures(
+            _worker['entry'], B, P, _worker['n'], bloco_adotantes=_worker['bloco_adotantes'], empates=_worker['empates'],
+        )
+    else:
+        indices, scores = top_n_blocked(
+            _worker['A'], B, P, _worker['n'], bloco_adotantes=_worker['bloco_adotantes'], bloco_animais=_worker['bloco_animais'],
+        )
+    tamanhos = np.array([len(idx) for idx in indices], dtype=np.int64)
+    return (
+        tamanhos,
+        np.concatenate(list(indices)) if len(indices) else np.zeros(0, dtype=np.int64),
+        np.concatenate(list(scores)) if len(scores) else np.zeros(0, dtype=np.float64),
+    )
+
+def slices(n_adotantes, processos, fatias_por_processo=FATIAS_POR_PROCESSO):
+    """Fatias contíguas (inicio, fim) dos adotantes, no máximo processos * fatias_por_processo."""
+    tamanho = max(1, -(-n_adotantes // (processos * fatias_por_processo)))
+    return [(i, min(i + tamanho, n_adotantes)) for i in range(0, n_adotantes, tamanho)]
+
+def top_n_parallel(B, P, n, processos, entry=None, A=None, bloco_adotantes=4096, bloco_animais=4096, empates=False):
+    """
+    Top-n de cada adotante calculado em 'processos' processos: pelas
+    assinaturas de 'entry' (como top_n_signatures) ou pela matriz densa 'A'
+    (como top_n_blocked; empates não se aplica). bloco_adotantes limita a
+    memória de cada processo. Retorna (índices, scores): listas com um array
+    por adotante.
+    """
+    if (entry is None) == (A is None):
+        raise ValueError("Informe 'entry' (assinaturas) ou 'A' (matriz densa), não os dois.")
+
+    if entry is not None:
+        arrays = {
+            'assinaturas': entry['assinaturas'],
+            'inverse': entry['inverse'],
+            'contagens': np.array([len(p) for p in entry['posicoes']], dtype=np.int64),
+            'posicoes': np.concatenate(entry['posicoes']) if entry['posicoes'] else np.zeros(0, dtype=np.int64),
+        }
+    else:
+        arrays = {'A': A}
+    arrays.update(B=B, P=P)
+    parametros = {'n': n, 'bloco_adotantes': bloco_adotantes, 'bloco_animais': bloco_animais, 'empates': empates}
+
+    fatias = slices(len(B), processos)
+    indices, scores = [], []
+    if not fatias:
+        return indices, scores
+
+    blocos, descricoes = _share(arrays)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(processos, len(fatias)), initializer=_attach, initargs=(descricoes, parametros),
+        ) as pool:
+            # map devolve na ordem das fatias, então basta concatenar
+            for tamanhos, idx, score in pool.map(_score_slice, *zip(*fatias)):
+                cortes = np.cumsum(tamanhos)[:-1]
+                indices.extend(np.split(idx, cortes))
+                scores.extend(np.split(score, cortes))
+    finally:
+        _release(blocos)
+    return indices, scores
@@ -0,0 +1,221 @@
+"""
+Registros (animais e adotantes) sem interface: cadastro, edição, leitura e
+importação de CSV.
+
+Cada função abre e devolve a própria conexão do pool (db_name=None usa
+DB_NAME) e mantém em dia o cache de animais e a tabela 'compatibilidade'.
+Erros levantam exceção; a interface (app.py) só os traduz em mensagens.
+"""
+
+import os
+
+import pandas as pd
+
+from adocoes import cache as animal_cache
+from adocoes import materialized
+from adocoes.config import CARACTERISTICAS, COLUNAS_FEATURES, COLUNAS_ANIMAIS, COLUNAS_ADOTANTES, TOP_K
+from adocoes.csv_import import import_csv, merge_csv
+from adocoes.db import get_db_connection, load_page, count_rows, table_version
+from adocoes.encoding import indice_from_codigo, peso_to_text
+from adocoes.matching import refresh_adopter
+from adocoes.metrics import span, timed
+
+TABELAS = ('animais', 'adotantes')
+
+
+class RecordNotFound(LookupError):
+    """Nenhum registro com o id informado."""
+
+
+def table_columns(table_name):
+    """Colunas exibidas de uma tabela (ValueError se a tabela não existe)."""
+    if table_name == 'animais':
+        return COLUNAS_ANIMAIS
+    if table_name == 'adotantes':
+        return COLUNAS_ADOTANTES
+    raise ValueError(f"Tabela '{table_name}' desconhecida.")
+
+def record_values(table_name, data):
+    """
+    Colunas e valores gravados para um registro do formulário: nome, tipo,
+    contato (adotantes) e, para cada característica, valor, código, índice
+    e, nos adotantes, o peso (texto e 0-10).
+    Retorna (colunas, valores).
+    """
+    table_columns(table_name)
+    cols = ['nome', 'tipo']
+    params = [data['nome'], data['tipo']]
+
+    if table_name == 'adotantes':
+        cols.append('contato')
+        params.append(data['contato'])
+
+    for feature in COLUNAS_FEATURES:
+        valor = data[feature]
+        try:
+            codigo = CARACTERISTICAS[feature]['map'][valor]
+        except KeyError:
+            raise ValueError(f"Valor inválido para '{feature}': {valor!r}") from None
+
+        cols += [feature, f"codigo_{feature}", f"indice_{feature}"]
+        params += [valor, codigo, indice_from_codigo(codigo)]
+
+        if table_name == 'adotantes':
+            peso = data[f"peso_{feature}"]
+            cols += [f"peso_{feature}", f"peso_num_{feature}"]
+            params += [peso_to_text(peso, codigo), int(peso)]  # ex: 8 * '100' -> '888'
+
+    return cols, params
+
+@timed('records.add_record')
+def add_record(table_name, data, db_name=None):
+    """Insere um registro a partir dos dados do formulário. Retorna o id novo."""
+    cols, params = record_values(table_name, data)
+    placeholders = ", ".join(["?"] * len(params))
+
+    conn = get_db_connection(db_name)
+    try:
+        cursor = conn.execute(f"INSERT INTO {table_name} ({', '.join(cols)}) VALUES ({placeholders})", params)
+        new_id = cursor.lastrowid
+        if table_name == 'animais':
+            # Entra nas listas de compatibilidade (na mesma transação)
+            materialized.upsert_animal(conn, new_id, TOP_K)
+            versao = table_version(conn, table_name)
+        conn.commit()
+
+        # Mantém o cache de animais em dia sem reler a tabela
+        if table_name == 'animais':
+            animal_cache.upsert_animal(new_id, dict(zip(cols, params)), db_name, versao)
+        else:
+            refresh_adopter(conn, find_record('adotantes', new_id, db_name), db_name=db_name)
+    finally:
+        conn.close()
+    return new_id
+
+@timed('records.update_record')
+def update_record(table_name, id_, data, db_name=None):
+    """Atualiza um registro existente (RecordNotFound se o id não existe)."""
+    cols, params = record_values(table_name, data)
+    set_str = ", ".join(f"{col} = ?" for col in cols)
+
+    conn = get_db_connection(db_name)
+    try:
+        cursor = conn.execute(f"UPDATE {table_name} SET {set_str} WHERE id = ?", params + [id_])
+        if cursor.rowcount == 0:
+            raise RecordNotFound(f"Nenhum registro com o ID {id_} na tabela '{table_name}'.")
+        if table_name == 'animais':
+            materialized.upsert_animal(conn, id_, TOP_K)
+            versao = table_version(conn, table_name)
+        else:
+            materialized.invalidate_adopter(conn, id_)
+        conn.commit()
+
+        if table_name == 'animais':
+            animal_cache.upsert_animal(id_, dict(zip(cols, params)), db_name, versao)
+        else:
+            refresh_adopter(conn, find_record('adotantes', id_, db_name), db_name=db_name)
+    finally:
+        conn.close()
+
+@timed('records.find_record')
+def find_record(table_name, id_, db_name=None):
+    """Registro com o id informado, como dict (ou None)."""
+    table_columns(table_name)
+    conn = get_db_connection(db_name)
+    try:
+        row = conn.execute(f"SELECT * FROM {table_name} WHERE id = ?", (id_,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row is not None else None
+
+@timed('records.find_record_by_name')
+def find_record_by_name(table_name, nome, db_name=None):
+    """Primeiro registro com o nome informado, como dict (ou None)."""
+    table_columns(table_name)
+    conn = get_db_connection(db_name)
+    try:
+        row = conn.execute(f"SELECT * FROM {table_name} WHERE nome = ?", (nome,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row is not None else None
+
+@timed('records.get_page', linhas=lambda resultado: len(resultado[0]))
+def get_page(table_name, filtros=None, ordem='id', decrescente=False, apos=None, limite=50, db_name=None):
+    """
+    Uma página de registros (filtrada e ordenada no SQLite).
+    Retorna (DataFrame, chave para a próxima página ou None, total filtrado).
+    """
+    colunas = table_columns(table_name)
+    conn = get_db_connection(db_name)
+    try:
+        df, proxima = load_page(conn, table_name, colunas, filtros, ordem, decrescente, apos, limite)
+        total = count_rows(conn, table_name, filtros)
+    finally:
+        conn.close()
+    return df, proxima, total
+
+@timed('records.count_records')
+def count_records(table_name, db_name=None):
+    """Quantidade de registros de uma tabela."""
+    table_columns(table_name)
+    conn = get_db_connection(db_name)
+    try:
+        return count_rows(conn, table_name)
+    finally:
+        conn.close()
+
+@timed('records.load_table', linhas=len, bytes_=lambda df: int(df.memory_usage(deep=True).sum()))
+def load_table(table_name, db_name=None):
+    """Todos os registros de uma tabela, nas colunas de table_columns (para tabelas pequenas)."""
+    colunas = table_columns(table_name)
+    conn = get_db_connection(db_name)
+    try:
+        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+    finally:
+        conn.close()
+    return df.reindex(columns=colunas, fill_value=None)
+
+def _csv_ok(resultado):
+    return not resultado['faltando'] and not resultado['total_erros']
+
+def _file_size(arquivo):
+    """Tamanho em bytes de um caminho ou arquivo enviado (None se desconhecido)."""
+    if isinstance(arquivo, (str, os.PathLike)):
+        return os.path.getsize(arquivo)
+    return getattr(arquivo, 'size', None)
+
+def replace_from_csv(table_name, arquivo, progresso=None, db_name=None):
+    """
+    Substitui a tabela pelo CSV (ver csv_import.import_csv). Linhas
+    inválidas não levantam exceção: vêm no resultado, e a tabela fica como
+    estava.
+    """
+    table_columns(table_name)
+    with span('records.replace_from_csv') as medida:
+        conn = get_db_connection(db_name)
+        try:
+            resultado = import_csv(conn, table_name, arquivo, progresso=progresso)
+        finally:
+            conn.close()
+        medida['linhas'] = resultado['inseridos']
+        medida['bytes'] = _file_size(arquivo)
+
+    if table_name == 'animais' and _csv_ok(resultado):
+        animal_cache.invalidate(db_name)
+    return resultado
+
+def merge_from_csv(table_name, arquivo, chave=('id',), apagar_ausentes=False, progresso=None, db_name=None):
+    """Mescla o CSV na tabela (ver csv_import.merge_csv); mesmo contrato de replace_from_csv."""
+    table_columns(table_name)
+    with span('records.merge_from_csv') as medida:
+        conn = get_db_connection(db_name)
+        try:
+            resultado = merge_csv(conn, table_name, arquivo, chave, apagar_ausentes, progresso=progresso)
+        finally:
+            conn.close()
+        medida['linhas'] = resultado['inseridos'] + resultado['atualizados']
+        medida['bytes'] = _file_size(arquivo)
+
+    if table_name == 'animais' and _csv_ok(resultado):
+        animal_cache.invalidate(db_name)
+    return resultado
@@ -0,0 +1,129 @@
+"""
+Cache (por processo) das listas de animais compatíveis, por perfil de
+adotante.
+
+Adotantes com o mesmo tipo, as mesmas preferências e os mesmos pesos têm a
+mesma lista, e o mesmo adotante costuma ser consultado várias vezes durante
+um atendimento. A chave é um hash do tipo, das colunas codigo_* e peso_* e
+do k (profile_key); o id e o nome do adotante não entram.
+
+Cada cache guarda a versão dos dados de animais (adocoes.cache.data_version)
+com que as listas foram calculadas. Uma consulta com versão mais nova
+descarta tudo: qualquer escrita em animais invalida o cache sem que quem
+escreve precise avisá-lo.
+
+O tamanho é limitado em listas (CACHE_RESULTADOS_ITENS) e em memória
+(CACHE_RESULTADOS_MB, estimada com sys.getsizeof); passando de um dos
+limites, saem as listas usadas há mais tempo (LRU). stats() devolve
+acertos, faltas e descartes.
+
+As listas devolvidas são as mesmas guardadas: quem chama não deve alterá-las.
+"""
+
+import collections
+import hashlib
+import sys
+import threading
+
+from adocoes.config import DB_NAME, COLUNAS_CODIGO, COLUNAS_PESO, CACHE_RESULTADOS_ITENS, CACHE_RESULTADOS_MB
+
+_lock = threading.Lock()
+
+# {db_name: {'versao', 'entradas': OrderedDict {chave: (valor, bytes)}, 'bytes',
+#            'acertos', 'faltas', 'descartes', 'invalidacoes'}}
+_caches = {}
+
+
+def _state(db_name):
+    return _caches.setdefault(db_name or DB_NAME, {
+        'versao': 0, 'entradas': collections.OrderedDict(), 'bytes': 0,
+        'acertos': 0, 'faltas': 0, 'descartes': 0, 'invalidacoes': 0,
+    })
+
+def profile_key(adotante, k):
+    """Hash do perfil do adotante (tipo, codigo_*, peso_*) e do k."""
+    partes = [str(k), adotante['tipo']] + [str(adotante[col]) for col in COLUNAS_CODIGO + COLUNAS_PESO]
+    return hashlib.sha1("\x1f".join(partes).encode()).hexdigest()
+
+def _size(valor):
+    """
+    Estimativa (bytes) da memória de (resultados, invalidos): getsizeof raso
+    de cada objeto, contando de novo os que são compartilhados com outras
+    listas (ver CACHE_RESULTADOS_MB).
+    """
+    resultados, invalidos = valor
+    total = sys.getsizeof(resultados) + sys.getsizeof(invalidos)
+    for r in resultados:
+        total += sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r.values())
+    return total + sum(sys.getsizeof(nome) for nome in invalidos)
+
+def _clear(state):
+    state['entradas'].clear()
+    state['bytes'] = 0
+
+def _sync(state, versao):
+    """Descarta as listas se os animais mudaram. Retorna se 'versao' é a atual."""
+    if versao > state['versao']:
+        if state['entradas']:
+            state['invalidacoes'] += 1
+        _clear(state)
+        state['versao'] = versao
+    return versao == state['versao']
+
+def get(chave, versao, db_name=None):
+    """Lista guardada para a chave, calculada com a versão 'versao' dos animais (ou None)."""
+    with _lock:
+        state = _state(db_name)
+        encontrado = state['entradas'].get(chave) if _sync(state, versao) else None
+        if encontrado is None:
+            state['faltas'] += 1
+            return None
+        state['entradas'].move_to_end(chave)
+        state['acertos'] += 1
+        return encontrado[0]
+
+def put(chave, versao, valor, db_name=None, itens=CACHE_RESULTADOS_ITENS, memoria_mb=CACHE_RESULTADOS_MB):
+    """
+    Guarda (resultados, invalidos) calculados com a versão 'versao' dos
+    animais. Ignorado se os animais já mudaram desde então, ou se a lista
+    sozinha passa do limite de memória.
+    """
+    if itens <= 0:
+        return
+    tamanho = _size(valor)
+    limite = memoria_mb * 1024 * 1024
+    with _lock:
+        state = _state(db_name)
+        if not _sync(state, versao) or tamanho > limite:
+            return
+        entradas = state['entradas']
+        anterior = entradas.pop(chave, None)
+        if anterior is not None:
+            state['bytes'] -= anterior[1]
+        entradas[chave] = (valor, tamanho)
+        state['bytes'] += tamanho
+
+        while len(entradas) > itens or state['bytes'] > limite:
+            _, (_, liberado) = entradas.popitem(last=False)
+            state['bytes'] -= liberado
+            state['descartes'] += 1
+
+def clear(db_name=None):
+    """Descarta todas as listas (os contadores continuam)."""
+    with _lock:
+        _clear(_state(db_name))
+
+def stats(db_name=None):
+    """Contadores do cache: listas, bytes, acertos, faltas, taxa de acerto, descartes e invalidações."""
+    with _lock:
+        state = _state(db_name)
+        consultas = state['acertos'] + state['faltas']
+        return {
+            'listas': len(state['entradas']),
+            'bytes': state['bytes'],
+            'acertos': state['acertos'],
+            'faltas': state['faltas'],
+            'taxa_acerto': state['acertos'] / consultas if consultas else 0.0,
+            'descartes': state['descartes'],
+            'invalidacoes': state['invalidacoes'],
+        }
@@ -0,0 +1,221 @@
+"""Motor vetorizado do score de cosseno ponderado (sem dependência do Streamlit)."""
+
+import math
+
+import numpy as np
+
+from adocoes.config import (
+    COLUNAS_FEATURES, COLUNAS_CODIGO, COLUNAS_PESO, COLUNAS_INDICE, COLUNAS_PESO_NUM, TAMANHO_VETOR,
+)
+from adocoes.encoding import one_hot_matrix, weight_matrix
+
+
+def _concat_columns(df, colunas):
+    """Concatena várias colunas de texto em uma única string por linha."""
+    vetores = df[colunas[0]].fillna('').astype(str)
+    for col in colunas[1:]:
+        vetores = vetores + df[col].fillna('').astype(str)
+    return vetores
+
+def _digits_matrix(vetores, tamanho):
+    """
+    Converte uma Series de strings de dígitos numa matriz (n, tamanho).
+    Linhas com tamanho diferente ou caracteres inválidos ficam zeradas e
+    marcadas como inválidas.
+    """
+    n = len(vetores)
+    comprimentos = vetores.str.len().to_numpy()
+    valid = (comprimentos == tamanho) & vetores.str.fullmatch(r'[0-9]*').to_numpy(dtype=bool)
+
+    matriz = np.zeros((n, tamanho), dtype=np.int8)
+    if valid.any() and tamanho > 0:
+        buffer = "".join(vetores[valid].tolist()).encode('ascii')
+        digitos = np.frombuffer(buffer, dtype=np.uint8) - ord('0')
+        matriz[valid] = digitos.reshape(-1, tamanho)
+
+    return matriz, valid
+
+def _int_columns(df, colunas):
+    """Colunas inteiras (podendo ter nulos) como matriz float com NaN."""
+    return df[colunas].to_numpy(dtype=np.float64, na_value=np.nan)
+
+def build_code_matrix(df, tamanho=None):
+    """
+    Converte os códigos de um DataFrame numa matriz densa de inteiros (uma
+    linha por registro). Usa as colunas indice_* quando presentes e, senão,
+    as colunas de texto ('100', '01', ...).
+    Retorna (matriz int8, máscara de linhas válidas).
+    """
+    if len(df) == 0:
+        return np.zeros((0, tamanho or TAMANHO_VETOR), dtype=np.int8), np.zeros(0, dtype=bool)
+
+    if all(col in df.columns for col in COLUNAS_INDICE):
+        matriz, valid = one_hot_matrix(_int_columns(df, COLUNAS_INDICE))
+        if tamanho is not None and tamanho != TAMANHO_VETOR:
+            valid = np.zeros(len(df), dtype=bool)
+        return matriz, valid
+
+    vetores = _concat_columns(df, COLUNAS_CODIGO)
+
+    # Sem tamanho informado, usa o mais frequente
+    if tamanho is None:
+        tamanho = int(np.bincount(vetores.str.len().to_numpy()).argmax())
+
+    return _digits_matrix(vetores, tamanho)
+
+def build_weight_matrix(df, tamanho):
+    """
+    Converte os pesos dos adotantes numa matriz (n, tamanho). Usa as colunas
+    peso_num_* quando presentes e, senão, as de texto ('888', '55', ...).
+    Retorna (matriz int8, máscara de linhas válidas).
+    """
+    if len(df) == 0:
+        return np.zeros((0, tamanho), dtype=np.int8), np.zeros(0, dtype=bool)
+
+    if all(col in df.columns for col in COLUNAS_PESO_NUM):
+        matriz, valid = weight_matrix(_int_columns(df, COLUNAS_PESO_NUM))
+        if tamanho != TAMANHO_VETOR:
+            valid = np.zeros(len(df), dtype=bool)
+        return matriz, valid
+
+    # Formato legado: peso 10 vira '1010...', então só as primeiras posições contam
+    vetores = _concat_columns(df, COLUNAS_PESO).str[:tamanho]
+    return _digits_matrix(vetores, tamanho)
+
+def _has_columns(registro, colunas):
+    """Se o registro (sqlite3.Row, dict ou Series) tem todas as colunas, não nulas."""
+    chaves = registro.keys()
+    return all(col in chaves and registro[col] is not None for col in colunas)
+
+def adopter_vectors(adotante):
+    """
+    Retorna os vetores (B, P) do adotante como arrays de inteiros. Com as
+    colunas peso_num_* presentes mas algum peso nulo ou fora de 0-10 (peso
+    legado malformado, ver db._backfill_integer_column), P sai vazio: vetor
+    inválido, que não casa com o tamanho de B.
+    """
+    if _has_columns(adotante, COLUNAS_INDICE + COLUNAS_PESO_NUM):
+        B, _ = one_hot_matrix([[adotante[col] for col in COLUNAS_INDICE]])
+        P, valid_p = weight_matrix([[adotante[col] for col in COLUNAS_PESO_NUM]])
+        P = P[0].astype(np.int64) if valid_p[0] else np.zeros(0, dtype=np.int64)
+        return B[0].astype(np.int64), P
+
+    vetor_b_str = "".join(adotante[f"codigo_{feature}"] for feature in COLUNAS_FEATURES)
+    vetor_p_str = "".join(adotante[f"peso_{feature}"] for feature in COLUNAS_FEATURES)
+
+    B = np.array([int(digit) for digit in vetor_b_str], dtype=np.int64)
+    if all(col in adotante.keys() for col in COLUNAS_PESO_NUM) and not _has_columns(adotante, COLUNAS_PESO_NUM):
+        return B, np.zeros(0, dtype=np.int64)
+    P = np.array([int(digit) for digit in vetor_p_str], dtype=np.int64)
+
+    # Formato legado: peso 10 vira '1010...' e desalinha P; usa só as len(B) primeiras posições
+    return B, P[:len(B)]
+
+def animal_vector(animal):
+    """Retorna o vetor A do animal como array de inteiros."""
+    if _has_columns(animal, COLUNAS_INDICE):
+        A, _ = one_hot_matrix([[animal[col] for col in COLUNAS_INDICE]])
+        return A[0].astype(np.int64)
+
+    vetor_a_str = "".join(animal[f"codigo_{feature}"] for feature in COLUNAS_FEATURES)
+    return np.array([int(digit) for digit in vetor_a_str], dtype=np.int64)
+
+def weighted_cosine_scores(A, B, P):
+    """
+    Similaridade de cosseno ponderada de cada linha de A contra o adotante.
+    score = sum(Ai*Bi*Pi) / (sqrt(sum((Ai*Pi)^2)) * sqrt(sum((Bi*Pi)^2)))
+    """
+    A = A.astype(np.int64, copy=False)
+
+    # Numerador e Termo 1 do Denominador para todos os animais de uma vez
+    numerador = A @ (B * P)
+    sum_Ai_Pi_sq = (A * A) @ (P * P)
+
+    # Termo 2 do Denominador (lado do Adotante)
+    denominador_termo2 = math.sqrt(int(((B * P) ** 2).sum()))
+
+    denominador_completo = np.sqrt(sum_Ai_Pi_sq.astype(np.float64)) * denominador_termo2
+
+    scores = np.zeros(len(A), dtype=np.float64)
+    np.divide(numerador, denominador_completo, out=scores, where=denominador_completo != 0)
+    return scores
+
+def reverse_weighted_cosine_scores(a, B, P):
+    """
+    Score de um único animal (vetor a) contra cada adotante (linhas de B e P).
+    Cada adotante usa os próprios pesos, então os dois termos do denominador
+    variam por linha. Mesma fórmula (e ordem de operações) de
+    weighted_cosine_scores.
+    """
+    a = a.astype(np.int64, copy=False)
+    B = B.astype(np.int64, copy=False)
+    P = P.astype(np.int64, copy=False)
+
+    numerador = (B * P) @ a
+    sum_Ai_Pi_sq = (P * P) @ (a * a)
+    sum_Bi_Pi_sq = ((B * P) ** 2).sum(axis=1)
+
+    denominador_completo = np.sqrt(sum_Ai_Pi_sq.astype(np.float64)) * np.sqrt(sum_Bi_Pi_sq.astype(np.float64))
+
+    scores = np.zeros(len(B), dtype=np.float64)
+    np.divide(numerador, denominador_completo, out=scores, where=denominador_completo != 0)
+    return scores
+
+def weighted_cosine_matrix(A, B, P):
+    """
+    Matriz de scores (adotantes x animais) para um bloco de adotantes.
+    A: (n_animais, L); B e P: (n_adotantes, L). Mesma fórmula (e mesma
+    ordem de operações) de weighted_cosine_scores.
+    """
+    A = A.astype(np.int64, copy=False)
+    B = B.astype(np.int64, copy=False)
+    P = P.astype(np.int64, copy=False)
+
+    numerador = (B * P) @ A.T
+    sum_Ai_Pi_sq = (P * P) @ (A * A).T
+    denominador_termo2 = np.sqrt(((B * P) ** 2).sum(axis=1).astype(np.float64))
+
+    denominador_completo = np.sqrt(sum_Ai_Pi_sq.astype(np.float64)) * denominador_termo2[:, None]
+
+    scores = np.zeros(numerador.shape, dtype=np.float64)
+    np.divide(numerador, denominador_completo, out=scores, where=denominador_completo != 0)
+    return scores
+
+def top_n_blocked(A, B, P, n, bloco_adotantes=256, bloco_animais=4096):
+    """
+    Top-n animais para cada adotante, calculando a matriz de scores em blocos
+    para limitar a memória a (bloco_adotantes x (bloco_animais + n)).
+    Empates são desfeitos pela ordem dos animais em A, como em matching.rank_animals.
+    Retorna (índices, scores), ambos (n_adotantes, min(n, n_animais)).
+    """
+    n_adotantes, n_animais = len(B), len(A)
+    n = min(n, n_animais)
+
+    indices = np.zeros((n_adotantes, n), dtype=np.int64)
+    scores = np.zeros((n_adotantes, n), dtype=np.float64)
+    if n == 0:
+        return indices, scores
+
+    for i in range(0, n_adotantes, bloco_adotantes):
+        B_blk, P_blk = B[i:i + bloco_adotantes], P[i:i + bloco_adotantes]
+        linhas = len(B_blk)
+
+        best_idx = np.zeros((linhas, 0), dtype=np.int64)
+        best_score = np.zeros((linhas, 0), dtype=np.float64)
+
+        for j in range(0, n_animais, bloco_animais):
+            S = weighted_cosine_matrix(A[j:j + bloco_animais], B_blk, P_blk)
+            idx = np.broadcast_to(np.arange(j, j + S.shape[1]), S.shape)
+
+            # Junta os melhores até agora com o bloco novo e reordena
+            cand_idx = np.concatenate([best_idx, idx], axis=1)
+            cand_score = np.concatenate([best_score, S], axis=1)
+            ordem = np.lexsort((cand_idx, -cand_score), axis=1)[:, :n]
+
+            best_idx = np.take_along_axis(cand_idx, ordem, axis=1)
+            best_score = np.take_along_axis(cand_score, ordem, axis=1)
+
+        indices[i:i + linhas] = best_idx
+        scores[i:i + linhas] = best_score
+
+    return indices, scores
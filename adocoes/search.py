@@ -0,0 +1,152 @@
+"""
+Busca de adotantes e animais por nome (e contato, nos adotantes), para a
+busca enquanto se digita das páginas de edição e de compatibilidade.
+
+Usa o índice FTS5 busca_<tabela> (ver db._create_search_index), mantido
+pelos gatilhos da tabela. Cada palavra digitada vale como prefixo, sem
+diferenciar maiúsculas nem acentos ("jos sil" acha "José da Silva"). Se
+sobrar lugar na lista, entram também nomes com erro de digitação: para
+cada palavra (só letras), as palavras do vocabulário do índice com a mesma
+inicial e parecidas com ela (difflib). Dentro de cada etapa, os mais
+relevantes (bm25) vêm primeiro. Um texto só com dígitos também busca o
+id. Sem FTS5 no SQLite, a busca cai para LIKE.
+"""
+
+import difflib
+import re
+import unicodedata
+
+from adocoes.config import COLUNAS_BUSCA, BUSCA_LIMITE, BUSCA_CORTE_APROXIMADO, BUSCA_MAX_RANQUEADOS
+from adocoes.db import get_db_connection
+from adocoes.metrics import timed
+
+# Palavras mais curtas não entram na busca aproximada
+_MINIMO_APROXIMADO = 3
+# Palavras parecidas usadas, no máximo, para cada palavra digitada
+_TERMOS_APROXIMADOS = 5
+
+
+def index_table(table_name):
+    """Nome da tabela FTS5 de uma tabela (ValueError se a tabela não é buscável)."""
+    if table_name not in COLUNAS_BUSCA:
+        raise ValueError(f"Tabela '{table_name}' desconhecida.")
+    return f"busca_{table_name}"
+
+def words(texto):
+    """Palavras do texto como o índice as guarda: minúsculas e sem acentos."""
+    sem_acento = "".join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return re.findall(r"\w+", sem_acento.lower())
+
+def exact_query(palavras):
+    """Consulta FTS5 com todas as palavras inteiras ('"jose" "silva"')."""
+    return " ".join(f'"{palavra}"' for palavra in palavras)
+
+def prefix_query(palavras):
+    """Consulta FTS5 com todas as palavras como prefixo ('"jo"* "sil"*')."""
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+def rebuild_index(cursor, table_name):
+    """Refaz o índice de busca da tabela a partir do conteúdo (após carga em massa)."""
+    fts = index_table(table_name)
+    if _has_index(cursor, fts):
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def _has_index(conn, fts):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)).fetchone() is not None
+
+def _columns(table_name):
+    return ['id', 'nome', 'tipo'] + (['contato'] if table_name == 'adotantes' else [])
+
+def _fetch(conn, table_name, consulta, limite):
+    """
+    Os 'limite' primeiros que casam com a consulta, por relevância (bm25).
+    Se casam mais de BUSCA_MAX_RANQUEADOS, na ordem do índice (id): com o
+    LIMIT, o FTS5 para nos primeiros que casam, em vez de calcular a
+    relevância de todos (uma letra casa com quase a tabela inteira).
+    """
+    fts = index_table(table_name)
+    cols = ", ".join(f"t.{col}" for col in _columns(table_name))
+    # Contagem limitada: barata mesmo quando casa com a tabela toda
+    casam = conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH ? LIMIT ?)",
+        (consulta, BUSCA_MAX_RANQUEADOS + 1),
+    ).fetchone()[0]
+    ordem = f"{fts}.rowid" if casam > BUSCA_MAX_RANQUEADOS else f"{fts}.rank, {fts}.rowid"
+    return conn.execute(f"""
+        SELECT {cols} FROM {fts} JOIN {table_name} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH ? ORDER BY {ordem} LIMIT ?
+    """, (consulta, limite)).fetchall()
+
+def _approximate_query(conn, table_name, palavras, corte):
+    """
+    Consulta FTS5 em que cada palavra vale como prefixo ou como uma das
+    palavras parecidas do vocabulário. None se nenhuma tem parecidas.
+    """
+    termos = f"{index_table(table_name)}_termos"
+    grupos, alguma = [], False
+    for palavra in palavras:
+        opcoes = [f'"{palavra}"*']
+        if len(palavra) >= _MINIMO_APROXIMADO and palavra.isalpha():
+            # Mesma inicial e tamanho parecido: o difflib só compara esses
+            vocabulario = [
+                linha[0] for linha in conn.execute(
+                    f"SELECT term FROM {termos} WHERE term >= ? AND term < ? AND length(term) BETWEEN ? AND ?",
+                    (palavra[0], palavra[0] + '\uffff', len(palavra) - 2, len(palavra) + 2),
+                )
+            ]
+            parecidas = difflib.get_close_matches(palavra, vocabulario, n=_TERMOS_APROXIMADOS, cutoff=corte)
+            opcoes += [f'"{termo}"' for termo in parecidas if not termo.startswith(palavra)]
+        alguma = alguma or len(opcoes) > 1
+        grupos.append(f"({' OR '.join(opcoes)})")
+    return " AND ".join(grupos) if alguma else None
+
+def _like(conn, table_name, palavras, limite):
+    """Busca sem FTS5: todas as palavras contidas no nome (ou no contato)."""
+    colunas = COLUNAS_BUSCA[table_name]
+    condicoes, params = [], []
+    for palavra in palavras:
+        condicoes.append("(" + " OR ".join(f"{col} LIKE ?" for col in colunas) + ")")
+        params += [f"%{palavra}%"] * len(colunas)
+    return conn.execute(
+        f"SELECT {', '.join(_columns(table_name))} FROM {table_name} WHERE {' AND '.join(condicoes)} ORDER BY nome, id LIMIT ?",
+        params + [limite],
+    ).fetchall()
+
+@timed('search.search_records', linhas=len)
+def search_records(table_name, texto, limite=BUSCA_LIMITE, corte=BUSCA_CORTE_APROXIMADO, db_name=None):
+    """
+    Até 'limite' registros que casam com o texto, os melhores primeiro:
+    o id (se o texto for um número), os que têm todas as palavras inteiras,
+    os que as têm como prefixo e, por fim, os aproximados (cada grupo por
+    relevância, ou em ordem de id se casar demais; ver _fetch). Retorna uma lista de dicts (id, nome, tipo e, nos
+    adotantes, contato).
+    """
+    fts = index_table(table_name)
+    palavras = words(texto)
+    if not palavras:
+        return []
+
+    encontrados = {}
+
+    def juntar(linhas):
+        for linha in linhas:
+            encontrados.setdefault(linha['id'], dict(linha))
+        return len(encontrados) >= limite
+
+    conn = get_db_connection(db_name)
+    try:
+        if texto.strip().isdigit():
+            juntar(conn.execute(
+                f"SELECT {', '.join(_columns(table_name))} FROM {table_name} WHERE id = ?", (int(texto),)
+            ).fetchall())
+
+        if not _has_index(conn, fts):
+            juntar(_like(conn, table_name, palavras, limite))
+        elif not (juntar(_fetch(conn, table_name, exact_query(palavras), limite))
+                  or juntar(_fetch(conn, table_name, prefix_query(palavras), limite))):
+            aproximada = _approximate_query(conn, table_name, palavras, corte)
+            if aproximada is not None:
+                juntar(_fetch(conn, table_name, aproximada, limite))
+    finally:
+        conn.close()
+    return list(encontrados.values())[:limite]
@@ -0,0 +1,246 @@
+"""
+API HTTP local de compatibilidade (ASGI), para o quiosque e o site parceiro
+consultarem sem passar pela interface do Streamlit.
+
+    GET /adotantes/{id}/matches?k=10    animais mais compatíveis com o adotante
+    GET /animais/{id}/candidatos?k=10   adotantes mais compatíveis com o animal
+
+As listas são as mesmas das páginas (top-k + empates, mesmo score). Os
+animais vêm do cache em memória (adocoes.cache), conferido a cada lote
+contra a versão dos animais no banco: cadastros feitos pelo app ou por
+outros processos aparecem no lote seguinte. O SQLite e o cálculo rodam
+em threads (asyncio.to_thread), fora do event loop. Pedidos do mesmo tipo
+(e mesmo k) que chegam dentro de API_JANELA_LOTE_MS são calculados juntos:
+uma única matriz de scores para os adotantes do lote, ou uma única leitura
+dos adotantes do tipo para os animais do lote.
+
+O app é ASGI puro (sem framework). Para servir:
+    python -m adocoes.server --port 8502
+(usa o uvicorn, que é opcional), ou qualquer servidor ASGI com
+adocoes.server:app.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+
+import numpy as np
+
+try:
+    import uvicorn
+except ImportError:  # uvicorn é opcional: o app ASGI funciona com qualquer servidor
+    uvicorn = None
+
+from adocoes import cache as animal_cache
+from adocoes import snapshot
+from adocoes.config import API_HOST, API_PORT, API_JANELA_LOTE_MS, API_K_MAX, TOP_K, TOP_K_METODO
+from adocoes.db import get_db_connection, init_db, load_tipo
+from adocoes.matching import VectorMismatch, rank_adopters, sync_caches
+from adocoes.records import find_record
+from adocoes.scoring import adopter_vectors
+from adocoes.signatures import top_n_signatures
+
+ROTAS = [
+    (re.compile(r"^/adotantes/(\d+)/matches/?$"), 'adotantes'),
+    (re.compile(r"^/animais/(\d+)/candidatos/?$"), 'animais'),
+]
+
+
+class HTTPError(Exception):
+    """Erro com status HTTP; vira {'erro': mensagem} na resposta."""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def parse_k(query_string):
+    """Lê ?k= da query string (padrão TOP_K, de 1 a API_K_MAX)."""
+    valores = parse_qs(query_string).get('k')
+    if not valores:
+        return TOP_K
+    try:
+        k = int(valores[-1])
+    except ValueError:
+        raise HTTPError(400, f"k deve ser um número inteiro, não {valores[-1]!r}.") from None
+    if not 1 <= k <= API_K_MAX:
+        raise HTTPError(400, f"k deve estar entre 1 e {API_K_MAX}.")
+    return k
+
+def rank_adopters_batch(adotantes, tipo, k, db_name=None):
+    """
+    Animais mais compatíveis (top-k + empates) para vários adotantes do
+    mesmo tipo, com uma só matriz (perfis de adotante x assinaturas).
+    Retorna uma lista de resultados por adotante; adotantes com vetor de
+    tamanho errado recebem a exceção VectorMismatch no lugar da lista.
+    """
+    # Animais escritos por outro processo entram antes do cálculo
+    sync_caches(db_name)
+    entry = animal_cache.get_animal_entry(tipo, db_name)
+    if entry is None:
+        return [[] for _ in adotantes]
+
+    tamanho = entry['assinaturas'].shape[1]
+    vetores = [adopter_vectors(adotante) for adotante in adotantes]
+    validos = [i for i, (B, P) in enumerate(vetores) if len(B) == len(P) == tamanho]
+
+    resultados = [
+        VectorMismatch(f"Incompatibilidade de vetores (A:{tamanho}, B:{len(B)}, P:{len(P)}) para o adotante {adotante['nome']}.")
+        for adotante, (B, P) in zip(adotantes, vetores)
+    ]
+    if validos:
+        B = np.vstack([vetores[i][0] for i in validos])
+        P = np.vstack([vetores[i][1] for i in validos])
+        indices, scores = top_n_signatures(entry, B, P, k, empates=True)
+        ids, nomes = entry['ids'], entry['nomes']
+        for i, idx, score in zip(validos, indices, scores):
+            resultados[i] = [
+                {'id': animal_id, 'nome': nome, 'score': s}
+                for animal_id, nome, s in zip(ids[idx].tolist(), nomes[idx].tolist(), score.tolist())
+            ]
+    return resultados
+
+def rank_animals_batch(animais, tipo, k, db_name=None):
+    """
+    Adotantes mais compatíveis (top-k + empates) para vários animais do
+    mesmo tipo, lendo os adotantes do tipo uma só vez. Como em
+    rank_adopters_batch, animais com vetor inválido recebem a exceção.
+    """
+    conn = get_db_connection(db_name)
+    try:
+        adotantes_df = load_tipo(conn, 'adotantes', tipo)
+    finally:
+        conn.close()
+
+    if adotantes_df.empty:
+        return [[] for _ in animais]
+    resultados = []
+    for animal in animais:
+        try:
+            resultados.append(rank_adopters(animal, adotantes_df, k, TOP_K_METODO)[0])
+        except VectorMismatch as e:
+            resultados.append(e)
+    return resultados
+
+def create_app(db_name=None, janela_ms=API_JANELA_LOTE_MS):
+    """Cria o app ASGI servindo o banco informado (None = DB_NAME)."""
+    calculos = {'adotantes': rank_adopters_batch, 'animais': rank_animals_batch}
+    # (tabela, tipo, k) -> [(registro, future)] do lote que ainda está aberto
+    lotes = {}
+
+    async def processar_lote(chave):
+        await asyncio.sleep(janela_ms / 1000)
+        lote = lotes.pop(chave)
+        tabela, tipo, k = chave
+        registros = [registro for registro, _ in lote]
+        try:
+            resultados = await asyncio.to_thread(calculos[tabela], registros, tipo, k, db_name)
+        except Exception as e:
+            resultados = [e] * len(lote)
+        for (_, futuro), resultado in zip(lote, resultados):
+            if futuro.done():
+                continue
+            if isinstance(resultado, Exception):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+    async def calcular(tabela, registro, k):
+        """Entra no lote aberto do tipo (ou abre um) e espera o resultado."""
+        chave = (tabela, registro['tipo'], k)
+        futuro = asyncio.get_running_loop().create_future()
+        if chave not in lotes:
+            lotes[chave] = []
+            asyncio.create_task(processar_lote(chave))
+        lotes[chave].append((registro, futuro))
+        return await futuro
+
+    async def responder(path, query_string):
+        for padrao, tabela in ROTAS:
+            encontrado = padrao.match(path)
+            if encontrado:
+                break
+        else:
+            raise HTTPError(404, f"Rota não encontrada: {path}")
+
+        k = parse_k(query_string)
+        id_ = int(encontrado.group(1))
+        registro = await asyncio.to_thread(find_record, tabela, id_, db_name)
+        if registro is None:
+            nome = 'Adotante' if tabela == 'adotantes' else 'Animal'
+            raise HTTPError(404, f"{nome} com ID {id_} não encontrado.")
+
+        try:
+            lista = await calcular(tabela, registro, k)
+        except VectorMismatch as e:
+            raise HTTPError(422, str(e)) from None
+
+        resumo = {'id': registro['id'], 'nome': registro['nome'], 'tipo': registro['tipo']}
+        if tabela == 'adotantes':
+            return {'adotante': resumo, 'k': k, 'matches': lista}
+        return {'animal': resumo, 'k': k, 'candidatos': lista}
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await _lifespan(receive, send, db_name)
+            return
+        if scope['type'] != 'http':
+            return
+
+        try:
+            if scope['method'] not in ('GET', 'HEAD'):
+                raise HTTPError(405, "Só o método GET é aceito.")
+            status, corpo = 200, await responder(scope['path'], scope['query_string'].decode('latin-1'))
+        except HTTPError as e:
+            status, corpo = e.status, {'erro': str(e)}
+        except Exception as e:
+            status, corpo = 500, {'erro': f"{type(e).__name__}: {e}"}
+        await _send_json(send, status, corpo, corpo_vazio=scope['method'] == 'HEAD')
+
+    return app
+
+async def _lifespan(receive, send, db_name):
+    """Inicializa o banco (e o snapshot em memória, se ligado) antes de aceitar pedidos."""
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            try:
+                await asyncio.to_thread(init_db, db_name)
+                await asyncio.to_thread(snapshot.configure, db_name)
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def _send_json(send, status, corpo, corpo_vazio=False):
+    dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json; charset=utf-8'),
+            (b'content-length', str(len(dados)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b'' if corpo_vazio else dados})
+
+app = create_app()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP local de compatibilidade.")
+    parser.add_argument("--host", default=API_HOST, help=f"Endereço (padrão: {API_HOST}).")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"Porta (padrão: {API_PORT}).")
+    parser.add_argument("--db", help="Caminho do banco SQLite (padrão: adocoes.db).")
+    parser.add_argument("--janela-ms", type=float, default=API_JANELA_LOTE_MS, help="Espera para juntar pedidos do mesmo tipo.")
+    args = parser.parse_args(argv)
+    if uvicorn is None:
+        parser.error("o uvicorn não está instalado (pip install uvicorn); ou sirva adocoes.server:app com outro servidor ASGI.")
+    uvicorn.run(create_app(args.db, args.janela_ms), host=args.host, port=args.port, log_level="info")
+
+if __name__ == "__main__":
+    main()
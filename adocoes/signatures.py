@@ -0,0 +1,145 @@
+"""
+Índice de assinaturas: agrupa animais com o mesmo vetor de códigos.
+
+As 10 características admitem no máximo 3 * 2**9 = 1536 vetores distintos,
+então o score é calculado uma vez por assinatura e depois expandido para os
+animais de cada grupo.
+"""
+
+import numpy as np
+
+from adocoes.bitmask import pack_codes, bitmask_scores
+from adocoes.scoring import build_code_matrix, weighted_cosine_scores, weighted_cosine_matrix
+
+# Motores de score: 'denso' (matriz int8 x vetor) ou 'bitmask' (máscaras uint32 + tabelas)
+MOTORES = ('denso', 'bitmask')
+
+
+def group_signatures(A):
+    """
+    Agrupa as linhas idênticas de A.
+    Retorna (assinaturas únicas, inverse, contagens, membros), onde membros é
+    uma lista com as posições (crescentes) das linhas de cada assinatura.
+    """
+    if len(A) == 0:
+        return A, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), []
+
+    assinaturas, inverse, contagens = np.unique(A, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    # Ordenação estável mantém as posições de cada grupo em ordem crescente
+    posicoes = np.argsort(inverse, kind='stable')
+    membros = np.split(posicoes, np.cumsum(contagens)[:-1])
+    return assinaturas, inverse, contagens, membros
+
+def signature_entry(A, ids, nomes):
+    """Entrada do índice para um conjunto de animais (já válidos) de um mesmo tipo."""
+    assinaturas, inverse, contagens, membros = group_signatures(A)
+    return {
+        'assinaturas': assinaturas,
+        'mascaras': pack_codes(assinaturas),
+        'contagens': contagens,
+        'membros': [ids[m] for m in membros],
+        'posicoes': membros,
+        'inverse': inverse,
+        'ids': ids,
+        'nomes': nomes,
+    }
+
+def build_signature_index(df, tamanho=None):
+    """
+    Agrupa os animais por (tipo, assinatura de códigos).
+    Retorna {tipo: {'assinaturas', 'mascaras', 'contagens', 'membros', 'posicoes', 'inverse', 'ids', 'nomes'}},
+    com 'membros' guardando os ids e 'posicoes' as posições (em 'ids') dos
+    animais de cada assinatura. Animais com vetor inválido ficam fora do índice.
+    """
+    A, valid = build_code_matrix(df, tamanho=tamanho)
+    tipos = df['tipo'].to_numpy()
+    ids = df['id'].to_numpy()
+    nomes = df['nome'].to_numpy()
+
+    index = {}
+    for tipo in dict.fromkeys(tipos[valid].tolist()):
+        mask = valid & (tipos == tipo)
+        index[tipo] = signature_entry(A[mask], ids[mask], nomes[mask])
+    return index
+
+def expand_order(scores_assinaturas, inverse):
+    """
+    Ordem (decrescente por score, estável por posição) de todos os animais a
+    partir dos scores por assinatura. Como há no máximo 1536 níveis de score,
+    a ordenação é um radix sort sobre o nível de cada animal: O(n).
+    """
+    # Nível 0 = maior score; assinaturas com o mesmo score compartilham o nível
+    _, nivel = np.unique(-scores_assinaturas, return_inverse=True)
+    nivel_animal = nivel.reshape(-1)[inverse].astype(np.uint16)
+    return np.argsort(nivel_animal, kind='stable')
+
+def signature_scores(entry, B, P, motor='denso'):
+    """Score de cada assinatura da entrada contra o adotante, com o motor escolhido."""
+    if motor == 'denso':
+        return weighted_cosine_scores(entry['assinaturas'], B, P)
+    if motor == 'bitmask':
+        return bitmask_scores(entry['mascaras'], B, P)
+    raise ValueError(f"Motor de score desconhecido: '{motor}'. Use um de {MOTORES}.")
+
+def score_entry(entry, B, P, motor='denso'):
+    """
+    Scores de todos os animais de uma entrada do índice contra o adotante,
+    calculados uma vez por assinatura. Retorna (ordem, scores por animal).
+    """
+    scores_assinaturas = signature_scores(entry, B, P, motor)
+    ordem = expand_order(scores_assinaturas, entry['inverse'])
+    return ordem, scores_assinaturas[entry['inverse']]
+
+def top_n_signatures(entry, B, P, n, bloco_adotantes=4096, empates=False):
+    """
+    Top-n posições (na ordem de entry['ids']) para cada adotante.
+    Scores são calculados por (perfil de adotante x assinatura de animal) e
+    expandidos depois; empates entre assinaturas seguem a ordem dos animais.
+    Com empates=True inclui também todos os empatados com o n-ésimo.
+    Retorna (índices, scores): listas com um array por adotante.
+    """
+    n_adotantes = len(B)
+    indices = [np.zeros(0, dtype=np.int64)] * n_adotantes
+    scores = [np.zeros(0, dtype=np.float64)] * n_adotantes
+    n = min(n, len(entry['inverse']))
+    if n == 0 or n_adotantes == 0:
+        return indices, scores
+
+    # Adotantes com o mesmo (B, P) têm exatamente o mesmo ranking
+    perfis, _, _, perfil_membros = group_signatures(np.hstack([B, P]))
+    L = B.shape[1]
+
+    for i in range(0, len(perfis), bloco_adotantes):
+        bloco = perfis[i:i + bloco_adotantes]
+        S = weighted_cosine_matrix(entry['assinaturas'], bloco[:, :L], bloco[:, L:])
+
+        for j, linha in enumerate(S):
+            idx = _top_n_from_signatures(linha, entry['posicoes'], n, empates)
+            score_idx = linha[entry['inverse'][idx]]
+            for alvo in perfil_membros[i + j].tolist():
+                indices[alvo] = idx
+                scores[alvo] = score_idx
+
+    return indices, scores
+
+def _top_n_from_signatures(scores_assinaturas, membros, n, empates=False):
+    """Expande só os níveis de score necessários para preencher o top-n."""
+    ordem = np.argsort(-scores_assinaturas, kind='stable')
+    resultado = []
+    total = 0
+    k = 0
+    while total < n:
+        # Junta todas as assinaturas empatadas neste nível de score
+        nivel = scores_assinaturas[ordem[k]]
+        grupo = []
+        while k < len(ordem) and scores_assinaturas[ordem[k]] == nivel:
+            grupo.append(membros[ordem[k]])
+            k += 1
+        posicoes = np.sort(np.concatenate(grupo))
+        if not empates:
+            posicoes = posicoes[:n - total]
+        resultado.append(posicoes)
+        total += len(posicoes)
+    return np.concatenate(resultado)
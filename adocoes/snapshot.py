@@ -0,0 +1,120 @@
+"""
+Modo de leitura em memória e backups online do banco.
+
+enable() copia o banco para um SQLite em memória compartilhado pelas
+conexões do processo (VFS memdb). A partir daí get_db_connection devolve
+conexões que leem da memória e gravam no arquivo, que continua sendo a
+fonte da verdade: cada commit confirma primeiro no arquivo e depois repete
+as escritas na memória (ver db.SnapshotConnection). Cargas em massa e
+escritas de outros processos (a API, os jobs), percebidas pelo PRAGMA
+data_version, fazem o snapshot ser recopiado do arquivo. Se a repetição ou
+a cópia falhar, o snapshot é desligado e as leituras voltam para o arquivo.
+
+O snapshot é por processo e deve ser ligado na inicialização, depois de
+init_db e antes de servir pedidos. O memdb limita o banco a 1 GiB.
+
+backup() grava uma cópia consistente do arquivo em passos curtos, sem travar
+leitores; start_backups() repete isso periodicamente numa thread.
+
+Uso:
+    init_db()
+    snapshot.enable()
+    snapshot.start_backups('adocoes-backup.db', intervalo_s=600)
+"""
+
+import os
+import sqlite3
+import threading
+import warnings
+
+from adocoes import db
+from adocoes.config import (
+    SNAPSHOT_MEMORIA, BACKUP_INTERVALO_S, BACKUP_ARQUIVO, BACKUP_PAGINAS_POR_PASSO, BACKUP_PAUSA_S,
+)
+from adocoes.metrics import span
+
+# Backups periódicos em andamento: {caminho do banco: {'thread', 'parar': Event}}
+_backups = {}
+_lock = threading.Lock()
+
+
+def enabled(db_name=None):
+    """Se as leituras do banco estão vindo do snapshot em memória."""
+    return db.snapshot_enabled(db_name)
+
+def enable(db_name=None):
+    """
+    Carrega o banco na memória e passa a servir as leituras dele (não faz
+    nada se já estiver ativo). Retorna o tamanho do snapshot em bytes.
+    """
+    with span('snapshot.enable') as medida:
+        medida['bytes'] = db.open_snapshot(db_name)
+    return medida['bytes']
+
+def refresh(db_name=None):
+    """Recopia o snapshot do arquivo agora (não faz nada se ele não está ativo)."""
+    with span('snapshot.refresh'):
+        db.refresh_snapshot(db_name)
+
+def disable(db_name=None):
+    """Desliga o snapshot: conexões novas voltam a ler do arquivo."""
+    db.close_snapshot(db_name)
+
+def backup(destino, db_name=None, paginas=BACKUP_PAGINAS_POR_PASSO, pausa=BACKUP_PAUSA_S):
+    """
+    Grava uma cópia consistente do banco em 'destino' com a API de backup
+    do SQLite, 'paginas' páginas por passo. Entre os passos, leituras e
+    escritas seguem (se houver escrita, o backup recomeça). Copia sempre do
+    arquivo, mesmo com o snapshot ativo: ele é a fonte da verdade. O destino
+    só é trocado no fim, então nunca fica pela metade. Retorna o caminho.
+    """
+    temporario = f"{destino}.tmp"
+    with span('snapshot.backup') as medida:
+        origem = db.get_db_connection(db_name, disco=True)
+        try:
+            alvo = sqlite3.connect(temporario)
+            try:
+                origem.backup(alvo, pages=paginas, sleep=pausa)
+            finally:
+                alvo.close()
+            os.replace(temporario, destino)
+        finally:
+            origem.close()
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        medida['bytes'] = os.path.getsize(destino)
+    return destino
+
+def start_backups(destino=BACKUP_ARQUIVO, intervalo_s=BACKUP_INTERVALO_S, db_name=None):
+    """Faz backup(destino) a cada intervalo_s segundos numa thread (uma por banco)."""
+    key = db.db_path(db_name)
+    with _lock:
+        if key in _backups:
+            return
+        parar = threading.Event()
+
+        def executar():
+            while not parar.wait(intervalo_s):
+                try:
+                    backup(destino, db_name)
+                except Exception as e:
+                    warnings.warn(f"Backup de {key} em {destino} falhou: {e}", RuntimeWarning)
+
+        thread = threading.Thread(target=executar, name=f"backup-{os.path.basename(key)}", daemon=True)
+        _backups[key] = {'thread': thread, 'parar': parar}
+        thread.start()
+
+def stop_backups(db_name=None):
+    """Para os backups periódicos do banco (espera o que estiver em andamento)."""
+    with _lock:
+        agendado = _backups.pop(db.db_path(db_name), None)
+    if agendado is not None:
+        agendado['parar'].set()
+        agendado['thread'].join()
+
+def configure(db_name=None):
+    """Liga o snapshot e os backups periódicos conforme SNAPSHOT_MEMORIA e BACKUP_INTERVALO_S."""
+    if SNAPSHOT_MEMORIA:
+        enable(db_name)
+    if BACKUP_INTERVALO_S > 0:
+        start_backups(BACKUP_ARQUIVO, BACKUP_INTERVALO_S, db_name)
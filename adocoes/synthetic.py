@@ -0,0 +1,123 @@
+"""
+Dados sintéticos para testes de carga e benchmarks.
+
+Gera CSVs de animais e adotantes no formato da importação (CSV_COLS_*),
+com valores de CARACTERISTICAS, códigos correspondentes e pesos no formato
+'888'. As distribuições não são uniformes (mais cães que gatos, mais
+animais de porte médio, pesos concentrados em torno de 5), para que o
+número de assinaturas distintas e de empates fique próximo do real.
+
+A geração é vetorizada e feita em blocos, então 1M de linhas não precisa
+caber em memória. Mesma semente e mesmo tamanho de bloco -> mesmo arquivo.
+
+Uso:
+    python -m adocoes.synthetic --animais 100000 --adotantes 20000 --dir dados/
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from adocoes.config import (
+    TIPO_OPTIONS, CARACTERISTICAS, COLUNAS_FEATURES, CSV_COLS_ANIMAIS, CSV_COLS_ADOTANTES,
+    CSV_LINHAS_POR_BLOCO,
+)
+from adocoes.encoding import peso_to_text
+
+# Probabilidade de cada tipo (na ordem de TIPO_OPTIONS)
+PROB_TIPOS = [0.6, 0.4]
+
+# Probabilidade de cada opção (na ordem de CARACTERISTICAS[...]['options']);
+# características ausentes são uniformes
+PROB_OPCOES = {
+    'tamanho': [0.3, 0.45, 0.25],
+    'moradia': [0.55, 0.45],
+    'pelo': [0.35, 0.65],
+    'queda': [0.4, 0.6],
+    'crianca': [0.7, 0.3],
+    'brincalhao': [0.75, 0.25],
+    'ativo': [0.6, 0.4],
+    'guarda': [0.25, 0.75],
+    'late': [0.55, 0.45],
+}
+
+# Pesos 0-10 ~ Binomial(10, 0.5): a maioria dos adotantes fica perto de 5
+PESO_PROB = 0.5
+
+
+def _probabilidades(feature):
+    opcoes = CARACTERISTICAS[feature]['options']
+    return PROB_OPCOES.get(feature, [1 / len(opcoes)] * len(opcoes))
+
+def generate_chunk(table_name, inicio, n, rng):
+    """
+    DataFrame com n linhas sintéticas da tabela (colunas de CSV_COLS_*),
+    numeradas a partir de 'inicio' (usado nos nomes).
+    """
+    if table_name not in ('animais', 'adotantes'):
+        raise ValueError(f"Tabela '{table_name}' desconhecida.")
+    adotantes = table_name == 'adotantes'
+
+    numeros = np.arange(inicio, inicio + n)
+    prefixo = 'Adotante' if adotantes else 'Animal'
+    dados = {
+        'nome': [f"{prefixo} {i:07d}" for i in numeros.tolist()],
+        'tipo': np.asarray(TIPO_OPTIONS)[rng.choice(len(TIPO_OPTIONS), size=n, p=PROB_TIPOS)],
+    }
+    if adotantes:
+        dados['contato'] = [f"adotante{i}@exemplo.com" for i in numeros.tolist()]
+
+    for feature in COLUNAS_FEATURES:
+        opcoes = CARACTERISTICAS[feature]['options']
+        escolha = rng.choice(len(opcoes), size=n, p=_probabilidades(feature))
+        dados[feature] = np.asarray(opcoes)[escolha]
+        codigos = [CARACTERISTICAS[feature]['map'][opcao] for opcao in opcoes]
+        dados[f"codigo_{feature}"] = np.asarray(codigos)[escolha]
+        if adotantes:
+            # Tabela (peso 0-10) -> texto, com o tamanho do código desta característica
+            textos = np.asarray([peso_to_text(peso, codigos[0]) for peso in range(11)])
+            dados[f"peso_{feature}"] = textos[rng.binomial(10, PESO_PROB, size=n)]
+
+    colunas = CSV_COLS_ADOTANTES if adotantes else CSV_COLS_ANIMAIS
+    return pd.DataFrame(dados)[colunas]
+
+def generate_chunks(table_name, n, seed=0, linhas_por_bloco=CSV_LINHAS_POR_BLOCO):
+    """Gera os n registros em blocos (DataFrames de até linhas_por_bloco linhas)."""
+    # Uma semente por tabela: animais e adotantes não repetem a mesma sequência
+    rng = np.random.default_rng([seed, 0 if table_name == 'animais' else 1])
+    for inicio in range(0, n, linhas_por_bloco):
+        yield generate_chunk(table_name, inicio + 1, min(linhas_por_bloco, n - inicio), rng)
+
+def write_csv(path, table_name, n, seed=0, linhas_por_bloco=CSV_LINHAS_POR_BLOCO):
+    """Grava um CSV sintético com n registros da tabela. Retorna o caminho."""
+    colunas = CSV_COLS_ADOTANTES if table_name == 'adotantes' else CSV_COLS_ANIMAIS
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(",".join(colunas) + "\n")
+        for bloco in generate_chunks(table_name, n, seed, linhas_por_bloco):
+            bloco.to_csv(f, index=False, header=False, lineterminator='\n')
+    return path
+
+def write_dataset(diretorio, n_animais, n_adotantes, seed=0):
+    """Grava animais.csv e adotantes.csv em 'diretorio'. Retorna {tabela: caminho}."""
+    os.makedirs(diretorio, exist_ok=True)
+    return {
+        'animais': write_csv(os.path.join(diretorio, 'animais.csv'), 'animais', n_animais, seed),
+        'adotantes': write_csv(os.path.join(diretorio, 'adotantes.csv'), 'adotantes', n_adotantes, seed),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos de animais e adotantes.")
+    parser.add_argument("--animais", type=int, default=1000, help="Quantidade de animais (padrão: 1000).")
+    parser.add_argument("--adotantes", type=int, default=200, help="Quantidade de adotantes (padrão: 200).")
+    parser.add_argument("--dir", default=".", help="Diretório de saída (padrão: atual).")
+    parser.add_argument("--seed", type=int, default=0, help="Semente (padrão: 0).")
+    args = parser.parse_args(argv)
+
+    caminhos = write_dataset(args.dir, args.animais, args.adotantes, args.seed)
+    for tabela, caminho in caminhos.items():
+        print(f"{tabela}: {caminho}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Seleção do top-k com empates, sem ordenar a lista inteira.
+
+Regra de exibição da página de compatibilidade: os k maiores scores e mais
+todos os que empatam com o k-ésimo. A ordem de saída é a mesma de
+sorted(..., reverse=True): score decrescente e, nos empates, a posição
+original. Custo O(n + m log m), onde m = k + empates, mais o da busca do
+k-ésimo maior: O(n) em média com 'argpartition' (introselect) e
+O(n + k log n) com 'heap' (heapify de todos e k retiradas).
+"""
+
+import heapq
+
+import numpy as np
+
+METODOS = ('argpartition', 'heap')
+
+
+def kth_largest(scores, k, metodo='argpartition'):
+    """Valor do k-ésimo maior score (k >= 1 e k <= len(scores))."""
+    if metodo == 'argpartition':
+        scores = np.asarray(scores)
+        return scores[np.argpartition(-scores, k - 1)[k - 1]]
+    if metodo == 'heap':
+        # heapify é O(n); cada retirada, O(log n). heapq.nlargest seria
+        # O(n log k): mantém um heap de k e compara cada um dos n com o topo
+        heap = [-score for score in np.asarray(scores).tolist()]
+        heapq.heapify(heap)
+        for _ in range(k - 1):
+            heapq.heappop(heap)
+        return -heap[0]
+    raise ValueError(f"Método de seleção desconhecido: '{metodo}'. Use um de {METODOS}.")
+
+def top_k_with_ties(scores, k, metodo='argpartition'):
+    """
+    Índices dos k maiores scores mais os empatados com o k-ésimo, já na
+    ordem final (score decrescente, posição crescente nos empates).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if n <= k:
+        candidatos = np.arange(n)
+    else:
+        limite = kth_largest(scores, k, metodo)
+        candidatos = np.flatnonzero(scores >= limite)
+
+    # Só os candidatos são ordenados: posição como critério de desempate
+    ordem = np.lexsort((candidatos, -scores[candidatos]))
+    return candidatos[ordem]
@@ -1,475 +1,242 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
-import math
-
-# --- Configuração do Banco de Dados ---
-DB_NAME = "adocoes.db"
-
-# --- Mapeamentos ---
-
-# Característica 'tipo' é um FILTRO, não entra no score.
-TIPO_OPTIONS = ['cão', 'gato']
-
-# Dicionário mestre das 10 CARACTERÍSTICAS que entram no score.
-CARACTERISTICAS = {
-    'tamanho': {
-        'map': {'pequeno': '100', 'medio': '010', 'grande': '001'},
-        'q_adotante': 'Que tamanho de animal você prefere?',
-        'q_animal': 'Porte do animal:'
-    },
-    'moradia': {
-        'map': {'casa': '10', 'apartamento': '01'},
-        'q_adotante': 'Qual tipo da sua moradia?',
-        'q_animal': 'Moradia ideal:'
-    },
-    'pelo': {
-        'map': {'longos': '10', 'curtos': '01'},
-        'q_adotante': 'Que tipo de pelo você prefere?',
-        'q_animal': 'Pelagem:'
-    },
-    'sexo': {
-        'map': {'macho': '10', 'fêmea': '01'},
-        'q_adotante': 'Você prefere animal macho ou fêmea?',
-        'q_animal': 'Sexo:'
-    },
-    'queda': {
-        'map': {'sim': '10', 'não': '01'},
-        'q_adotante': 'Queda de pelo te incomoda? (sim=incomoda, não=ok)',
-        'q_animal': 'Apresenta queda de pelo:'
-    },
-    'crianca': {
-        'map': {'sim': '10', 'não': '01'},
-        'q_adotante': 'O animal deve ser amigável com criança?',
-        'q_animal': 'Amigável com criança:'
-    },
-    'brincalhao': {
-        'map': {'sim': '10', 'não': '01'},
-        'q_adotante': 'O animal deve ser brincalhão?',
-        'q_animal': 'Brincalhão:'
-    },
-    'ativo': {
-        'map': {'sim': '10', 'não': '01'},
-        'q_adotante': 'O animal deve ter muita disposição?',
-        'q_animal': 'Muito ativo:'
-    },
-    'guarda': {
-        'map': {'sim': '10', 'não': '01'},
-        'q_adotante': 'O animal precisa servir para guarda?',
-        'q_animal': 'Serve para guarda:'
-    },
-    'late': {
-        'map': {'sim': '10', 'não': '01'},
-        'q_adotante': 'É positivo o animal latir?',
-        'q_animal': 'Tende a latir:'
-    }
-}
-
-# Gera listas de opções a partir dos mapas
-for k in CARACTERISTICAS:
-    CARACTERISTICAS[k]['options'] = list(CARACTERISTICAS[k]['map'].keys())
-
-# Nomes das colunas no DB (baseado nas 10 características)
-COLUNAS_FEATURES = list(CARACTERISTICAS.keys())
-COLUNAS_CODIGO = [f"codigo_{k}" for k in COLUNAS_FEATURES]
-COLUNAS_PESO = [f"peso_{k}" for k in COLUNAS_FEATURES]
-
-# Colunas totais para cada tabela (adicionando 'tipo' manualmente)
-COLUNAS_ANIMAIS = ['id', 'nome', 'tipo'] + COLUNAS_FEATURES + COLUNAS_CODIGO
-COLUNAS_ADOTANTES = ['id', 'nome', 'contato', 'tipo'] + COLUNAS_FEATURES + COLUNAS_CODIGO + COLUNAS_PESO
 
-# Colunas necessárias para CSV (sem ID)
-CSV_COLS_ANIMAIS = [col for col in COLUNAS_ANIMAIS if col != 'id']
-CSV_COLS_ADOTANTES = [col for col in COLUNAS_ADOTANTES if col != 'id']
+from adocoes.config import (
+    TIPO_OPTIONS, CARACTERISTICAS, COLUNAS_FEATURES, COLUNAS_ANIMAIS, COLUNAS_ADOTANTES,
+    CSV_COLS_ANIMAIS, CSV_COLS_ADOTANTES, CSV_CHAVES_NATURAIS, TOP_K, TOP_K_METODO,
+)
+from adocoes.db import init_db
+from adocoes.csv_import import csv_columns
+from adocoes.export import available_formats, export_bytes, MIME_TYPES
+from adocoes import matching, metrics, records, result_cache, search, snapshot
 
 
-def get_db_connection():
-    """Cria e retorna uma conexão com o banco de dados SQLite."""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    """
-    Inicializa o banco de dados e executa a migração, adicionando colunas
-    que não existem sem apagar dados.
-    """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # --- Tabela Adotantes ---
-    # CORREÇÃO 1: Removido 'UNIQUE' da coluna 'nome'
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS adotantes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL
-    );
-    ''')
-    
-    # Pega colunas existentes
-    cursor.execute("PRAGMA table_info(adotantes)")
-    existing_cols_adotantes = [col['name'] for col in cursor.fetchall()]
-
-    # Define colunas necessárias (Nome já existe)
-    # Adiciona 'contato' e 'tipo' manually
-    required_cols_adotantes = {
-        "contato": "TEXT",
-        "tipo": "TEXT DEFAULT 'cão'" # Valor padrão 'cão'
-    }
-    
-    # Adiciona as 10 features, códigos e pesos
-    for feature in COLUNAS_FEATURES:
-        map_ = CARACTERISTICAS[feature]['map']
-        default_peso = str(5) * len(list(map_.values())[0]) 
-        
-        required_cols_adotantes[feature] = "TEXT"
-        required_cols_adotantes[f"codigo_{feature}"] = "TEXT"
-        required_cols_adotantes[f"peso_{feature}"] = f"TEXT DEFAULT '{default_peso}'"
-
-    # Adiciona colunas faltantes para Adotantes
-    for col, type_ in required_cols_adotantes.items():
-        if col not in existing_cols_adotantes:
-            try:
-                cursor.execute(f"ALTER TABLE adotantes ADD COLUMN {col} {type_}")
-            except sqlite3.OperationalError:
-                # Coluna pode já existir de uma execução anterior falha
-                pass
-
-    # --- Tabela Animais ---
-    # CORREÇÃO 1: Removido 'UNIQUE' da coluna 'nome'
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS animais (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL
-    );
-    ''')
-
-    # Pega colunas existentes
-    cursor.execute("PRAGMA table_info(animais)")
-    existing_cols_animais = [col['name'] for col in cursor.fetchall()]
-
-    # Define colunas necessárias (Nome já existe)
-    # Adiciona 'tipo' manualmente
-    required_cols_animais = {
-        "tipo": "TEXT DEFAULT 'cão'" # Valor padrão 'cão'
-    }
-    # Adiciona as 10 features e códigos
-    for feature in COLUNAS_FEATURES:
-        required_cols_animais[feature] = "TEXT"
-        required_cols_animais[f"codigo_{feature}"] = "TEXT"
-
-    # Adiciona colunas faltantes para Animais
-    for col, type_ in required_cols_animais.items():
-        if col not in existing_cols_animais:
-            try:
-                cursor.execute(f"ALTER TABLE animais ADD COLUMN {col} {type_}")
-            except sqlite3.OperationalError:
-                pass
-    
-    conn.commit()
-    conn.close()
-
 # --- Funções CRUD (Create, Read, Update, Delete) ---
+# A lógica fica em adocoes.records; aqui as exceções viram mensagens.
 
 def add_data(table_name, data):
     """Adiciona um novo registro ao banco de dados usando um dicionário de dados."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cols = []
-        params = []
-        
-        # Adiciona nome e tipo (ambas as tabelas)
-        cols.append('nome')
-        params.append(data['nome'])
-        cols.append('tipo')
-        params.append(data['tipo'])
-        
-        # Adiciona contato (só adotantes)
-        if table_name == 'adotantes':
-            cols.append('contato')
-            params.append(data['contato'])
-
-        # Processa as 10 características do score
-        for feature in COLUNAS_FEATURES:
-            valor = data[feature]
-            codigo = CARACTERISTICAS[feature]['map'][valor]
-            
-            cols.append(feature)
-            cols.append(f"codigo_{feature}")
-            params.append(valor)
-            params.append(codigo)
-            
-            # Adiciona pesos se for adotante
-            if table_name == 'adotantes':
-                peso = data[f"peso_{feature}"]
-                peso_str = str(peso) * len(codigo) # ex: 8 * '100' -> '888'
-                
-                cols.append(f"peso_{feature}")
-                params.append(peso_str)
-
-        # Constrói a query
-        cols_str = ", ".join(cols)
-        placeholders = ", ".join(["?"] * len(params))
-        query = f"INSERT INTO {table_name} ({cols_str}) VALUES ({placeholders})"
-
-        cursor.execute(query, params)
-        
-        new_id = cursor.lastrowid
-        conn.commit()
+        new_id = records.add_record(table_name, data)
         st.success(f"Registro '{data['nome']}' (ID: {new_id}) adicionado com sucesso à tabela '{table_name}'!")
-    
     # CORREÇÃO 1: Removido o 'except' específico para 'IntegrityError' (nomes duplicados)
     except Exception as e:
         st.error(f"Ocorreu um erro: {e}")
-    finally:
-        conn.close()
 
-def get_all_data(table_name):
-    """Busca todos os registros de uma tabela e retorna como DataFrame."""
-    conn = get_db_connection()
+def get_page_data(table_name, filtros=None, ordem='id', decrescente=False, apos=None, limite=50):
+    """
+    Busca uma página de registros (filtrada e ordenada no SQLite).
+    Retorna (DataFrame, chave para a próxima página ou None, total filtrado).
+    """
     try:
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-        
-        # Garante a ordem correta das colunas
-        if table_name == 'animais':
-            df = df.reindex(columns=COLUNAS_ANIMAIS, fill_value=None)
-        elif table_name == 'adotantes':
-            df = df.reindex(columns=COLUNAS_ADOTANTES, fill_value=None)
-            
-        return df
+        return records.get_page(table_name, filtros, ordem, decrescente, apos, limite)
     except Exception as e:
         st.error(f"Erro ao ler dados: {e}")
-        return pd.DataFrame()
-    finally:
-        conn.close()
+        return pd.DataFrame(), None, 0
 
-def find_data_by_name(table_name, nome):
-    """Encontra um registro específico pelo nome (usado na pág. compatibilidade)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM {table_name} WHERE nome = ?", (nome,))
-    data = cursor.fetchone()
-    conn.close()
-    return data 
+def count_table_rows(table_name):
+    """Quantidade de registros de uma tabela."""
+    return records.count_records(table_name)
 
 def find_data_by_id(table_name, id_):
     """Encontra um registro específico pelo ID (usado na pág. editar)."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT * FROM {table_name} WHERE id = ?", (id_,))
-    data = cursor.fetchone()
-    conn.close()
-    return data
+    return records.find_record(table_name, id_)
+
+def search_data(table_name, texto):
+    """Registros que casam com o texto digitado na busca (nome, contato ou ID)."""
+    try:
+        return search.search_records(table_name, texto)
+    except Exception as e:
+        st.error(f"Erro na busca: {e}")
+        return []
+
+def record_picker(table_name, rotulo, key):
+    """
+    Busca enquanto se digita (por nome, contato ou ID) com a lista dos
+    melhores resultados para escolher. Retorna o ID escolhido (ou None).
+    """
+    texto = st.text_input(
+        rotulo,
+        key=f"{key}_texto",
+        type="search",
+        live=True,
+        placeholder="Nome, contato ou ID..." if table_name == 'adotantes' else "Nome ou ID...",
+    )
+    if not texto or not texto.strip():
+        return None
+
+    resultados = search_data(table_name, texto)
+    if not resultados:
+        st.warning(f"Nenhum registro encontrado para '{texto}'.")
+        return None
+
+    rotulos = {}
+    for r in resultados:
+        rotulo_r = f"{r['nome']} ({r['tipo']}, ID {r['id']})"
+        if r.get('contato'):
+            rotulo_r += f" — {r['contato']}"
+        rotulos[r['id']] = rotulo_r
+    return st.selectbox(
+        f"Resultados ({len(resultados)}):", options=list(rotulos), format_func=rotulos.get, key=f"{key}_escolha",
+    )
 
 def update_data(table_name, id_, data):
     """Atualiza um registro existente no banco de dados."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        set_parts = []
-        params = []
-
-        # Adiciona nome e tipo (ambas as tabelas)
-        set_parts.append('nome = ?')
-        params.append(data['nome'])
-        set_parts.append('tipo = ?')
-        params.append(data['tipo'])
-        
-        # Adiciona contato (só adotantes)
-        if table_name == 'adotantes':
-            set_parts.append('contato = ?')
-            params.append(data['contato'])
-
-        # Processa as 10 características do score
-        for feature in COLUNAS_FEATURES:
-            valor = data[feature]
-            codigo = CARACTERISTICAS[feature]['map'][valor]
-            
-            set_parts.append(f"{feature} = ?")
-            set_parts.append(f"codigo_{feature} = ?")
-            params.append(valor)
-            params.append(codigo)
-            
-            # Adiciona pesos se for adotante
-            if table_name == 'adotantes':
-                peso = data[f"peso_{feature}"]
-                peso_str = str(peso) * len(codigo) # ex: 8 * '100' -> '888'
-                
-                set_parts.append(f"peso_{feature} = ?")
-                params.append(peso_str)
-        
-        # Adiciona o ID no final para o WHERE
-        params.append(id_)
-        
-        # Constrói a query
-        set_str = ", ".join(set_parts)
-        query = f"UPDATE {table_name} SET {set_str} WHERE id = ?"
-        
-        cursor.execute(query, params)
-        conn.commit()
+        records.update_record(table_name, id_, data)
         st.success(f"Registro '{data['nome']}' (ID: {id_}) atualizado com sucesso!")
-        
     # CORREÇÃO 1: Removido o 'except' específico para 'IntegrityError' (nomes duplicados)
     except Exception as e:
         st.error(f"Ocorreu um erro ao atualizar: {e}")
-    finally:
-        conn.close()
+
+def _csv_progress(texto):
+    """Barra de progresso do Streamlit e a função de progresso que a atualiza."""
+    barra = st.progress(0.0, text=f"{texto}...")
+
+    def progresso(fracao, linhas):
+        barra.progress(fracao if fracao is not None else 0.0, text=f"{texto}... {linhas} linhas lidas")
+
+    return barra, progresso
 
 def replace_table_from_csv(table_name, uploaded_file):
     """
-    Apaga todos os dados de uma tabela e os substitui por um CSV.
+    Apaga todos os dados de uma tabela e os substitui por um CSV, lido e
+    validado em blocos (ver adocoes.csv_import) com barra de progresso.
     Retorna (True, 'mensagem de sucesso') ou (False, 'mensagem de erro').
     """
-    
-    if table_name == 'animais':
-        required_cols = CSV_COLS_ANIMAIS
-    elif table_name == 'adotantes':
-        required_cols = CSV_COLS_ADOTANTES
-    else:
-        return (False, f"Tabela '{table_name}' desconhecida.")
-
     try:
-        df = pd.read_csv(uploaded_file, dtype=str) # Lê tudo como string
-        
-        if not all(col in df.columns for col in required_cols):
-            missing_cols = set(required_cols) - set(df.columns)
-            message = f"Erro: O CSV não contém todas as colunas necessárias. Faltando: {missing_cols}"
-            st.info(f"Colunas necessárias: {required_cols}")
-            st.info(f"Colunas encontradas: {list(df.columns)}")
-            return (False, message)
-            
-        df_to_insert = df[required_cols]
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        try:
-            # 1. Apaga os dados antigos
-            cursor.execute(f"DELETE FROM {table_name}")
-            
-            # CORREÇÃO 2: Zera o contador de AUTOINCREMENT
-            cursor.execute(f"DELETE FROM sqlite_sequence WHERE name='{table_name}'")
-            
-            # 2. Insere os novos dados
-            df_to_insert.to_sql(table_name, conn, if_exists='append', index=False)
-            
-            conn.commit()
-            message = f"Tabela '{table_name}' substituída com sucesso! {len(df_to_insert)} registros inseridos (IDs reiniciados)."
-            return (True, message)
-            
-        except Exception as e:
-            conn.rollback() 
-            message = f"Falha na transação com o banco de dados: {e}"
-            return (False, message)
-        finally:
-            conn.close()
+        required_cols = csv_columns(table_name)
+    except ValueError as e:
+        return (False, str(e))
 
+    barra, progresso = _csv_progress("Importando CSV")
+    try:
+        resultado = records.replace_from_csv(table_name, uploaded_file, progresso=progresso)
     except Exception as e:
-        message = f"Erro ao ler o arquivo CSV: {e}"
+        message = f"Erro ao importar o arquivo CSV: {e}"
         return (False, message)
+    finally:
+        barra.empty()
 
+    erro = _csv_error_message(table_name, required_cols, resultado)
+    if erro:
+        return (False, erro)
 
-# --- Funções de Cálculo de Score ---
+    message = f"Tabela '{table_name}' substituída com sucesso! {resultado['inseridos']} registros inseridos (IDs reiniciados)."
+    return (True, message)
 
-def calculate_scores(adotante, animais_filtrados_df):
-    """Calcula a similaridade de cosseno ponderada para cada animal."""
-    
-    scores_list = []
-    
-    try:
-        # 1. Preparar vetores do Adotante (B e P) - SOMENTE 10 FEATURES
-        vetor_b_str = ""
-        vetor_p_str = ""
-        for feature in COLUNAS_FEATURES: # Itera sobre as 10
-            vetor_b_str += adotante[f"codigo_{feature}"]
-            vetor_p_str += adotante[f"peso_{feature}"]
-        
-        B = [int(digit) for digit in vetor_b_str]
-        P = [int(digit) for digit in vetor_p_str]
-        
-        # 2. Calcular o Termo 2 do Denominador (lado do Adotante)
-        sum_Bi_Pi_sq = 0
-        for i in range(len(B)):
-            sum_Bi_Pi_sq += (B[i] * P[i])**2
-        
-        denominador_termo2 = math.sqrt(sum_Bi_Pi_sq)
 
-        # 3. Iterar sobre cada Animal para calcular o score
-        for _, animal in animais_filtrados_df.iterrows():
-            
-            # 3.1 Preparar vetor do Animal (A) - SOMENTE 10 FEATURES
-            vetor_a_str = ""
-            for feature in COLUNAS_FEATURES: # Itera sobre as 10
-                vetor_a_str += animal[f"codigo_{feature}"]
-            A = [int(digit) for digit in vetor_a_str]
-            
-            if len(A) != len(B):
-                st.error(f"Incompatibilidade de vetores (A:{len(A)}, B:{len(B)}) entre adotante {adotante['nome']} e animal {animal['nome']}.")
-                continue
-                
-            numerador = 0
-            sum_Ai_Pi_sq = 0 
-            
-            # 3.2 Calcular Numerador e Termo 1 do Denominador
-            for i in range(len(A)):
-                ai = A[i]
-                bi = B[i]
-                pi = P[i]
-                
-                numerador += (ai * bi * pi)
-                sum_Ai_Pi_sq += (ai * pi)**2
-            
-            denominador_termo1 = math.sqrt(sum_Ai_Pi_sq)
-            
-            # 3.3 Calcular Score Final
-            denominador_completo = denominador_termo1 * denominador_termo2
-            
-            if denominador_completo == 0:
-                score = 0.0
-            else:
-                score = numerador / denominador_completo
-            
-            # Adiciona o ID do animal ao dicionário de resultados
-            scores_list.append({'id': animal['id'], 'nome': animal['nome'], 'score': score})
+def _csv_error_message(table_name, required_cols, resultado):
+    """Mensagem de erro de uma importação de CSV (colunas faltando ou linhas inválidas), ou None."""
+    if resultado['faltando']:
+        message = f"Erro: O CSV não contém todas as colunas necessárias. Faltando: {resultado['faltando']}"
+        st.info(f"Colunas necessárias: {required_cols}")
+        st.info(f"Colunas encontradas: {resultado['colunas_encontradas']}")
+        return message
 
-        # 4. Ordenar a lista final
-        sorted_scores = sorted(scores_list, key=lambda x: x['score'], reverse=True)
-        
-        return sorted_scores
+    if resultado['total_erros']:
+        linhas = "\n".join(f"- linha {linha}: {motivo}" for linha, motivo in resultado['erros'])
+        extra = resultado['total_erros'] - len(resultado['erros'])
+        if extra > 0:
+            linhas += f"\n- ... e mais {extra} linha(s)"
+        message = f"O CSV tem {resultado['total_erros']} linha(s) inválida(s); a tabela '{table_name}' não foi alterada.\n{linhas}"
+        return message
 
-    except Exception as e:
-        st.error(f"Erro ao calcular scores: {e}")
-        st.exception(e)
-        return []
+    return None
 
+def merge_table_from_csv(table_name, uploaded_file, chave=('id',), apagar_ausentes=False):
+    """
+    Mescla um CSV na tabela: atualiza os registros com a mesma chave, insere
+    os novos e, se pedido, apaga os que não estão no CSV.
+    Retorna (True, 'mensagem de sucesso') ou (False, 'mensagem de erro').
+    """
+    try:
+        required_cols = csv_columns(table_name)
+    except ValueError as e:
+        return (False, str(e))
 
-# --- Funções de Conversão (para Download) ---
+    barra, progresso = _csv_progress("Mesclando CSV")
+    try:
+        resultado = records.merge_from_csv(table_name, uploaded_file, chave, apagar_ausentes, progresso=progresso)
+    except Exception as e:
+        message = f"Erro ao mesclar o arquivo CSV: {e}"
+        return (False, message)
+    finally:
+        barra.empty()
 
-@st.cache_data
-def convert_df_to_csv(df):
-    """Converte um DataFrame para CSV em memória, pronto para download."""
-    if 'contato' in df.columns:
-         df = df.reindex(columns=CSV_COLS_ADOTANTES, fill_value=None)
-    else:
-         df = df.reindex(columns=CSV_COLS_ANIMAIS, fill_value=None)
-         
-    return df.to_csv(index=False).encode('utf-8')
+    erro = _csv_error_message(table_name, required_cols, resultado)
+    if erro:
+        return (False, erro)
+
+    message = (
+        f"Tabela '{table_name}' mesclada em {resultado['segundos']:.2f}s: "
+        f"{resultado['inseridos']} inseridos, {resultado['atualizados']} atualizados, {resultado['apagados']} apagados."
+    )
+    return (True, message)
 
 
 # --- Definições das Páginas ---
 
 def page_ver_tabela(table_name, title):
-    """Página para visualizar o conteúdo de uma tabela."""
+    """Página para visualizar o conteúdo de uma tabela, uma página por vez."""
     st.title(title)
-    df = get_all_data(table_name)
+
+    colunas = COLUNAS_ANIMAIS if table_name == 'animais' else COLUNAS_ADOTANTES
+    colunas_ordem = [col for col in colunas if not col.startswith(('codigo_', 'peso_'))]
+
+    # Filtros e ordenação (aplicados no SQLite)
+    filtros = {}
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        tipo = st.selectbox("Tipo:", options=["(todos)"] + TIPO_OPTIONS, key=f"filtro_tipo_{table_name}")
+        if tipo != "(todos)":
+            filtros['tipo'] = tipo
+    with col2:
+        ordem = st.selectbox("Ordenar por:", options=colunas_ordem, key=f"ordem_{table_name}")
+    with col3:
+        decrescente = st.radio("Direção:", ["Crescente", "Decrescente"], horizontal=True, key=f"direcao_{table_name}") == "Decrescente"
+    with col4:
+        limite = st.selectbox("Linhas por página:", options=[25, 50, 100, 200], index=1, key=f"limite_{table_name}")
+
+    with st.expander("Filtrar por característica"):
+        cols = st.columns(3)
+        for i, (feature, props) in enumerate(CARACTERISTICAS.items()):
+            with cols[i % 3]:
+                valor = st.selectbox(feature.capitalize(), options=["(todos)"] + props['options'], key=f"filtro_{feature}_{table_name}")
+                if valor != "(todos)":
+                    filtros[feature] = valor
+
+    # Pilha com a chave de início de cada página já visitada; volta para a
+    # primeira página sempre que filtros ou ordenação mudam
+    pilha_key = f"paginas_{table_name}"
+    params_key = f"paginas_params_{table_name}"
+    params = (tuple(sorted(filtros.items())), ordem, decrescente, limite)
+    if st.session_state.get(params_key) != params:
+        st.session_state[params_key] = params
+        st.session_state[pilha_key] = [None]
+    pilha = st.session_state[pilha_key]
+
+    df, proxima, total = get_page_data(table_name, filtros, ordem, decrescente, pilha[-1], limite)
     if df.empty:
-        st.info("A tabela está vazia.")
-    else:
-        # CORREÇÃO 3: Adicionado hide_index=True
-        st.dataframe(df, width='stretch', hide_index=True)
+        st.info("A tabela está vazia." if not filtros else "Nenhum registro encontrado com esses filtros.")
+        return
+
+    # CORREÇÃO 3: Adicionado hide_index=True
+    st.dataframe(df, width='stretch', hide_index=True)
+
+    pagina = len(pilha)
+    paginas = max(1, -(-total // limite))
+    st.caption(f"Página {pagina} de {paginas} ({total} registros)")
+
+    col_ant, col_prox = st.columns(2)
+    with col_ant:
+        if st.button("Anterior", disabled=pagina == 1, key=f"anterior_{table_name}"):
+            pilha.pop()
+            st.rerun()
+    with col_prox:
+        if st.button("Próxima", disabled=proxima is None, key=f"proxima_{table_name}"):
+            pilha.append(proxima)
+            st.rerun()
 
 def page_formulario(table_name, title):
     """Página de formulário para adicionar novos registros."""
@@ -519,20 +286,10 @@ def page_editar_dados(table_name, title):
     """Página para editar registros existentes."""
     st.title(title)
     
-    search_id = st.number_input(
-        f"Digite o ID ({table_name}) para buscar e editar:",
-        step=1,
-        value=None, 
-        placeholder="Digite o ID para buscar...",
-        key=f"search_{table_name}"
-    )
-    
-    if not search_id:
-        st.info("Digite um ID para iniciar a busca.")
-        return
+    search_id = record_picker(table_name, f"Buscar ({table_name}) para editar:", key=f"busca_{table_name}")
 
-    if search_id < 1:
-        st.warning("O ID deve ser um número positivo (maior que 0).")
+    if not search_id:
+        st.info("Digite parte do nome (ou o ID) para iniciar a busca.")
         return
 
     db_data = find_data_by_id(table_name, search_id)
@@ -553,8 +310,8 @@ def page_editar_dados(table_name, title):
             for feature in COLUNAS_FEATURES:
                 st.session_state[f"edit_{feature}_{table_name}"] = db_data[feature]
                 if table_name == 'adotantes':
-                    peso_str = db_data[f"peso_{feature}"]
-                    st.session_state[f"edit_peso_{feature}_{table_name}"] = int(peso_str[0]) if peso_str else 5
+                    peso = db_data[f"peso_num_{feature}"]
+                    st.session_state[f"edit_peso_{feature}_{table_name}"] = peso if peso is not None else 5
 
             st.rerun() 
 
@@ -686,7 +443,7 @@ def page_editar_dados(table_name, title):
 # --- PÁGINA DE UPLOAD CSV ---
 
 def page_upload_csv():
-    """Página para substituir dados da tabela por um arquivo CSV."""
+    """Página para substituir (ou mesclar) dados da tabela a partir de um arquivo CSV."""
     st.title("Acrescentar arquivos CSV")
 
     if "csv_message" in st.session_state:
@@ -697,17 +454,34 @@ def page_upload_csv():
             st.error(message_text)
         del st.session_state["csv_message"]
 
-    st.warning("ATENÇÃO: Fazer o upload de um arquivo aqui apagará TODOS os dados atuais da tabela correspondente e os substituirá pelo conteúdo do CSV.")
+    modo = st.radio(
+        "Modo de importação:",
+        ["Substituir a tabela", "Mesclar com a tabela"],
+        horizontal=True,
+        key="csv_modo",
+    )
+    mesclar = modo == "Mesclar com a tabela"
+
+    if mesclar:
+        st.info("Mesclar: registros com a mesma chave são atualizados e os novos são inseridos. Com a chave 'id', linhas com id vazio entram como registros novos.")
+        apagar_ausentes = st.checkbox("Apagar os registros que não estão no CSV", key="csv_apagar_ausentes")
+    else:
+        st.warning("ATENÇÃO: Fazer o upload de um arquivo aqui apagará TODOS os dados atuais da tabela correspondente e os substituirá pelo conteúdo do CSV.")
 
     st.markdown("---")
     
-    st.subheader("Substituir Tabela de Animais")
-    st.info(f"O CSV deve conter as colunas: {', '.join(CSV_COLS_ANIMAIS)}")
+    st.subheader("Tabela de Animais")
+    st.info(f"O CSV deve conter as colunas: {', '.join(CSV_COLS_ANIMAIS)}" + (" (e 'id', para mesclar por id)" if mesclar else ""))
     uploader_animais = st.file_uploader("Selecione um CSV para a tabela 'animais'", type="csv", key="uploader_animais")
+    if mesclar:
+        chave_animais = st.selectbox("Chave da mescla (animais):", options=[('id',), CSV_CHAVES_NATURAIS['animais']], format_func=" + ".join, key="csv_chave_animais")
     
     if uploader_animais:
-        if st.button("Confirmar Substituição - ANIMAIS"):
-            success, message = replace_table_from_csv("animais", uploader_animais)
+        if st.button("Confirmar Mescla - ANIMAIS" if mesclar else "Confirmar Substituição - ANIMAIS"):
+            if mesclar:
+                success, message = merge_table_from_csv("animais", uploader_animais, chave_animais, apagar_ausentes)
+            else:
+                success, message = replace_table_from_csv("animais", uploader_animais)
             if success:
                 st.session_state["csv_message"] = ("success", message)
             else:
@@ -716,13 +490,18 @@ def page_upload_csv():
 
     st.markdown("---")
 
-    st.subheader("Substituir Tabela de Adotantes")
-    st.info(f"O CSV deve conter as colunas: {', '.join(CSV_COLS_ADOTANTES)}")
+    st.subheader("Tabela de Adotantes")
+    st.info(f"O CSV deve conter as colunas: {', '.join(CSV_COLS_ADOTANTES)}" + (" (e 'id', para mesclar por id)" if mesclar else ""))
     uploader_adotantes = st.file_uploader("Selecione um CSV para a tabela 'adotantes'", type="csv", key="uploader_adotantes")
+    if mesclar:
+        chave_adotantes = st.selectbox("Chave da mescla (adotantes):", options=[('id',), CSV_CHAVES_NATURAIS['adotantes']], format_func=" + ".join, key="csv_chave_adotantes")
     
     if uploader_adotantes:
-         if st.button("Confirmar Substituição - ADOTANTES"):
-            success, message = replace_table_from_csv("adotantes", uploader_adotantes)
+         if st.button("Confirmar Mescla - ADOTANTES" if mesclar else "Confirmar Substituição - ADOTANTES"):
+            if mesclar:
+                success, message = merge_table_from_csv("adotantes", uploader_adotantes, chave_adotantes, apagar_ausentes)
+            else:
+                success, message = replace_table_from_csv("adotantes", uploader_adotantes)
             if success:
                 st.session_state["csv_message"] = ("success", message)
             else:
@@ -733,35 +512,35 @@ def page_upload_csv():
 # --- PÁGINA DE DOWNLOAD CSV ---
 
 def page_baixar_csv():
-    """Página para baixar as tabelas 'animais' e 'adotantes' como CSV."""
+    """Página para baixar as tabelas 'animais' e 'adotantes' (CSV ou Parquet)."""
     st.title("Baixar arquivos CSV")
 
-    st.markdown("---")
-    st.subheader("Baixar Tabela de Animais")
-    df_animais = get_all_data("animais")
-    if df_animais.empty:
-        st.info("Tabela 'animais' está vazia. Nada para baixar.")
-    else:
-        csv_animais = convert_df_to_csv(df_animais)
-        st.download_button(
-            label="Baixar 'animais.csv'",
-            data=csv_animais,
-            file_name='animais.csv',
-            mime='text/csv',
-        )
+    formatos = available_formats()
+    formato = st.radio(
+        "Formato:",
+        formatos,
+        format_func=lambda f: {'csv': 'CSV', 'parquet': 'Parquet (colunar, para análises)'}[f],
+        horizontal=True,
+        key="export_formato",
+    )
+    if 'parquet' not in formatos:
+        st.caption("Instale o pacote 'pyarrow' para exportar em Parquet.")
 
-    st.markdown("---")
-    st.subheader("Baixar Tabela de Adotantes")
-    df_adotantes = get_all_data("adotantes")
-    if df_adotantes.empty:
-        st.info("Tabela 'adotantes' está vazia. Nada para baixar.")
-    else:
-        csv_adotantes = convert_df_to_csv(df_adotantes)
+    # O arquivo só é gerado no clique (em disco, lendo o banco em lotes); o
+    # Streamlit guarda os bytes em memória até o download
+    for table_name, titulo in (("animais", "Animais"), ("adotantes", "Adotantes")):
+        st.markdown("---")
+        st.subheader(f"Baixar Tabela de {titulo}")
+        total = count_table_rows(table_name)
+        if total == 0:
+            st.info(f"Tabela '{table_name}' está vazia. Nada para baixar.")
+            continue
         st.download_button(
-            label="Baixar 'adotantes.csv'",
-            data=csv_adotantes,
-            file_name='adotantes.csv',
-            mime='text/csv',
+            label=f"Baixar '{table_name}.{formato}' ({total} registros)",
+            data=lambda table_name=table_name: export_bytes(table_name, formato),
+            file_name=f'{table_name}.{formato}',
+            mime=MIME_TYPES[formato],
+            key=f"baixar_{table_name}",
         )
 
 
@@ -771,22 +550,13 @@ def page_compatibilidade():
     """Página para calcular e exibir animais compatíveis com um adotante."""
     st.title("Animais Compatíveis")
     
-    search_id = st.number_input(
-        "Digite o ID do Adotante para buscar compatibilidade:",
-        step=1,
-        value=None,
-        placeholder="Digite o ID do adotante..."
-    )
-    
-    if not search_id:
-        st.info("Digite o ID de um adotante cadastrado para ver os animais compatíveis.")
-        return
+    search_id = record_picker("adotantes", "Buscar o adotante:", key="busca_compat_adotante")
 
-    if search_id < 1:
-        st.warning("O ID deve ser um número positivo (maior que 0).")
+    if not search_id:
+        st.info("Busque um adotante cadastrado (nome, contato ou ID) para ver os animais compatíveis.")
         return
 
-    # 1. Buscar o adotante por ID
+    # 1. Buscar o adotante escolhido
     adotante = find_data_by_id("adotantes", search_id)
     
     if not adotante:
@@ -810,38 +580,30 @@ def page_compatibilidade():
         for feature in COLUNAS_FEATURES: # Itera sobre as 10
             with cols[i % 3]:
                 st.write(f"**{feature.capitalize()}**: {adotante[feature]}")
-                st.caption(f"Peso: {adotante[f'peso_{feature}'][0]}")
+                st.caption(f"Peso: {adotante[f'peso_num_{feature}']}")
             i += 1
             
-    # 2. Buscar TODOS os animais e FILTRAR
-    all_animais_df = get_all_data("animais")
-    if all_animais_df.empty:
-        st.warning("Nenhum animal cadastrado no banco de dados.")
+    # 2. Lista já materializada (top-k + empates); se o adotante ainda não
+    #    foi calculado, calcula a partir do cache de animais e grava
+    try:
+        compatibilidade = matching.compatible_animals(adotante, TOP_K)
+    except Exception as e:
+        st.error(f"Erro ao calcular scores: {e}")
+        st.exception(e)
         return
-        
-    # FILTRA o DataFrame
-    animais_filtrados_df = all_animais_df[all_animais_df['tipo'] == tipo_preferido].copy()
-    
-    if animais_filtrados_df.empty:
+
+    if compatibilidade is None:
         st.warning(f"Nenhum animal do tipo '{tipo_preferido}' encontrado no banco de dados.")
         return
-        
-    # 3. Calcular os scores APENAS para os animais filtrados
-    sorted_scores = calculate_scores(adotante, animais_filtrados_df)
-    
-    if not sorted_scores:
+
+    resultado_final, invalidos = compatibilidade
+    for nome in invalidos:
+        st.error(f"Incompatibilidade de vetores entre adotante {adotante['nome']} e animal {nome}.")
+
+    if not resultado_final:
         st.info("Cálculo concluído, mas nenhum score foi gerado.")
         return
 
-    # 4. Aplicar a lógica de exibição (Top 10 + empates)
-    resultado_final = []
-    
-    if len(sorted_scores) <= 10:
-        resultado_final = sorted_scores
-    else:
-        score_do_decimo = sorted_scores[9]['score']
-        resultado_final = [s for s in sorted_scores if s['score'] >= score_do_decimo]
-
     # 5. Exibir os resultados
     st.subheader(f"Lista de {len(resultado_final)} Animais Mais Compatíveis (Tipo: {tipo_preferido}):")
     
@@ -858,10 +620,138 @@ def page_compatibilidade():
     )
 
 
+# --- PÁGINA DE COMPATIBILIDADE REVERSA ---
+
+def page_compatibilidade_reversa():
+    """Página para calcular e exibir adotantes compatíveis com um animal."""
+    st.title("Adotantes Compatíveis")
+    
+    search_id = record_picker("animais", "Buscar o animal:", key="busca_compat_animal")
+
+    if not search_id:
+        st.info("Busque um animal cadastrado (nome ou ID) para ver os adotantes compatíveis.")
+        return
+
+    # 1. Buscar o animal escolhido
+    animal = find_data_by_id("animais", search_id)
+    
+    if not animal:
+        st.error(f"Animal com ID '{search_id}' não encontrado.")
+        return
+
+    tipo = animal['tipo']
+    st.success(f"Calculando compatibilidade para: **{animal['nome']}** (ID: {animal['id']})")
+    st.info(f"Tipo do animal: **{tipo.upper()}**. Mostrando apenas adotantes que preferem esse tipo.")
+
+    with st.expander("Ver características do Animal"):
+        cols = st.columns(3)
+        for i, feature in enumerate(COLUNAS_FEATURES):
+            with cols[i % 3]:
+                st.write(f"**{feature.capitalize()}**: {animal[feature]}")
+
+    # 2. Scores dos adotantes que preferem o tipo, com os pesos de cada
+    #    um (Top 10 + empates)
+    try:
+        compatibilidade = matching.compatible_adopters(animal, TOP_K, TOP_K_METODO)
+    except Exception as e:
+        st.error(f"Erro ao calcular scores: {e}")
+        st.exception(e)
+        return
+
+    if compatibilidade is None:
+        st.warning(f"Nenhum adotante interessado em '{tipo}' encontrado no banco de dados.")
+        return
+
+    resultado_final, invalidos = compatibilidade
+    for nome in invalidos:
+        st.error(f"Incompatibilidade de vetores entre animal {animal['nome']} e adotante {nome}.")
+
+    if not resultado_final:
+        st.info("Cálculo concluído, mas nenhum score foi gerado.")
+        return
+
+    # 4. Exibir os resultados
+    st.subheader(f"Lista de {len(resultado_final)} Adotantes Mais Compatíveis (Tipo: {tipo}):")
+    
+    df_resultado = pd.DataFrame(resultado_final)
+    df_resultado = df_resultado[['id', 'nome', 'contato', 'score']]
+    
+    # Define o índice como o Rank (começando em 1)
+    df_resultado.index = df_resultado.index + 1 
+    
+    st.dataframe(
+        df_resultado.style.format({'score': '{:.4f}'}),
+        width='stretch'
+    )
+
+
+# --- PÁGINA DE DIAGNÓSTICO DE DESEMPENHO ---
+
+def page_diagnostico():
+    """Página de administração: tempos por operação (p50/p95/p99) e cProfile de um rerun."""
+    st.title("Diagnóstico de Desempenho")
+    st.caption("Medidas deste processo (todas as sessões), desde o início ou desde a última vez que foram zeradas.")
+
+    resumo = metrics.summary()
+    if not resumo:
+        st.info("Nenhuma operação medida ainda. Use as outras páginas e volte aqui.")
+    else:
+        df_resumo = pd.DataFrame(resumo)
+        st.dataframe(
+            df_resumo.style.format({
+                'total_s': '{:.3f}', 'p50_ms': '{:.2f}', 'p95_ms': '{:.2f}', 'p99_ms': '{:.2f}', 'max_ms': '{:.2f}',
+                'bytes': '{:,}', 'linhas': '{:,}',
+            }),
+            width='stretch',
+            hide_index=True,
+        )
+
+        operacao = st.selectbox("Histograma da operação:", options=df_resumo['operacao'].tolist(), key="diag_operacao")
+        rotulos, contagens = metrics.histogram(operacao)
+        st.bar_chart(pd.DataFrame({'chamadas': contagens}, index=rotulos), sort=False)
+
+    if st.button("Zerar medidas", key="diag_zerar"):
+        metrics.reset()
+        st.rerun()
+
+    st.markdown("---")
+    st.subheader("Cache de compatibilidade por perfil")
+    cache = result_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Listas guardadas", f"{cache['listas']:,}", help=f"{cache['bytes'] / 1024:,.0f} KB (estimativa)")
+    col2.metric("Taxa de acerto", f"{cache['taxa_acerto']:.0%}", help=f"{cache['acertos']:,} acertos, {cache['faltas']:,} faltas")
+    col3.metric("Descartes (LRU)", f"{cache['descartes']:,}")
+    col4.metric("Invalidações", f"{cache['invalidacoes']:,}", help="Vezes em que o cache foi esvaziado porque os animais mudaram.")
+    if st.button("Esvaziar o cache", key="diag_esvaziar_cache"):
+        result_cache.clear()
+        st.rerun()
+
+    st.markdown("---")
+    st.subheader("Perfil (cProfile) de uma execução")
+    if st.button("Perfilar a próxima execução", key="diag_perfilar"):
+        st.session_state["perfilar_proxima"] = True
+    if st.session_state.get("perfilar_proxima"):
+        st.info("A próxima execução (por exemplo, abrir outra página) será perfilada. Depois, volte aqui.")
+
+    perfil = st.session_state.get("perfil")
+    if perfil:
+        st.write(f"Última execução perfilada: **{perfil['pagina']}**")
+        st.code(perfil['texto'], language=None)
+        st.download_button(
+            "Baixar perfil (.prof)",
+            data=perfil['prof'],
+            file_name="perfil.prof",
+            mime="application/octet-stream",
+            key="diag_baixar_perfil",
+        )
+
+
 # --- Execução Principal da Aplicação ---
 
 try:
     init_db()
+    # Snapshot em memória e backups periódicos, se ligados em config (só na primeira vez)
+    snapshot.configure()
 except Exception as e:
     st.error(f"Falha ao inicializar o banco de dados: {e}")
     st.stop()
@@ -879,34 +769,61 @@ paginas = {
     "Acrescentar um animal": "page_form_animal",
     "Editar dados do adotante": "page_edit_adotante",
     "Editar dados do animal": "page_edit_animal",
-    "Animais compatíveis": "page_compatibilidade"
+    "Animais compatíveis": "page_compatibilidade",
+    "Adotantes compatíveis": "page_compatibilidade_reversa",
+    "Diagnóstico de desempenho": "page_diagnostico",
 }
 
 escolha = st.sidebar.radio("Escolha uma página:", list(paginas.keys()))
 
-if escolha == "Ver tabela de adotantes":
-    page_ver_tabela("adotantes", "Ver Tabela de Adotantes")
 
-elif escolha == "Ver tabela de animais":
-    page_ver_tabela("animais", "Ver Tabela de Animais")
+def render_page(escolha):
+    """Desenha a página escolhida (medida como 'pagina.<nome>')."""
+    with metrics.span(f"pagina.{paginas[escolha]}"):
+        _render_page(escolha)
+
+def _render_page(escolha):
+    if escolha == "Ver tabela de adotantes":
+        page_ver_tabela("adotantes", "Ver Tabela de Adotantes")
+
+    elif escolha == "Ver tabela de animais":
+        page_ver_tabela("animais", "Ver Tabela de Animais")
 
-elif escolha == "Acrescentar arquivos CSV":
-    page_upload_csv()
+    elif escolha == "Acrescentar arquivos CSV":
+        page_upload_csv()
 
-elif escolha == "Baixar arquivos CSV":
-    page_baixar_csv()
+    elif escolha == "Baixar arquivos CSV":
+        page_baixar_csv()
 
-elif escolha == "Acrescentar um adotante":
-    page_formulario("adotantes", "Acrescentar um Adotante")
+    elif escolha == "Acrescentar um adotante":
+        page_formulario("adotantes", "Acrescentar um Adotante")
 
-elif escolha == "Acrescentar um animal":
-    page_formulario("animais", "Acrescentar um Animal")
+    elif escolha == "Acrescentar um animal":
+        page_formulario("animais", "Acrescentar um Animal")
 
-elif escolha == "Editar dados do adotante":
-    page_editar_dados("adotantes", "Editar Dados do Adotante")
+    elif escolha == "Editar dados do adotante":
+        page_editar_dados("adotantes", "Editar Dados do Adotante")
 
-elif escolha == "Editar dados do animal":
-    page_editar_dados("animais", "Editar Dados do Animal")
+    elif escolha == "Editar dados do animal":
+        page_editar_dados("animais", "Editar Dados do Animal")
 
-elif escolha == "Animais compatíveis":
-    page_compatibilidade()
\ No newline at end of file
+    elif escolha == "Animais compatíveis":
+        page_compatibilidade()
+
+    elif escolha == "Adotantes compatíveis":
+        page_compatibilidade_reversa()
+
+    elif escolha == "Diagnóstico de desempenho":
+        page_diagnostico()
+
+
+# Um rerun perfilado a pedido da página de diagnóstico
+if st.session_state.pop("perfilar_proxima", False):
+    perfil = {}
+    try:
+        with metrics.profiled() as perfil:
+            render_page(escolha)
+    finally:
+        st.session_state["perfil"] = dict(perfil, pagina=escolha)
+else:
+    render_page(escolha)
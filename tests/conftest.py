@@ -0,0 +1,25 @@
+import pytest
+
+from adocoes import cache as animal_cache
+from adocoes import db, records, result_cache, snapshot
+from adocoes.synthetic import write_dataset
+
+
+@pytest.fixture
+def banco_vazio(tmp_path):
+    """Banco novo (só o esquema) num diretório temporário; caches e pools são limpos no fim."""
+    db_name = str(tmp_path / 'adocoes.db')
+    db.init_db(db_name)
+    yield db_name
+    snapshot.disable(db_name)
+    animal_cache.invalidate(db_name)
+    result_cache.clear(db_name)
+    db.close_connections(db_name)
+
+@pytest.fixture
+def banco(banco_vazio, tmp_path):
+    """Banco com 300 animais e 20 adotantes sintéticos (mesma semente sempre)."""
+    caminhos = write_dataset(str(tmp_path), 300, 20, seed=7)
+    for tabela, caminho in caminhos.items():
+        assert records.replace_from_csv(tabela, caminho, db_name=banco_vazio)['inseridos'] > 0
+    return banco_vazio
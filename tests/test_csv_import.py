@@ -0,0 +1,149 @@
+import io
+
+import pandas as pd
+import pytest
+
+from adocoes import records
+from adocoes.config import CSV_MAX_ERROS, TIPO_OPTIONS
+from adocoes.csv_import import import_csv
+from adocoes.db import get_db_connection, table_version
+from adocoes.export import export_table
+from adocoes.synthetic import write_csv
+
+# Blocos pequenos: os 300 animais do banco passam por dezenas de fronteiras
+BLOCO = 7
+
+
+def _csv(tmp_path, n, estragar=None, nome='animais.csv'):
+    """
+    CSV sintético de n animais; 'estragar' é {linha do arquivo: {coluna: valor}}
+    (a linha 1 é o cabeçalho, então o animal i está na linha i + 1).
+    """
+    caminho = str(tmp_path / nome)
+    write_csv(caminho, 'animais', n, seed=3)
+    df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    for linha, mudancas in (estragar or {}).items():
+        for coluna, valor in mudancas.items():
+            df.at[linha - 2, coluna] = valor
+    df.to_csv(caminho, index=False)
+    return caminho
+
+def _state(db_name):
+    """Linhas, índices, gatilhos e versão de 'animais', para comparar antes e depois."""
+    conn = get_db_connection(db_name, disco=True)
+    try:
+        return {
+            'linhas': [tuple(r) for r in conn.execute("SELECT * FROM animais ORDER BY id")],
+            'objetos': sorted(tuple(r) for r in conn.execute(
+                "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'animais' AND type IN ('index', 'trigger')"
+            )),
+            'versao': table_version(conn, 'animais'),
+        }
+    finally:
+        conn.close()
+
+def _import(db_name, arquivo, linhas_por_bloco=BLOCO):
+    conn = get_db_connection(db_name)
+    try:
+        return import_csv(conn, 'animais', arquivo, linhas_por_bloco=linhas_por_bloco)
+    finally:
+        conn.close()
+
+def test_chunked_import_matches_single_chunk(banco, tmp_path):
+    caminho = _csv(tmp_path, 100)
+    assert _import(banco, caminho)['inseridos'] == 100
+    em_blocos = _state(banco)['linhas']
+    assert _import(banco, caminho, linhas_por_bloco=1000)['inseridos'] == 100
+    assert _state(banco)['linhas'] == em_blocos
+
+def test_errors_report_file_lines_across_chunks(banco, tmp_path):
+    estragos = {
+        2: {'nome': ''},                        # primeira linha do primeiro bloco
+        8: {'tipo': 'peixe'},                   # última linha do primeiro bloco
+        9: {'tamanho': 'enorme'},               # primeira linha do segundo bloco
+        23: {'codigo_tamanho': '9'},            # meio do quarto bloco
+        51: {'nome': ' ', 'tipo': 'peixe'},     # duas falhas na mesma linha (última do arquivo)
+    }
+    resultado = _import(banco, _csv(tmp_path, 50, estragos))
+
+    assert resultado['inseridos'] == 0
+    assert resultado['total_erros'] == 5
+    assert [linha for linha, _ in resultado['erros']] == [2, 8, 9, 23, 51]
+    motivos = dict(resultado['erros'])
+    assert motivos[2] == "nome vazio"
+    assert motivos[8] == f"tipo fora de {TIPO_OPTIONS}"
+    assert motivos[9].startswith("tamanho fora de")
+    assert motivos[23] == "codigo_tamanho não corresponde a tamanho"
+    assert motivos[51] == f"nome vazio; tipo fora de {TIPO_OPTIONS}"
+
+def test_error_list_is_capped(banco, tmp_path):
+    # Uma linha ruim a cada três: bem mais que o limite, em todos os blocos
+    estragos = {linha: {'tipo': 'peixe'} for linha in range(2, 202, 3)}
+    resultado = _import(banco, _csv(tmp_path, 200, estragos))
+
+    assert resultado['total_erros'] == len(estragos) > CSV_MAX_ERROS
+    assert len(resultado['erros']) == CSV_MAX_ERROS
+    assert [linha for linha, _ in resultado['erros']] == sorted(estragos)[:CSV_MAX_ERROS]
+
+@pytest.mark.parametrize('linha_ruim', [2, 150], ids=['primeiro_bloco', 'bloco_do_meio'])
+def test_rejected_import_leaves_table_intact(banco, tmp_path, linha_ruim):
+    antes = _state(banco)
+    # Com o erro no meio, os blocos anteriores já foram gravados (e índices e
+    # gatilhos apagados) quando o erro aparece: tudo volta no rollback
+    resultado = _import(banco, _csv(tmp_path, 200, {linha_ruim: {'nome': ''}}))
+
+    assert resultado['inseridos'] == 0 and resultado['total_erros'] == 1
+    assert _state(banco) == antes
+
+def test_failed_read_leaves_table_intact(banco, tmp_path):
+    antes = _state(banco)
+    caminho = _csv(tmp_path, 60)
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write("a,b,c,d,e,f,g,h,i,j,k,l,m,n,o,p,q,r,s,t,u,v,w,x,y,z\n")
+
+    # O pandas só encontra a linha quebrada no último bloco
+    with pytest.raises(pd.errors.ParserError):
+        _import(banco, caminho)
+    assert _state(banco) == antes
+
+def test_missing_columns_leave_table_intact(banco, tmp_path):
+    antes = _state(banco)
+    caminho = _csv(tmp_path, 20)
+    pd.read_csv(caminho, dtype=str).drop(columns=['codigo_tamanho']).to_csv(caminho, index=False)
+
+    resultado = _import(banco, caminho)
+    assert resultado['faltando'] == {'codigo_tamanho'}
+    assert resultado['inseridos'] == 0
+    assert _state(banco) == antes
+
+def test_successful_import_rebuilds_objects_and_bumps_version(banco, tmp_path):
+    antes = _state(banco)
+    assert _import(banco, _csv(tmp_path, 40))['inseridos'] == 40
+
+    depois = _state(banco)
+    assert len(depois['linhas']) == 40
+    assert [linha[0] for linha in depois['linhas']] == list(range(1, 41))
+    assert depois['objetos'] == antes['objetos']
+    assert depois['versao'] == antes['versao'] + 1
+
+def test_export_round_trip(banco, tmp_path):
+    def exportado():
+        destino = io.BytesIO()
+        conn = get_db_connection(banco)
+        try:
+            export_table(conn, 'animais', 'csv', destino)
+        finally:
+            conn.close()
+        return destino.getvalue()
+
+    antes = _state(banco)
+    csv_exportado = exportado()
+    # A coluna id do export é ignorada; os ids voltam a ser 1..n na ordem do arquivo
+    assert _import(banco, io.BytesIO(csv_exportado))['inseridos'] == len(antes['linhas'])
+    assert exportado() == csv_exportado
+    assert _state(banco)['linhas'] == antes['linhas']
+
+    # O mesmo arquivo também entra pela mescla por id sem mudar nada
+    resultado = records.merge_from_csv('animais', io.BytesIO(csv_exportado), db_name=banco)
+    assert (resultado['inseridos'], resultado['atualizados'], resultado['total_erros']) == (0, 0, 0)
+    assert exportado() == csv_exportado
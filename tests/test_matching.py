@@ -0,0 +1,57 @@
+import sqlite3
+
+from adocoes import materialized, matching, records
+from adocoes.config import COLUNAS_FEATURES, TOP_K
+from adocoes.db import get_db_connection
+
+COLUNAS_ANIMAL = ['tipo'] + [f"{prefixo}{f}" for f in COLUNAS_FEATURES for prefixo in ('', 'codigo_', 'indice_')]
+
+
+def _external_copy(db_name, animal_id, nome):
+    """
+    O que outro processo faz em records.add_record: insere (uma cópia do
+    animal, com outro nome) e atualiza a tabela 'compatibilidade', por uma
+    conexão fora do pool e sem passar pelos caches deste processo.
+    """
+    externa = sqlite3.connect(db_name)
+    try:
+        cursor = externa.execute(
+            f"INSERT INTO animais (nome, {', '.join(COLUNAS_ANIMAL)}) "
+            f"SELECT ?, {', '.join(COLUNAS_ANIMAL)} FROM animais WHERE id = ?",
+            (nome, animal_id),
+        )
+        materialized.upsert_animal(externa, cursor.lastrowid, TOP_K)
+        externa.commit()
+        return cursor.lastrowid
+    finally:
+        externa.close()
+
+def _stored(db_name, adotante_id):
+    conn = get_db_connection(db_name, disco=True)
+    try:
+        return materialized.read_adopter(conn, adotante_id, TOP_K)
+    finally:
+        conn.close()
+
+def test_app_path_sees_animals_written_by_another_process(banco):
+    adotante = records.find_record('adotantes', 1, banco)
+    antes, _ = matching.compatible_animals(adotante, TOP_K, banco)
+    # Segunda consulta: vem do cache por perfil
+    assert matching.compatible_animals(adotante, TOP_K, banco)[0] == antes
+
+    novo_id = _external_copy(banco, antes[0]['id'], 'Externo')
+    esperado = {'id': novo_id, 'nome': 'Externo', 'score': antes[0]['score']}
+    assert esperado in _stored(banco, adotante['id'])
+
+    depois, _ = matching.compatible_animals(adotante, TOP_K, banco)
+    assert esperado in depois
+
+    # Um adotante novo com o mesmo perfil: a lista dele é calculada neste
+    # processo e gravada para todos; não pode sair do cache velho
+    dados = {col: adotante[col] for col in ['nome', 'tipo', 'contato'] + COLUNAS_FEATURES}
+    dados.update({f"peso_{f}": adotante[f"peso_num_{f}"] for f in COLUNAS_FEATURES})
+    outro_id = _external_copy(banco, antes[0]['id'], 'Externo 2')
+    novo_adotante = records.add_record('adotantes', dict(dados, nome='Adotante novo'), banco)
+    gravada = _stored(banco, novo_adotante)
+    assert {'id': outro_id, 'nome': 'Externo 2', 'score': antes[0]['score']} in gravada
+    assert gravada == matching.compatible_animals(records.find_record('adotantes', novo_adotante, banco), TOP_K, banco)[0]
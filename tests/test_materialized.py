@@ -0,0 +1,165 @@
+import pytest
+
+from adocoes import materialized, matching, records
+from adocoes.config import CARACTERISTICAS, COLUNAS_FEATURES, TIPO_OPTIONS, TOP_K
+from adocoes.db import get_db_connection, load_tipo
+from adocoes.synthetic import write_dataset
+
+
+def _form(registro, **mudancas):
+    """Dados de formulário (records.add_record/update_record) a partir de um registro."""
+    dados = {col: registro[col] for col in ['nome', 'tipo'] + COLUNAS_FEATURES}
+    return dict(dados, **mudancas)
+
+def _from_scratch(conn, adotante, k):
+    return matching.rank_animals(adotante, load_tipo(conn, 'animais', adotante['tipo']), k)[0]
+
+def _stored_lists(db_name, k=TOP_K):
+    """{adotante_id: lista gravada} dos adotantes que têm lista com esse k."""
+    conn = get_db_connection(db_name)
+    try:
+        ids = [linha[0] for linha in conn.execute("SELECT adotante_id FROM compatibilidade_limites")]
+        return {adotante_id: materialized.read_adopter(conn, adotante_id, k) for adotante_id in ids}
+    finally:
+        conn.close()
+
+def _check_invariant(db_name, k=TOP_K):
+    """Toda lista gravada é exatamente a que o cálculo do zero daria."""
+    conn = get_db_connection(db_name)
+    try:
+        for adotante in conn.execute("SELECT * FROM adotantes").fetchall():
+            lista = materialized.read_adopter(conn, adotante['id'], k)
+            if lista is not None:
+                assert lista == _from_scratch(conn, adotante, k), adotante['id']
+    finally:
+        conn.close()
+
+@pytest.fixture
+def calculado(banco):
+    """Banco com a lista de todos os adotantes já gravada."""
+    for adotante_id in range(1, 21):
+        matching.compatible_animals(records.find_record('adotantes', adotante_id, banco), TOP_K, banco)
+    assert len(_stored_lists(banco)) == 20
+    _check_invariant(banco)
+    return banco
+
+def _full_list(db_name, tamanho=TOP_K):
+    """Um adotante cuja lista tem exatamente 'tamanho' animais (e a lista)."""
+    for adotante_id, lista in sorted(_stored_lists(db_name).items()):
+        if len(lista) == tamanho and lista[-1]['score'] > 0:
+            return adotante_id, lista
+    pytest.skip(f"nenhuma lista com {tamanho} animais nos dados sintéticos")
+
+def test_new_animal_enters_full_list(calculado):
+    adotante_id, lista = _full_list(calculado)
+    melhor = records.find_record('animais', lista[0]['id'], calculado)
+    novo = records.add_record('animais', _form(melhor, nome='Novo'), calculado)
+
+    nova_lista = _stored_lists(calculado)[adotante_id]
+    assert {'id': novo, 'nome': 'Novo', 'score': lista[0]['score']} in nova_lista
+    # Nenhuma lista foi invalidada: o animal só entrou
+    assert len(_stored_lists(calculado)) == 20
+    _check_invariant(calculado)
+
+def test_tie_at_boundary_joins_list(calculado):
+    adotante_id, lista = _full_list(calculado)
+    ultimo = records.find_record('animais', lista[-1]['id'], calculado)
+    novo = records.add_record('animais', _form(ultimo, nome='Empate'), calculado)
+
+    nova_lista = _stored_lists(calculado)[adotante_id]
+    assert len(nova_lista) == TOP_K + 1
+    assert nova_lista[-1]['score'] == lista[-1]['score']
+    assert novo in [r['id'] for r in nova_lista]
+    _check_invariant(calculado)
+
+def test_animal_leaving_full_list_invalidates(calculado):
+    adotante_id, lista = _full_list(calculado)
+    adotante = records.find_record('adotantes', adotante_id, calculado)
+    animal = records.find_record('animais', lista[0]['id'], calculado)
+
+    # Em cada característica, uma opção diferente da preferida: score 0
+    mudancas = {
+        feature: next(
+            opcao for opcao, codigo in CARACTERISTICAS[feature]['map'].items()
+            if codigo != adotante[f"codigo_{feature}"]
+        )
+        for feature in COLUNAS_FEATURES
+    }
+    records.update_record('animais', animal['id'], _form(animal, **mudancas), calculado)
+
+    conn = get_db_connection(calculado)
+    try:
+        assert materialized.read_adopter(conn, adotante_id, TOP_K) is None
+    finally:
+        conn.close()
+    _check_invariant(calculado)
+
+    # Na leitura seguinte a lista é recalculada do zero, sem o animal
+    resultados, _ = matching.compatible_animals(adotante, TOP_K, calculado)
+    assert animal['id'] not in [r['id'] for r in resultados]
+    _check_invariant(calculado)
+
+def test_animal_leaving_list_with_ties_updates_it(calculado):
+    # Com empates a lista tem mais de k animais: sem um deles ainda tem k
+    adotante_id, lista = next(
+        ((i, l) for i, l in sorted(_stored_lists(calculado).items()) if len(l) > TOP_K),
+        (None, None),
+    )
+    if adotante_id is None:
+        pytest.skip("nenhuma lista com empates nos dados sintéticos")
+    animal = records.find_record('animais', lista[-1]['id'], calculado)
+    outro_tipo = next(tipo for tipo in TIPO_OPTIONS if tipo != animal['tipo'])
+    records.update_record('animais', animal['id'], _form(animal, tipo=outro_tipo), calculado)
+
+    assert _stored_lists(calculado)[adotante_id] == [r for r in lista if r['id'] != animal['id']]
+    _check_invariant(calculado)
+
+def test_animal_changing_tipo_moves_between_lists(calculado):
+    adotante_id, lista = _full_list(calculado)
+    animal = records.find_record('animais', lista[0]['id'], calculado)
+    outro_tipo = next(tipo for tipo in TIPO_OPTIONS if tipo != animal['tipo'])
+    records.update_record('animais', animal['id'], _form(animal, tipo=outro_tipo), calculado)
+
+    listas = _stored_lists(calculado)
+    assert adotante_id not in listas
+    for adotante_id, lista in listas.items():
+        if records.find_record('adotantes', adotante_id, calculado)['tipo'] == animal['tipo']:
+            assert animal['id'] not in [r['id'] for r in lista]
+    _check_invariant(calculado)
+
+def test_read_adopter_ignores_list_stored_with_other_k(calculado):
+    adotante = records.find_record('adotantes', 1, calculado)
+    conn = get_db_connection(calculado)
+    try:
+        assert materialized.read_adopter(conn, 1, 5) is None
+    finally:
+        conn.close()
+
+    # Pedida com outro k, a lista é recalculada e gravada com ele
+    resultados, _ = matching.compatible_animals(adotante, 5, calculado)
+    assert _stored_lists(calculado, 5)[1] == resultados
+    assert _stored_lists(calculado)[1] is None
+    _check_invariant(calculado, 5)
+
+def test_adopter_update_recomputes_only_its_list(calculado):
+    antes = _stored_lists(calculado)
+    adotante = records.find_record('adotantes', 1, calculado)
+    dados = {col: adotante[col] for col in ['nome', 'tipo', 'contato'] + COLUNAS_FEATURES}
+    dados.update({f"peso_{f}": adotante[f"peso_num_{f}"] for f in COLUNAS_FEATURES})
+    records.update_record('adotantes', 1, dict(dados, peso_tamanho=0), calculado)
+
+    # A lista do adotante alterado é invalidada e regravada (refresh_adopter); as outras ficam
+    depois = _stored_lists(calculado)
+    assert {i: l for i, l in depois.items() if i != 1} == {i: l for i, l in antes.items() if i != 1}
+    _check_invariant(calculado)
+
+def test_csv_import_invalidates_all_lists(calculado, tmp_path):
+    caminhos = write_dataset(str(tmp_path / 'novo'), 200, 10, seed=11)
+    assert records.replace_from_csv('animais', caminhos['animais'], db_name=calculado)['inseridos'] == 200
+    assert _stored_lists(calculado) == {}
+
+    conn = get_db_connection(calculado)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM compatibilidade").fetchone()[0] == 0
+    finally:
+        conn.close()
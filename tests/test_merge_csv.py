@@ -0,0 +1,194 @@
+import io
+
+import pandas as pd
+import pytest
+
+from adocoes import snapshot
+from adocoes.csv_import import merge_csv
+from adocoes.db import get_db_connection, table_version
+from adocoes.export import export_table
+
+BLOCO = 7
+CHAVE_NATURAL = ('nome', 'tipo')
+
+
+@pytest.fixture(params=[False, True], ids=['arquivo', 'snapshot'])
+def banco(request, banco):
+    """O banco do conftest, com e sem o snapshot em memória."""
+    if request.param:
+        snapshot.enable(banco)
+    return banco
+
+def _exported(db_name):
+    """A tabela 'animais' como o export a grava (texto, com a coluna id)."""
+    destino = io.BytesIO()
+    conn = get_db_connection(db_name)
+    try:
+        export_table(conn, 'animais', 'csv', destino)
+    finally:
+        conn.close()
+    return pd.read_csv(io.BytesIO(destino.getvalue()), dtype=str, keep_default_na=False)
+
+def _merge(db_name, df, **kwargs):
+    """Mescla o DataFrame como CSV; devolve (resultado, tabelas temporárias que sobraram na conexão)."""
+    arquivo = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+    conn = get_db_connection(db_name)
+    try:
+        resultado = merge_csv(conn, 'animais', arquivo, linhas_por_bloco=BLOCO, **kwargs)
+        sobras = [r[0] for r in conn.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'")]
+        return resultado, sobras
+    finally:
+        conn.close()
+
+def _table(db_name):
+    """A tabela lida do arquivo (não do snapshot), indexada por id."""
+    return _exported(db_name).set_index('id')
+
+def test_merge_by_id_updates_inserts_and_deletes(banco):
+    df = _exported(banco)
+    df.loc[df['id'] == '5', 'nome'] = 'Atualizado'
+    novo = df[df['id'] == '6'].assign(id='', nome='Novo')
+    df = pd.concat([df[df['id'] != '10'], novo], ignore_index=True)
+
+    resultado, sobras = _merge(banco, df, apagar_ausentes=True)
+    assert (resultado['inseridos'], resultado['atualizados'], resultado['apagados']) == (1, 1, 1)
+    assert resultado['total_erros'] == 0 and sobras == []
+
+    tabela = _table(banco)
+    assert tabela.loc['5', 'nome'] == 'Atualizado'
+    assert '10' not in tabela.index
+    assert tabela['nome'].tolist().count('Novo') == 1
+    assert len(tabela) == len(df)
+
+def test_merge_by_id_keeps_missing_rows_by_default(banco):
+    df = _exported(banco)
+    resultado, _ = _merge(banco, df[df['id'].astype(int) <= 100])
+    assert (resultado['inseridos'], resultado['atualizados'], resultado['apagados']) == (0, 0, 0)
+    assert _table(banco).equals(df.set_index('id'))
+
+def test_merge_by_id_with_explicit_new_id(banco):
+    df = _exported(banco)
+    novo = df[df['id'] == '1'].assign(id='5000', nome='Com id')
+    resultado, _ = _merge(banco, pd.concat([df, novo], ignore_index=True))
+    assert resultado['inseridos'] == 1
+    assert _table(banco).loc['5000', 'nome'] == 'Com id'
+
+def test_non_integer_ids_are_reported(banco):
+    antes = _table(banco)
+    df = _exported(banco)
+    df.loc[2, 'id'] = 'abc'
+    df.loc[20, ['id', 'nome']] = ['1.5', '']  # em outro bloco, com outra falha na mesma linha
+    df.loc[30, 'id'] = '31.0'  # inteiro escrito como decimal: aceito
+
+    resultado, sobras = _merge(banco, df)
+    assert resultado['erros'] == [(4, "id deve ser um número inteiro"), (22, "id deve ser um número inteiro; nome vazio")]
+    assert resultado['inseridos'] == 0 and sobras == []
+    assert _table(banco).equals(antes)
+
+    # Um id decimal sozinho também é só um erro da linha
+    df = _exported(banco)
+    df.loc[40, 'id'] = '2.5'
+    assert _merge(banco, df)[0]['erros'] == [(42, "id deve ser um número inteiro")]
+    assert _table(banco).equals(antes)
+
+def test_missing_id_column_in_id_mode(banco):
+    antes = _table(banco)
+    resultado, sobras = _merge(banco, _exported(banco).drop(columns=['id']))
+    assert resultado['faltando'] == {'id'}
+    assert resultado['inseridos'] == 0 and sobras == []
+    assert _table(banco).equals(antes)
+
+    # Com chave natural o id é dispensável
+    resultado, _ = _merge(banco, _exported(banco).drop(columns=['id']).drop_duplicates(list(CHAVE_NATURAL)),
+                          chave=CHAVE_NATURAL)
+    assert not resultado['faltando'] and resultado['total_erros'] == 0
+
+def test_duplicate_ids_are_reported_per_line(banco):
+    df = _exported(banco)
+    df.loc[10, 'id'] = df.loc[3, 'id']
+    resultado, _ = _merge(banco, df)
+    assert resultado['erros'] == [(5, "chave ('id',) repetida no CSV"), (12, "chave ('id',) repetida no CSV")]
+
+def test_duplicate_natural_keys_are_reported_per_line(banco):
+    antes = _table(banco)
+    df = _exported(banco).drop_duplicates(list(CHAVE_NATURAL)).reset_index(drop=True)
+    for linha in (8, 40):
+        df.loc[linha, ['nome', 'tipo']] = df.loc[0, ['nome', 'tipo']].tolist()
+
+    resultado, sobras = _merge(banco, df, chave=CHAVE_NATURAL)
+    motivo = f"chave {CHAVE_NATURAL} repetida no CSV"
+    assert resultado['erros'] == [(2, motivo), (10, motivo), (42, motivo)]
+    assert sobras == []
+    assert _table(banco).equals(antes)
+
+def test_natural_key_matching_several_rows_updates_all(banco):
+    df = _exported(banco)
+    features = [col for col in df.columns if col not in ('id', 'nome', 'tipo')]
+    # Dois animais já gravados com a mesma chave natural
+    gemeos = df['id'].isin(['3', '4'])
+    df.loc[gemeos, 'nome'] = 'Gêmeo'
+    df.loc[gemeos, 'tipo'] = df.loc[df['id'] == '3', 'tipo'].iloc[0]
+    assert _merge(banco, df)[0]['atualizados'] == 2
+
+    # Uma linha do CSV com essa chave e características diferentes das duas
+    diferente = (df[features] != df.loc[gemeos, features].iloc[0]).any(axis=1) & \
+                (df[features] != df.loc[gemeos, features].iloc[1]).any(axis=1)
+    linha = df[diferente].head(1).assign(nome='Gêmeo', tipo=df.loc[gemeos, 'tipo'].iloc[0])
+
+    resultado, _ = _merge(banco, linha.drop(columns=['id']), chave=CHAVE_NATURAL)
+    # UPDATE ... FROM atualiza as duas; 'atualizados' conta as linhas unidas
+    assert (resultado['inseridos'], resultado['atualizados']) == (0, 2)
+    tabela = _table(banco)
+    for id_ in ('3', '4'):
+        assert tabela.loc[id_, features].tolist() == linha[features].iloc[0].tolist()
+
+    # De novo a mesma linha: nada mudou, nada conta
+    resultado, _ = _merge(banco, linha.drop(columns=['id']), chave=CHAVE_NATURAL)
+    assert resultado['atualizados'] == 0
+
+def _version_and_triggers(db_name):
+    conn = get_db_connection(db_name, disco=True)
+    try:
+        gatilhos = sorted(tuple(r) for r in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'animais'"
+        ))
+        return table_version(conn, 'animais'), gatilhos
+    finally:
+        conn.close()
+
+def test_merge_bumps_version_once(banco):
+    versao, gatilhos = _version_and_triggers(banco)
+    df = _exported(banco)
+    df['nome'] = df['nome'] + ' (mesclado)'
+    resultado, _ = _merge(banco, df)
+    assert resultado['atualizados'] == len(df)
+
+    # Uma versão por mescla, não uma por linha; os gatilhos voltam iguais
+    assert _version_and_triggers(banco) == (versao + 1, gatilhos)
+
+    # Mescla que não muda nada não mexe na versão
+    assert _merge(banco, df)[0]['atualizados'] == 0
+    assert _version_and_triggers(banco) == (versao + 1, gatilhos)
+
+    # Escritas linha a linha continuam contando
+    conn = get_db_connection(banco)
+    try:
+        conn.execute("UPDATE animais SET nome = 'Depois' WHERE id = 1")
+        conn.commit()
+    finally:
+        conn.close()
+    assert _version_and_triggers(banco)[0] == versao + 2
+
+def test_staging_table_is_dropped_on_exception(banco):
+    antes = _table(banco)
+    csv = _exported(banco).to_csv(index=False)
+    # Linha com campos demais: o pandas só a encontra no último bloco
+    arquivo = io.BytesIO((csv + ",".join(["1"] * 40) + "\n").encode('utf-8'))
+    conn = get_db_connection(banco)
+    try:
+        with pytest.raises(pd.errors.ParserError):
+            merge_csv(conn, 'animais', arquivo, linhas_por_bloco=BLOCO)
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_temp_master").fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert _table(banco).equals(antes)
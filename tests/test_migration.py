@@ -0,0 +1,123 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from adocoes import db, matching
+from adocoes.config import COLUNAS_FEATURES, COLUNAS_PESO_NUM
+from adocoes.scoring import adopter_vectors, build_weight_matrix
+from adocoes.synthetic import generate_chunk
+
+# Colunas de texto de um banco anterior às colunas inteiras
+COLUNAS_LEGADAS = ['nome', 'contato', 'tipo'] + [
+    f"{prefixo}{f}" for f in COLUNAS_FEATURES for prefixo in ('', 'codigo_', 'peso_')
+]
+
+
+@pytest.fixture
+def legado(tmp_path):
+    """Banco só com as colunas de texto dos adotantes (e user_version 0)."""
+    db_name = str(tmp_path / 'legado.db')
+    adotantes = generate_chunk('adotantes', 1, 5, np.random.default_rng(3))
+    feature = COLUNAS_FEATURES[0]
+    tamanho = len(adotantes.at[0, f"codigo_{feature}"])
+    # 0: bom; 1: peso 10 ('1010...'); 2: letra no meio; 3: peso 11; 4: tamanho errado
+    adotantes.at[1, f"peso_{feature}"] = '10' * tamanho
+    adotantes.at[2, f"peso_{feature}"] = '8' + 'a' * (tamanho - 1)
+    adotantes.at[3, f"peso_{feature}"] = '11' * tamanho
+    adotantes.at[4, f"peso_{feature}"] = '8' * (tamanho + 1)
+
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute(
+            f"CREATE TABLE adotantes (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(c + ' TEXT' for c in COLUNAS_LEGADAS)})"
+        )
+        conn.executemany(
+            f"INSERT INTO adotantes ({', '.join(COLUNAS_LEGADAS)}) VALUES ({', '.join('?' * len(COLUNAS_LEGADAS))})",
+            adotantes[COLUNAS_LEGADAS].itertuples(index=False, name=None),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    yield db_name, f"peso_num_{feature}"
+    db.close_connections(db_name)
+
+def _weights(db_name, col):
+    conn = db.get_db_connection(db_name, disco=True)
+    try:
+        return [r[0] for r in conn.execute(f"SELECT {col} FROM adotantes ORDER BY id")]
+    finally:
+        conn.close()
+
+def _adopters(db_name):
+    conn = db.get_db_connection(db_name, disco=True)
+    try:
+        return conn.execute("SELECT * FROM adotantes ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+def test_backfill_leaves_malformed_weights_null(legado):
+    db_name, col = legado
+    db.init_db(db_name)
+    pesos = _weights(db_name, col)
+    assert pesos[0] in range(11) and pesos[1:] == [10, None, None, None]
+
+    # Os NULL contam como vetor inválido, como um código inválido
+    adotantes = _adopters(db_name)
+    for adotante in adotantes[2:]:
+        B, P = adopter_vectors(adotante)
+        assert len(P) == 0 and len(B) > 0
+    df = pd.DataFrame([dict(a) for a in adotantes])
+    _, valid = build_weight_matrix(df, len(adopter_vectors(adotantes[0])[0]))
+    assert valid.tolist() == [True, True, False, False, False]
+
+def test_null_weight_raises_vector_mismatch(legado):
+    db_name, _ = legado
+    db.init_db(db_name)
+    adotante = _adopters(db_name)[2]
+    entry = {'assinaturas': np.zeros((1, len(adopter_vectors(adotante)[0])), dtype=np.int8)}
+    with pytest.raises(matching.VectorMismatch):
+        matching.rank_entry(adotante, entry)
+
+def test_version_7_revalidates_weights_filled_by_old_default(legado):
+    db_name, col = legado
+    db.init_db(db_name)
+    # Como um banco migrado antes da versão 7: o default 5 no lugar do NULL
+    conn = sqlite3.connect(db_name)
+    try:
+        conn.execute(f"UPDATE adotantes SET {col} = 5 WHERE {col} IS NULL")
+        conn.execute("PRAGMA user_version = 6")
+        conn.commit()
+    finally:
+        conn.close()
+    antes = {c: _weights(db_name, c) for c in COLUNAS_PESO_NUM}
+
+    db.init_db(db_name, force=True)
+    assert _weights(db_name, col)[2:] == [None, None, None]
+    # As demais colunas e linhas não mudam
+    for c in COLUNAS_PESO_NUM:
+        esperado = antes[c] if c != col else antes[c][:2] + [None] * 3
+        assert _weights(db_name, c) == esperado
+
+def test_backfill_errors_are_not_swallowed(legado, monkeypatch):
+    db_name, _ = legado
+
+    def falha(cursor, table_name, col):
+        raise sqlite3.OperationalError("falha no preenchimento")
+
+    monkeypatch.setattr(db, '_backfill_integer_column', falha)
+    with pytest.raises(sqlite3.OperationalError, match="falha no preenchimento"):
+        db.init_db(db_name)
+    # Nada ficou pela metade: nem a versão do esquema nem as colunas novas
+    conn = sqlite3.connect(db_name)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert [r[1] for r in conn.execute("PRAGMA table_info(adotantes)")] == ['id'] + COLUNAS_LEGADAS
+    finally:
+        conn.close()
+
+    # A próxima execução refaz tudo, preenchimentos incluídos
+    monkeypatch.undo()
+    db.init_db(db_name)
+    assert None not in _weights(db_name, COLUNAS_PESO_NUM[1])
@@ -0,0 +1,73 @@
+import pytest
+
+from adocoes import cache as animal_cache
+from adocoes import db, records, result_cache
+from adocoes.db import get_db_connection, load_page
+from adocoes.synthetic import write_dataset
+
+
+@pytest.fixture(scope='module')
+def banco_nulos(tmp_path_factory):
+    """
+    Banco com 300 animais em que algumas colunas de ordenação têm NULL
+    (em blocos e espalhados) e muitos empates, para a paginação por chave.
+    """
+    diretorio = tmp_path_factory.mktemp('paginacao')
+    db_name = str(diretorio / 'adocoes.db')
+    db.init_db(db_name)
+    caminhos = write_dataset(str(diretorio), 300, 1, seed=5)
+    assert records.replace_from_csv('animais', caminhos['animais'], db_name=db_name)['inseridos'] == 300
+    conn = get_db_connection(db_name)
+    try:
+        conn.execute("UPDATE animais SET tamanho = NULL, indice_tamanho = NULL WHERE id % 7 = 0 OR id BETWEEN 100 AND 120")
+        conn.execute("UPDATE animais SET late = NULL WHERE id % 3 = 1")
+        conn.commit()
+    finally:
+        conn.close()
+    yield db_name
+    animal_cache.invalidate(db_name)
+    result_cache.clear(db_name)
+    db.close_connections(db_name)
+
+def _expected(conn, ordem, decrescente, filtros):
+    direcao = 'DESC' if decrescente else 'ASC'
+    chave = f"id {direcao}" if ordem == 'id' else f"{ordem} {direcao}, id {direcao}"
+    where = "WHERE tipo = ?" if filtros else ""
+    return [r[0] for r in conn.execute(f"SELECT id FROM animais {where} ORDER BY {chave}", list(filtros.values()))]
+
+@pytest.mark.parametrize('limite', [1, 3, 17, 50])
+@pytest.mark.parametrize('filtros', [{}, {'tipo': 'gato'}], ids=['todos', 'gato'])
+@pytest.mark.parametrize('decrescente', [False, True], ids=['asc', 'desc'])
+@pytest.mark.parametrize('ordem', ['id', 'nome', 'tamanho', 'indice_tamanho', 'late'])
+def test_keyset_pages_match_plain_order_by(banco_nulos, ordem, decrescente, filtros, limite):
+    conn = get_db_connection(banco_nulos)
+    try:
+        esperado = _expected(conn, ordem, decrescente, filtros)
+        assert esperado
+
+        obtido, apos, paginas = [], None, 0
+        while True:
+            df, apos = load_page(conn, 'animais', list(dict.fromkeys(['id', ordem])), filtros, ordem, decrescente, apos, limite)
+            paginas += 1
+            assert len(df) <= limite
+            obtido += df['id'].tolist()
+            if apos is None:
+                break
+            # A chave devolvida é a da última linha da página
+            assert apos[1] == obtido[-1]
+            assert paginas <= len(esperado)
+    finally:
+        conn.close()
+
+    assert obtido == esperado
+    # Sem página vazia no fim (exceto se tudo coube numa só)
+    assert paginas == max(1, -(-len(esperado) // limite))
+
+def test_get_page_counts_filtered_rows(banco_nulos):
+    df, proxima, total = records.get_page('animais', {'tipo': 'gato'}, 'tamanho', True, limite=10, db_name=banco_nulos)
+    conn = get_db_connection(banco_nulos)
+    try:
+        assert total == len(_expected(conn, 'id', False, {'tipo': 'gato'}))
+    finally:
+        conn.close()
+    assert len(df) == 10 and proxima is not None
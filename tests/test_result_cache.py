@@ -0,0 +1,116 @@
+import pytest
+
+from adocoes import result_cache
+from adocoes.config import COLUNAS_CODIGO, COLUNAS_PESO
+
+BANCO = 'teste_result_cache.db'
+
+
+@pytest.fixture(autouse=True)
+def vazio(monkeypatch):
+    """Cada teste começa sem listas nem contadores."""
+    monkeypatch.setattr(result_cache, '_caches', {})
+
+def _valor(n, nome='Animal'):
+    return [{'id': i, 'nome': f"{nome} {i}", 'score': 1.0 - i / 100} for i in range(n)], []
+
+def _put(chave, valor, versao=1, **limites):
+    result_cache.put(chave, versao, valor, BANCO, **limites)
+
+def _get(chave, versao=1):
+    return result_cache.get(chave, versao, BANCO)
+
+def test_hit_miss_and_stats():
+    assert _get('a') is None
+    valor = _valor(3)
+    _put('a', valor)
+    assert _get('a') is valor
+    assert _get('a') is valor
+
+    stats = result_cache.stats(BANCO)
+    assert (stats['listas'], stats['acertos'], stats['faltas']) == (1, 2, 1)
+    assert stats['taxa_acerto'] == pytest.approx(2 / 3)
+    assert stats['bytes'] == result_cache._size(valor)
+    assert (stats['descartes'], stats['invalidacoes']) == (0, 0)
+
+    # clear esvazia, mas os contadores continuam
+    result_cache.clear(BANCO)
+    stats = result_cache.stats(BANCO)
+    assert (stats['listas'], stats['bytes'], stats['acertos']) == (0, 0, 2)
+
+def test_lru_eviction_by_items():
+    for chave in 'abc':
+        _put(chave, _valor(2), itens=3)
+    assert _get('a') is not None  # 'a' passa a ser a mais recente
+    _put('d', _valor(2), itens=3)
+
+    assert _get('b') is None
+    assert all(_get(chave) is not None for chave in 'acd')
+    stats = result_cache.stats(BANCO)
+    assert (stats['listas'], stats['descartes']) == (3, 1)
+    assert stats['bytes'] == 3 * result_cache._size(_valor(2))
+
+def test_lru_eviction_by_memory():
+    tamanho = result_cache._size(_valor(5))
+    # Cabem duas listas e meia
+    mb = 2.5 * tamanho / (1024 * 1024)
+    for chave in 'abc':
+        _put(chave, _valor(5), memoria_mb=mb)
+    stats = result_cache.stats(BANCO)
+    assert (stats['listas'], stats['bytes'], stats['descartes']) == (2, 2 * tamanho, 1)
+    assert _get('a') is None and _get('b') is not None
+
+    # Uma lista maior que o limite inteiro nem entra (e não derruba as outras)
+    _put('grande', _valor(50), memoria_mb=mb)
+    assert _get('grande') is None
+    assert result_cache.stats(BANCO)['listas'] == 2
+
+def test_replacing_a_key_keeps_byte_count():
+    _put('a', _valor(2))
+    _put('a', _valor(10))
+    assert result_cache.stats(BANCO)['bytes'] == result_cache._size(_valor(10))
+    assert len(_get('a')[0]) == 10
+
+def test_newer_version_invalidates():
+    _put('a', _valor(2), versao=1)
+    _put('b', _valor(2), versao=1)
+    assert _get('a', versao=2) is None
+    assert _get('b', versao=2) is None
+
+    stats = result_cache.stats(BANCO)
+    assert (stats['listas'], stats['bytes'], stats['invalidacoes']) == (0, 0, 1)
+
+    _put('a', _valor(3), versao=2)
+    assert len(_get('a', versao=2)[0]) == 3
+
+def test_put_with_old_version_is_refused():
+    # A lista foi calculada antes de uma escrita que outra consulta já viu
+    assert _get('a', versao=5) is None
+    _put('a', _valor(2), versao=4)
+    assert result_cache.stats(BANCO)['listas'] == 0
+
+    # E uma consulta atrasada não apaga as listas da versão atual
+    _put('b', _valor(2), versao=5)
+    assert _get('b', versao=4) is None
+    assert _get('b', versao=5) is not None
+
+def test_disabled_with_zero_items():
+    _put('a', _valor(2), itens=0)
+    assert _get('a') is None
+    assert result_cache.stats(BANCO)['listas'] == 0
+
+def test_caches_are_per_database():
+    _put('a', _valor(2))
+    assert result_cache.get('a', 1, 'outro.db') is None
+    assert _get('a') is not None
+
+def test_profile_key_ignores_identity():
+    adotante = {'id': 1, 'nome': 'Ana', 'tipo': 'cão'}
+    adotante.update({col: '10' for col in COLUNAS_CODIGO})
+    adotante.update({col: '55' for col in COLUNAS_PESO})
+    chave = result_cache.profile_key(adotante, 10)
+
+    assert result_cache.profile_key(dict(adotante, id=2, nome='Bia'), 10) == chave
+    assert result_cache.profile_key(adotante, 5) != chave
+    assert result_cache.profile_key(dict(adotante, tipo='gato'), 10) != chave
+    assert result_cache.profile_key(dict(adotante, **{COLUNAS_PESO[0]: '66'}), 10) != chave
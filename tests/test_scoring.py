@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from adocoes.config import COLUNAS_FEATURES
+from adocoes.encoding import add_integer_columns
+from adocoes.matching import rank_animals
+from adocoes.scoring import adopter_vectors, build_code_matrix, weighted_cosine_scores
+from adocoes.signatures import MOTORES
+from adocoes.synthetic import generate_chunk
+
+
+def calculate_scores(adotante, animais_filtrados_df):
+    """
+    Laço original (um animal por vez) do app.py, como referência. Única
+    diferença: um animal com vetor inválido fica de fora e tem o nome
+    devolvido à parte (o original mostrava st.error, ou abortava a lista
+    inteira quando o código tinha caracteres que não são dígitos).
+    """
+    scores_list = []
+    invalidos = []
+
+    # 1. Preparar vetores do Adotante (B e P) - SOMENTE 10 FEATURES
+    vetor_b_str = ""
+    vetor_p_str = ""
+    for feature in COLUNAS_FEATURES:
+        vetor_b_str += adotante[f"codigo_{feature}"]
+        vetor_p_str += adotante[f"peso_{feature}"]
+
+    B = [int(digit) for digit in vetor_b_str]
+    P = [int(digit) for digit in vetor_p_str]
+
+    # 2. Calcular o Termo 2 do Denominador (lado do Adotante)
+    sum_Bi_Pi_sq = 0
+    for i in range(len(B)):
+        sum_Bi_Pi_sq += (B[i] * P[i])**2
+
+    denominador_termo2 = math.sqrt(sum_Bi_Pi_sq)
+
+    # 3. Iterar sobre cada Animal para calcular o score
+    for _, animal in animais_filtrados_df.iterrows():
+        vetor_a_str = ""
+        for feature in COLUNAS_FEATURES:
+            vetor_a_str += animal[f"codigo_{feature}"]
+        try:
+            A = [int(digit) for digit in vetor_a_str]
+        except ValueError:
+            invalidos.append(animal['nome'])
+            continue
+
+        if len(A) != len(B):
+            invalidos.append(animal['nome'])
+            continue
+
+        numerador = 0
+        sum_Ai_Pi_sq = 0
+        for i in range(len(A)):
+            ai = A[i]
+            bi = B[i]
+            pi = P[i]
+
+            numerador += (ai * bi * pi)
+            sum_Ai_Pi_sq += (ai * pi)**2
+
+        denominador_termo1 = math.sqrt(sum_Ai_Pi_sq)
+
+        # 3.3 Calcular Score Final
+        denominador_completo = denominador_termo1 * denominador_termo2
+
+        if denominador_completo == 0:
+            score = 0.0
+        else:
+            score = numerador / denominador_completo
+
+        scores_list.append({'id': animal['id'], 'nome': animal['nome'], 'score': score})
+
+    # 4. Ordenar a lista final
+    return sorted(scores_list, key=lambda x: x['score'], reverse=True), invalidos
+
+@pytest.fixture(scope='module')
+def dados():
+    """Animais e adotantes sintéticos, com empates, códigos inválidos e adotantes de peso zero."""
+    rng = np.random.default_rng(2024)
+
+    animais = generate_chunk('animais', 1, 400, rng)
+    # Cópias exatas (outros ids) garantem empates de score
+    animais = pd.concat([animais, animais.sample(60, random_state=1)], ignore_index=True)
+    animais.insert(0, 'id', np.arange(1, len(animais) + 1))
+    animais['nome'] = [f"Animal {i}" for i in animais['id']]
+
+    # Códigos inválidos: vazio (vetor curto) ou com letra (mesmo tamanho)
+    for linha in rng.choice(len(animais), size=25, replace=False).tolist():
+        feature = COLUNAS_FEATURES[rng.integers(len(COLUNAS_FEATURES))]
+        codigo = animais.at[linha, f"codigo_{feature}"]
+        animais.at[linha, f"codigo_{feature}"] = '' if linha % 2 else 'x' + codigo[1:]
+
+    adotantes = generate_chunk('adotantes', 1, 40, rng)
+    adotantes.insert(0, 'id', np.arange(1, len(adotantes) + 1))
+    for linha in (0, 1):
+        for feature in COLUNAS_FEATURES:
+            adotantes.at[linha, f"peso_{feature}"] = '0' * len(adotantes.at[linha, f"codigo_{feature}"])
+
+    return animais, [adotante.to_dict() for _, adotante in adotantes.iterrows()]
+
+@pytest.fixture(scope='module')
+def referencia(dados):
+    """(adotante, lista esperada, inválidos esperados) de cada adotante, pelo laço original."""
+    animais, adotantes = dados
+    return [(adotante, *calculate_scores(adotante, animais)) for adotante in adotantes]
+
+def _plain(resultados):
+    return [{'id': int(r['id']), 'nome': r['nome'], 'score': r['score']} for r in resultados]
+
+def test_reference_data_has_ties_and_invalid_codes(referencia):
+    for _, esperado, invalidos in referencia:
+        scores = [r['score'] for r in esperado]
+        assert len(set(scores)) < len(scores)
+        assert len(invalidos) == 25
+    zerados = [esperado for _, esperado, _ in referencia if all(r['score'] == 0 for r in esperado)]
+    assert len(zerados) == 2
+
+def test_weighted_cosine_scores_matches_reference(dados, referencia):
+    animais, _ = dados
+    for adotante, esperado, invalidos in referencia:
+        B, P = adopter_vectors(adotante)
+        A, valid = build_code_matrix(animais, tamanho=len(B))
+        scores = weighted_cosine_scores(A[valid], B, P)
+        ordem = np.argsort(-scores, kind='stable')
+        validos = animais[valid].reset_index(drop=True)
+        obtido = [{'id': validos['id'][i], 'nome': validos['nome'][i], 'score': float(scores[i])} for i in ordem]
+
+        assert _plain(obtido) == _plain(esperado)
+        assert animais['nome'][~valid].tolist() == invalidos
+
+@pytest.mark.parametrize('motor', MOTORES)
+@pytest.mark.parametrize('inteiras', [False, True], ids=['texto', 'indices'])
+def test_rank_animals_matches_reference(dados, referencia, motor, inteiras):
+    animais, _ = dados
+    df = add_integer_columns(animais, 'animais') if inteiras else animais
+    for adotante, esperado, invalidos in referencia:
+        resultados, nomes_invalidos = rank_animals(adotante, df, motor=motor)
+        assert resultados == _plain(esperado)
+        assert nomes_invalidos == invalidos
+
+        # Top-k + empates = prefixo da lista completa até o score do k-ésimo
+        for k in (1, 5, 20):
+            topo, _ = rank_animals(adotante, df, k, motor=motor)
+            assert topo == [r for r in _plain(esperado) if r['score'] >= esperado[k - 1]['score']]
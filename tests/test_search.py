@@ -0,0 +1,134 @@
+import sqlite3
+
+import pytest
+
+from adocoes import records, search
+from adocoes.config import COLUNAS_FEATURES
+from adocoes.db import get_db_connection
+from adocoes.export import export_table
+
+
+def _add(db_name, nome):
+    """Cadastra um animal (cópia das características do animal 1) com esse nome."""
+    modelo = records.find_record('animais', 1, db_name)
+    dados = {col: modelo[col] for col in ['tipo'] + COLUNAS_FEATURES}
+    return records.add_record('animais', dict(dados, nome=nome), db_name)
+
+def _rename(db_name, id_, nome):
+    modelo = records.find_record('animais', id_, db_name)
+    dados = {col: modelo[col] for col in ['tipo'] + COLUNAS_FEATURES}
+    records.update_record('animais', id_, dict(dados, nome=nome), db_name)
+
+def _ids(db_name, texto, **kwargs):
+    return [r['id'] for r in search.search_records('animais', texto, db_name=db_name, **kwargs)]
+
+def _check_index(db_name):
+    """O índice FTS5 bate com o conteúdo da tabela (senão o SQLite acusa 'database disk image is malformed')."""
+    conn = get_db_connection(db_name, disco=True)
+    try:
+        conn.execute("INSERT INTO busca_animais (busca_animais, rank) VALUES ('integrity-check', 1)")
+    finally:
+        conn.close()
+
+def test_triggers_keep_index_in_sync(banco):
+    id_ = _add(banco, 'Bolota Feliz')
+    assert _ids(banco, 'bolo') == [id_]
+    assert _ids(banco, 'FELÍZ') == [id_]
+
+    _rename(banco, id_, 'Pipoca')
+    assert _ids(banco, 'bolo') == []
+    assert _ids(banco, 'pipo') == [id_]
+    _check_index(banco)
+
+    # Apagado por outra conexão: os gatilhos valem para qualquer uma
+    externa = sqlite3.connect(banco)
+    try:
+        externa.execute("DELETE FROM animais WHERE id = ?", (id_,))
+        externa.commit()
+    finally:
+        externa.close()
+    assert _ids(banco, 'pipo') == []
+    _check_index(banco)
+
+def test_csv_import_rebuilds_index(banco, tmp_path):
+    id_ = _add(banco, 'Bolota')
+    caminho = tmp_path / 'animais.csv'
+    with open(caminho, 'wb') as destino:
+        conn = get_db_connection(banco)
+        try:
+            total = export_table(conn, 'animais', 'csv', destino)
+        finally:
+            conn.close()
+    texto = caminho.read_text(encoding='utf-8').replace('Bolota', 'Torresmo')
+    caminho.write_text(texto, encoding='utf-8')
+
+    # import_csv apaga os gatilhos, insere e refaz o índice de uma vez
+    assert records.replace_from_csv('animais', str(caminho), db_name=banco)['inseridos'] == total
+    assert _ids(banco, 'bolota') == []
+    assert _ids(banco, 'torres') == [id_]
+    _check_index(banco)
+
+    # E os gatilhos voltam: escritas seguintes continuam indexadas
+    novo = _add(banco, 'Depois Do Import')
+    assert _ids(banco, 'depois import') == [novo]
+    _check_index(banco)
+
+def test_exact_words_come_before_prefixes(banco):
+    prefixo = _add(banco, 'Rexona')
+    exato = _add(banco, 'Rex')
+    assert _ids(banco, 'rex') == [exato, prefixo]
+
+def test_most_relevant_first_within_a_pass(banco):
+    # Nomes longos com 'Rex' cadastrados antes; o 'Rex' sozinho tem id maior
+    longos = [_add(banco, f"Rex Bolinha Grande De Pelo Longo {i}") for i in range(15)]
+    curto = _add(banco, 'Rex')
+    assert _ids(banco, 'rex', limite=5)[0] == curto
+    assert _ids(banco, 'rex bol', limite=5) == longos[:5]
+
+    prefixos = [_add(banco, f"Thorzinho Da Silva Santos {i}") for i in range(15)]
+    curto = _add(banco, 'Thorzinho')
+    assert _ids(banco, 'thor', limite=5)[0] == curto
+    assert set(_ids(banco, 'thor', limite=20)) == set(prefixos + [curto])
+
+def test_too_many_matches_fall_back_to_id_order(banco, monkeypatch):
+    ids = [_add(banco, f"Rex Bolinha Grande De Pelo Longo {i}") for i in range(5)] + [_add(banco, 'Rex')]
+    monkeypatch.setattr(search, 'BUSCA_MAX_RANQUEADOS', 3)
+    assert _ids(banco, 'rex', limite=4) == ids[:4]
+
+def test_typo_pass_fills_remaining_slots(banco):
+    id_ = _add(banco, 'Bolota')
+    # 'bolta' não é prefixo de nada: entra pela semelhança com 'bolota'
+    assert _ids(banco, 'bolta') == [id_]
+    assert _ids(banco, 'bolta', corte=0.95) == []
+    # Palavras curtas não passam pela busca aproximada
+    _add(banco, 'Ana')
+    assert _ids(banco, 'an') != [] and _ids(banco, 'aa') == []
+
+def test_digits_search_id_first(banco):
+    _add(banco, 'Animal Sete 7')
+    resultado = _ids(banco, '7')
+    assert resultado[0] == 7
+    assert _ids(banco, '  ') == []
+
+@pytest.fixture
+def sem_fts(banco):
+    """O banco sem o índice FTS5, como num SQLite compilado sem ele."""
+    externa = sqlite3.connect(banco)
+    try:
+        for (nome,) in externa.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'busca_%'").fetchall():
+            externa.execute(f"DROP TRIGGER {nome}")
+        externa.execute("DROP TABLE busca_animais_termos")
+        externa.execute("DROP TABLE busca_animais")
+        externa.commit()
+    finally:
+        externa.close()
+    return banco
+
+def test_like_fallback_without_fts(sem_fts):
+    primeiro = _add(sem_fts, 'Zeca Bolota')
+    segundo = _add(sem_fts, 'Bolota Zeca')
+    _add(sem_fts, 'Zeca')
+    # Todas as palavras, em qualquer posição; ordem de nome
+    assert _ids(sem_fts, 'bolota zeca') == [segundo, primeiro]
+    assert _ids(sem_fts, 'olot') == [segundo, primeiro]
+    assert _ids(sem_fts, 'bolota', limite=1) == [segundo]
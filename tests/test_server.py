@@ -0,0 +1,68 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from adocoes import cache as animal_cache
+from adocoes import records, snapshot
+from adocoes.config import COLUNAS_FEATURES
+from adocoes.server import create_app
+
+
+def _get(app, path, query=''):
+    """Faz um GET no app ASGI e devolve (status, corpo decodificado)."""
+    mensagens = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(mensagem):
+        mensagens.append(mensagem)
+
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode()}
+    asyncio.run(app(scope, receive, send))
+    return mensagens[0]['status'], json.loads(mensagens[1]['body'])
+
+@pytest.fixture(params=[False, True], ids=['arquivo', 'snapshot'])
+def banco(request, banco):
+    """O banco do conftest, com e sem o snapshot em memória."""
+    if request.param:
+        snapshot.enable(banco)
+    return banco
+
+def test_matches_see_animals_written_by_another_connection(banco):
+    app = create_app(banco, janela_ms=0)
+    status, corpo = _get(app, '/adotantes/1/matches', 'k=5')
+    assert status == 200
+    melhor = corpo['matches'][0]
+    assert 'Externo' not in [m['nome'] for m in corpo['matches']]
+
+    # Outro processo (aqui, outra conexão fora do pool) cadastra uma cópia do
+    # melhor animal: mesmo score, então entra na lista como empate
+    cols = ['tipo'] + [f"{prefixo}{f}" for f in COLUNAS_FEATURES for prefixo in ('', 'codigo_', 'indice_')]
+    externa = sqlite3.connect(banco)
+    try:
+        externa.execute(
+            f"INSERT INTO animais (nome, {', '.join(cols)}) SELECT 'Externo', {', '.join(cols)} FROM animais WHERE id = ?",
+            (melhor['id'],),
+        )
+        externa.commit()
+    finally:
+        externa.close()
+
+    status, corpo = _get(app, '/adotantes/1/matches', 'k=5')
+    assert status == 200
+    externo = [m for m in corpo['matches'] if m['nome'] == 'Externo']
+    assert len(externo) == 1 and externo[0]['score'] == melhor['score']
+
+def test_incremental_writes_keep_cache_without_reload(banco):
+    registro = records.find_record('animais', 1, banco)
+    animal_cache.get_animal_entry(registro['tipo'], banco)
+    dados = {col: registro[col] for col in ['nome', 'tipo'] + COLUNAS_FEATURES}
+    records.update_record('animais', 1, dict(dados, nome='Renomeado'), banco)
+
+    # A escrita do próprio processo já está no cache: nada a descartar
+    assert not animal_cache.sync(banco)
+    entry = animal_cache.get_animal_entry(registro['tipo'], banco)
+    assert 'Renomeado' in entry['nomes'].tolist() + entry['invalidos']
@@ -0,0 +1,191 @@
+import sqlite3
+
+import pytest
+
+from adocoes import db, snapshot
+
+CONSULTA = "SELECT id, nome, tipo FROM animais ORDER BY id"
+
+
+@pytest.fixture
+def banco(banco):
+    """O banco do conftest com o snapshot ligado."""
+    assert snapshot.enable(banco) > 0
+    return banco
+
+def _rows(db_name, disco=False):
+    conn = db.get_db_connection(db_name, disco=disco)
+    try:
+        return [tuple(linha) for linha in conn.execute(CONSULTA)]
+    finally:
+        conn.close()
+
+def _generation(db_name):
+    """memdb de onde as leituras estão vindo (muda quando o snapshot é recopiado)."""
+    conn = db.get_db_connection(db_name)
+    try:
+        return conn.pool_key
+    finally:
+        conn.close()
+
+def _assert_in_sync(db_name):
+    assert snapshot.enabled(db_name)
+    assert _rows(db_name) == _rows(db_name, disco=True)
+
+def _rename(db_name, id_, nome):
+    """Escrita de outro processo (conexão fora do pool)."""
+    externa = sqlite3.connect(db_name)
+    try:
+        externa.execute("UPDATE animais SET nome = ? WHERE id = ?", (nome, id_))
+        externa.commit()
+    finally:
+        externa.close()
+
+def test_reads_come_from_memory(banco):
+    assert 'vfs=memdb' in _generation(banco)
+    _assert_in_sync(banco)
+
+def test_commit_replays_into_snapshot(banco):
+    geracao = _generation(banco)
+    conn = db.get_db_connection(banco)
+    try:
+        conn.execute("UPDATE animais SET nome = 'Replay' WHERE id = 1")
+        # Dentro da transação, a leitura vem do arquivo (já com a escrita)
+        assert conn.execute("SELECT nome FROM animais WHERE id = 1").fetchone()[0] == 'Replay'
+        conn.commit()
+    finally:
+        conn.close()
+    assert _rows(banco)[0][1] == 'Replay'
+    # Poucas linhas: repetidas na memória, sem recopiar
+    assert _generation(banco) == geracao
+    _assert_in_sync(banco)
+
+def test_rollback_discards_write(banco):
+    antes = _rows(banco)
+    conn = db.get_db_connection(banco)
+    try:
+        conn.execute("UPDATE animais SET nome = 'Desfeito'")
+        conn.rollback()
+        # A conexão do arquivo foi solta: outra escrita não espera
+        conn.execute("UPDATE animais SET nome = 'Depois' WHERE id = 2")
+        conn.commit()
+    finally:
+        conn.close()
+    depois = _rows(banco)
+    assert [r for r in depois if r[0] != 2] == [r for r in antes if r[0] != 2]
+    _assert_in_sync(banco)
+
+def test_close_without_commit_discards_write(banco):
+    antes = _rows(banco)
+    conn = db.get_db_connection(banco)
+    conn.execute("DELETE FROM animais WHERE id < 10")
+    conn.close()
+    assert _rows(banco) == antes
+    _assert_in_sync(banco)
+
+def test_with_block_commits_or_rolls_back(banco):
+    conn = db.get_db_connection(banco)
+    try:
+        with conn:
+            conn.execute("UPDATE animais SET nome = 'Com with' WHERE id = 3")
+        with pytest.raises(ZeroDivisionError):
+            with conn:
+                conn.execute("UPDATE animais SET nome = 'Desfeito' WHERE id = 4")
+                1 / 0
+    finally:
+        conn.close()
+    nomes = dict((r[0], r[1]) for r in _rows(banco))
+    assert nomes[3] == 'Com with' and nomes[4] != 'Desfeito'
+    _assert_in_sync(banco)
+
+def test_failed_statement_keeps_snapshot(banco):
+    conn = db.get_db_connection(banco)
+    try:
+        conn.execute("UPDATE animais SET nome = 'Antes do erro' WHERE id = 5")
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO animais (id) VALUES (1000)")
+        conn.commit()
+    finally:
+        conn.close()
+    assert dict((r[0], r[1]) for r in _rows(banco))[5] == 'Antes do erro'
+    _assert_in_sync(banco)
+
+def test_ddl_outside_transaction_reaches_snapshot(banco):
+    conn = db.get_db_connection(banco)
+    try:
+        conn.execute("CREATE INDEX idx_teste ON animais (nome, tipo)")
+        assert not conn.in_transaction
+    finally:
+        conn.close()
+    conn = db.get_db_connection(banco)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_teste'").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+def test_bulk_write_recopies_instead_of_replaying(banco, monkeypatch):
+    monkeypatch.setattr(db, 'SNAPSHOT_MAX_ANOTADAS', 5)
+    geracao = _generation(banco)
+    conn = db.get_db_connection(banco)
+    try:
+        conn.executemany("UPDATE animais SET nome = ? WHERE id = ?", ((f"Lote {i}", i) for i in range(1, 5)))
+        conn.commit()
+        assert _generation(banco) == geracao
+
+        # Passou do limite: nada fica anotado, o snapshot é recopiado no commit
+        conn.executemany("UPDATE animais SET nome = ? WHERE id = ?", ((f"Lote {i}", i) for i in range(1, 8)))
+        assert conn._anotadas == []
+        conn.commit()
+    finally:
+        conn.close()
+    assert _generation(banco) != geracao
+    assert [r[1] for r in _rows(banco)[:7]] == [f"Lote {i}" for i in range(1, 8)]
+    _assert_in_sync(banco)
+
+def test_external_commit_is_picked_up(banco):
+    geracao = _generation(banco)
+    _rename(banco, 6, 'Externo')
+    # Percebido na próxima conexão pedida (PRAGMA data_version)
+    assert dict((r[0], r[1]) for r in _rows(banco))[6] == 'Externo'
+    assert _generation(banco) != geracao
+    _assert_in_sync(banco)
+
+def test_external_commit_before_own_write(banco):
+    conn = db.get_db_connection(banco)
+    try:
+        _rename(banco, 7, 'Externo')
+        # A conexão já estava emprestada: a escrita confere a versão e recopia
+        conn.execute("UPDATE animais SET nome = 'Interno' WHERE id = 8")
+        conn.commit()
+        # Conexão da cópia anterior: lê do arquivo
+        assert conn.execute("SELECT nome FROM animais WHERE id = 7").fetchone()[0] == 'Externo'
+    finally:
+        conn.close()
+    nomes = dict((r[0], r[1]) for r in _rows(banco))
+    assert nomes[7] == 'Externo' and nomes[8] == 'Interno'
+    _assert_in_sync(banco)
+
+def test_refresh_and_disable(banco):
+    geracao = _generation(banco)
+    snapshot.refresh(banco)
+    assert _generation(banco) != geracao
+    _assert_in_sync(banco)
+
+    snapshot.disable(banco)
+    assert not snapshot.enabled(banco)
+    assert _generation(banco) == db.db_path(banco)
+    snapshot.refresh(banco)  # sem snapshot: nada a fazer
+
+def test_backup_copies_the_file(banco, tmp_path):
+    conn = db.get_db_connection(banco)
+    try:
+        conn.execute("UPDATE animais SET nome = 'No backup' WHERE id = 9")
+        conn.commit()
+    finally:
+        conn.close()
+    destino = snapshot.backup(str(tmp_path / 'backup.db'), banco)
+    copia = sqlite3.connect(destino)
+    try:
+        assert [tuple(r) for r in copia.execute(CONSULTA)] == _rows(banco, disco=True)
+    finally:
+        copia.close()
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from adocoes.topk import METODOS, kth_largest, top_k_with_ties
+
+
+def _full_sort(scores, k):
+    """A regra por extenso: ordena tudo (estável) e corta no score do k-ésimo."""
+    ordem = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    if k <= 0 or not ordem:
+        return []
+    limite = scores[ordem[min(k, len(ordem)) - 1]]
+    return [i for i in ordem if scores[i] >= limite]
+
+def _cases():
+    rng = np.random.default_rng(11)
+    for n in (1, 2, 5, 17, 100, 1000):
+        # Poucos valores distintos: quase tudo empata com alguém
+        yield rng.integers(0, 4, size=n) / 4
+        yield rng.random(n)
+        yield np.zeros(n)
+    yield np.array([0.5, 1.0, 0.5, 1.0, 0.5, 0.0, 1.0])
+
+@pytest.mark.parametrize('metodo', METODOS)
+def test_matches_full_sort_with_ties(metodo):
+    for scores in _cases():
+        n = len(scores)
+        for k in sorted({0, 1, 2, 3, n // 2, n - 1, n, n + 3}):
+            obtido = top_k_with_ties(scores, k, metodo)
+            assert obtido.tolist() == _full_sort(scores.tolist(), k), (metodo, n, k)
+
+@pytest.mark.parametrize('metodo', METODOS)
+def test_kth_largest(metodo):
+    for scores in _cases():
+        decrescente = sorted(scores.tolist(), reverse=True)
+        for k in range(1, len(scores) + 1, max(1, len(scores) // 10)):
+            assert kth_largest(scores, k, metodo) == decrescente[k - 1]
+        # Também aceita lista comum
+        assert kth_largest(scores.tolist(), 1, metodo) == decrescente[0]
+
+def test_empty_and_unknown_method():
+    assert top_k_with_ties([], 3).tolist() == []
+    with pytest.raises(ValueError):
+        top_k_with_ties([0.1, 0.2, 0.3], 1, 'bolha')